@@ -0,0 +1,140 @@
+'''
+
+    Title:          BERT Encoder
+
+    Description:    Shared embedding layer for the BERT scoring classes. SentenceTransformer models are kept resident for the
+                    life of the process and every encoded text is cached, so the bullet, skill and project scorers (and every
+                    job processed by a long-running service) only pay the model load and the encoding cost once.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import threading
+import numpy as np
+from collections import OrderedDict
+from sentence_transformers import SentenceTransformer
+from Tracer import tracer
+
+
+class BERTEncoder:
+
+    # Loaded models and embedding caches are kept at the class level so every encoder in the process shares them
+    _models     = {}
+    _caches     = {}
+    _locks      = {}
+    _glock      = threading.Lock()
+
+    def __init__( self,
+                BERTModel:str       = "all-mpnet-base-v2",     # The BERT model to use
+                cache_size:int      = 50000,                   # Max amount of cached embeddings for this model
+                batch_size:int      = 32,                      # Batch size handed to the model when encoding
+                store               = None ):                  # Optional MasterlistStore. Embeddings are kept there between runs
+
+        self.BERTModel  = BERTModel
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.store      = store
+
+        with BERTEncoder._glock:
+            if self.BERTModel not in BERTEncoder._caches:
+                BERTEncoder._caches[self.BERTModel] = OrderedDict()
+                BERTEncoder._locks[self.BERTModel]  = threading.Lock()
+
+        self.cache      = BERTEncoder._caches[self.BERTModel]
+        self.lock       = BERTEncoder._locks[self.BERTModel]
+
+    # DONE: Returns the loaded model, loading it the first time it is needed
+    @property
+    def model( self ):
+
+        with self.lock:
+            if self.BERTModel not in BERTEncoder._models:
+                print( f"Loading BERT model {self.BERTModel}..." )
+                with tracer.span( "BERTEncoder.load", "bert", model = self.BERTModel ):
+                    BERTEncoder._models[self.BERTModel] = SentenceTransformer( self.BERTModel )
+
+        return BERTEncoder._models[self.BERTModel]
+
+    # DONE: Whether the model is already resident in memory
+    def is_loaded( self ):
+        return self.BERTModel in BERTEncoder._models
+
+    # DONE: Loads the model ahead of time (used to warm up the service)
+    def load( self ):
+        return self.model
+
+    # DONE: Removes the model from memory. The embedding cache is kept.
+    def unload( self ):
+        with self.lock:
+            BERTEncoder._models.pop( self.BERTModel, None )
+
+    # DONE: Encodes a single text or a list of texts into normalized embeddings. Cached texts are never re-encoded.
+    def encode( self, texts ):
+
+        single  = isinstance( texts, str )
+        if single:
+            texts = [ texts ]
+
+        # Only send the texts we haven't seen before to the model. Duplicates are only encoded once.
+        # The cached vectors are taken now, since another thread can evict them before this one is done.
+        with self.lock:
+            hits    = { t:self.cache[t] for t in texts if t in self.cache }
+        missing = list( dict.fromkeys( t for t in texts if t not in hits ) )
+
+        # Track the cache on the stage that asked for the embeddings
+        sp      = tracer.current()
+        sp.add( 'cache_hits', len( texts ) - len( missing ) )
+        sp.add( 'cache_misses', len( missing ) )
+
+        new     = {}
+
+        # Then check the embeddings stored from earlier runs
+        if self.store is not None and len( missing ) > 0:
+            new     = self.store.get_embeddings( self.BERTModel, missing )
+            missing = [ t for t in missing if t not in new ]
+            sp.add( 'store_hits', len( new ) )
+
+        if len( missing ) > 0:
+            model   = self.model
+            with tracer.span( "BERTEncoder.encode", "bert", texts = len( missing ) ):
+                embeds  = model.encode( missing, batch_size = self.batch_size, convert_to_numpy = True, normalize_embeddings = True )
+            encoded = { t:e.astype( np.float32 ) for t, e in zip( missing, embeds ) }
+            new.update( encoded )
+
+            if self.store is not None:
+                self.store.put_embeddings( self.BERTModel, encoded )
+
+        with self.lock:
+            self.cache.update( new )
+            vecs = []
+            for t in texts:
+                if t in new:
+                    vecs.append( new[t] )
+                else:
+                    if t in self.cache:
+                        self.cache.move_to_end( t )
+                    vecs.append( hits[t] )
+
+            # Keep the cache limited to the set size
+            while len( self.cache ) > self.cache_size:
+                self.cache.popitem( last = False )
+
+        vecs    = np.vstack( vecs ) if len( vecs ) > 0 else np.zeros( ( 0, 0 ), dtype = np.float32 )
+
+        return vecs[0] if single else vecs
+
+    # DONE: Returns the cosine similarity of each text to the query text
+    def similarity( self, query:str, texts:list ):
+
+        if len( texts ) == 0:
+            return np.zeros( 0, dtype = np.float32 )
+
+        q_embed = self.encode( query )
+        embeds  = self.encode( texts )
+
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        return embeds @ q_embed
@@ -0,0 +1,146 @@
+'''
+
+    Title:          BM25 Index
+
+    Description:    Inverted index with BM25 scoring over masterlist text (bullets, skills, project descriptions). ATS filters are
+                    mostly lexical, so the BERT scorers can blend the BM25 score of the job posting into their dense cosine
+                    score (`lexical_weight`). The index is also used as a prefilter: only the top-M lexical matches are sent to
+                    the encoder (`prefilter_m`), which cuts the encoding work on very large masterlists.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import re
+import math
+import hashlib
+import numpy as np
+from collections import Counter
+from Tracer import tracer
+from BuildCache import BuildCache
+
+
+# Common words that carry no meaning for matching
+STOPWORDS   = set( """a an and are as at be by for from has have in is it its of on or that the this to was were will with you your
+                      we our they their i my me he she his her them us who what which when where how all any can do does may must
+                      not no than then there these those into over under up out about also such other more most very""".split() )
+
+TOKEN_RE    = re.compile( r"[a-z0-9][a-z0-9+#]*" )
+
+
+# DONE: Splits text into lowercase word tokens, without stopwords. Keeps tokens like 'c++' and 'c#'.
+def tokenize( text:str ):
+    return [ t for t in TOKEN_RE.findall( text.lower() ) if t not in STOPWORDS ]
+
+
+class BM25Index:
+
+    # Indexes built from the same texts are reused (e.g. for every job of the service)
+    _built      = BuildCache( max_built = 64 )
+
+    def __init__( self,
+                texts:list,                 # Documents to index
+                k1:float    = 1.5,          # Term frequency saturation
+                b:float     = 0.75 ):       # Document length normalization
+
+        self.k1         = k1
+        self.b          = b
+        self.n_docs     = len( texts )
+
+        # term -> ( document indices, term frequencies )
+        postings        = {}
+        lengths         = np.zeros( self.n_docs, dtype = np.float32 )
+        for i, text in enumerate( texts ):
+            tokens      = tokenize( text )
+            lengths[i]  = len( tokens )
+            for term, tf in Counter( tokens ).items():
+                postings.setdefault( term, ( [], [] ) )
+                postings[term][0].append( i )
+                postings[term][1].append( tf )
+
+        self.lengths    = lengths
+        self.avgdl      = float( lengths.mean() ) if self.n_docs > 0 and lengths.mean() > 0 else 1.
+        self.postings   = { t:( np.array( d, dtype = np.int32 ), np.array( f, dtype = np.float32 ) ) for t, ( d, f ) in postings.items() }
+        self.idf        = { t:math.log( 1. + ( self.n_docs - len( d ) + 0.5 )/( len( d ) + 0.5 ) ) for t, ( d, _ ) in self.postings.items() }
+
+        # Length normalization of each document. Only depends on the document, so it is done once.
+        self.norm       = k1*( 1. - b + b*lengths/self.avgdl )
+
+    # DONE: Returns the index for these texts, building it only the first time
+    @classmethod
+    def for_texts( cls, texts:list, k1:float = 1.5, b:float = 0.75 ):
+
+        key = hashlib.sha1( "\x1e".join( texts ).encode( "utf-8" ) + f"|{k1}|{b}".encode() ).hexdigest()
+        return cls._built.get( key, lambda: cls( texts, k1, b ) )
+
+    # DONE: Returns the BM25 score of every document for the query
+    def scores( self, query:str ):
+
+        scores = np.zeros( self.n_docs, dtype = np.float32 )
+        for term in set( tokenize( query ) ):
+            if term not in self.postings:
+                continue
+            docs, tfs       = self.postings[term]
+            # Each document only appears once per term, so the fancy-indexed add is safe
+            scores[docs]    += self.idf[term]*tfs*( self.k1 + 1. )/( tfs + self.norm[docs] )
+
+        return scores
+
+    # DONE: Returns the indices of the top-m documents for the query, best first
+    def top( self, query:str, m:int ):
+
+        scores = self.scores( query )
+        if m >= self.n_docs:
+            return np.argsort( -scores, kind = 'stable' )
+
+        top = np.argpartition( -scores, m )[:m]
+        return top[np.argsort( -scores[top], kind = 'stable' )]
+
+
+# DONE: Scores texts against a query with the dense encoder, the BM25 index, or a blend of both.
+#       lexical_weight: 0 = dense only, 1 = BM25 only. BM25 is scaled to [0, 1] by its best score before blending.
+#       prefilter_m:    if > 0, only the top-m lexical matches of each group are encoded. The rest get -inf.
+#       groups:         optional list of ( start, end ) slices. The prefilter keeps top-m (at least `min_keep`) in each slice.
+def hybrid_scores( encoder, query:str, texts:list, lexical_weight:float = 0., prefilter_m:int = 0, groups:list = None, min_keep:int = 0 ):
+
+    n = len( texts )
+    if n == 0:
+        return np.zeros( 0, dtype = np.float32 )
+
+    # Pure dense scoring. This is the original behavior.
+    if lexical_weight <= 0. and prefilter_m <= 0:
+        return np.asarray( encoder.similarity( query, texts ), dtype = np.float32 )
+
+    lexical = BM25Index.for_texts( texts ).scores( query )
+    best    = lexical.max()
+    lexical = lexical/best if best > 0 else lexical
+
+    # Choose the candidates that are sent to the encoder
+    if prefilter_m > 0:
+        keep    = np.zeros( n, dtype = bool )
+        for start, end in ( groups if groups is not None else [ ( 0, n ) ] ):
+            m = max( prefilter_m, min_keep )
+            if end - start <= m:
+                keep[start:end] = True
+            else:
+                top = np.argpartition( -lexical[start:end], m )[:m]
+                keep[start + top] = True
+        chosen  = np.flatnonzero( keep )
+    else:
+        chosen  = np.arange( n )
+
+    sp = tracer.current()
+    sp.set( 'prefilter_kept', int( len( chosen ) ) )
+    sp.set( 'prefilter_total', n )
+
+    scores          = np.full( n, -np.inf, dtype = np.float32 )
+    if lexical_weight >= 1.:
+        scores[chosen]  = lexical[chosen]
+    else:
+        dense           = encoder.similarity( query, [ texts[i] for i in chosen ] )
+        scores[chosen]  = ( 1. - lexical_weight )*dense + lexical_weight*lexical[chosen]
+
+    return scores
@@ -0,0 +1,300 @@
+'''
+
+    Title:          Scaling Benchmark
+
+    Description:    Times each stage of the pipeline (bullet rebuild, summary, BERT bullets, BERT skills, BERT projects and the
+                    HTML render) on synthetic masterlists of several sizes. The LLM calls go to the MockOllama server, which
+                    echoes the bullets back with a configurable prefill/decode speed, so only our own code and the BERT model
+                    are measured. Results are saved as JSON in the /benchmarks directory and can be compared between commits.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import re
+import json
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import tracemalloc
+import subprocess
+import importlib.util
+from datetime import datetime
+from BulletRebuilder import BulletRebuilder
+from BulletBERT import BERTBullets
+from SkillsBERT import BERTSkills
+from ProjectsBERT import BERTProjects
+from BERTEncoder import BERTEncoder
+from MasterlistGenerator import MasterlistGenerator
+from Masterlist import Masterlist
+from MockOllama import MockOllama
+from Reranker import Reranker
+
+# The ResumeBuilder lives in a file with a hyphen in the name, so it has to be loaded by path
+_rb_spec        = importlib.util.spec_from_file_location( "ResumeBuilder_nonGUI", os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "ResumeBuilder-nonGUI.py" ) )
+_rb_module      = importlib.util.module_from_spec( _rb_spec )
+_rb_spec.loader.exec_module( _rb_module )
+ResumeBuilder   = _rb_module.ResumeBuilder
+
+
+# Masterlist sizes used by default
+SIZES   = {
+    'small':    { 'experiences':5,  'bullets_per':10, 'skills':20,  'subskills':60,  'projects':10 },
+    'medium':   { 'experiences':20, 'bullets_per':25, 'skills':50,  'subskills':200, 'projects':25 },
+    'large':    { 'experiences':50, 'bullets_per':40, 'skills':100, 'subskills':400, 'projects':50 },
+}
+
+# Job posting used for every run
+JOB_TITLE   = "Senior Computational Physicist"
+JOB_COMPANY = "ACME Laboratory"
+JOB_DESC    = """We have openings for Computational Physicists to develop multi-physics simulation codes for high-performance
+computing. You will develop algorithms and simulation tools in Python, C++ and Fortran, analyze experimental data, build
+diagnostics, and present results at conferences and in peer-reviewed publications. Experience with machine learning, data
+analysis, parallel computing (MPI, OpenMP, CUDA) and laboratory experiments is desired."""
+
+
+class Benchmark:
+
+    def __init__( self,
+                sizes:dict          = SIZES,                    # Masterlist sizes to benchmark
+                repeats:int         = 3,                        # How many times each stage is timed
+                BERTModel:str       = "all-mpnet-base-v2",      # The BERT model to use
+                prefill_rate:float  = 0.,                       # Prefill speed of the mock Ollama server
+                decode_rate:float   = 0.,                       # Decode speed of the mock Ollama server
+                save_dir:str        = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "benchmarks" ),
+                seed:int            = 0,
+                rerank_n:int        = 10 ):                     # Top-N bullets of each experience for the reranking stage. 0 = skip the stage
+
+        self.sizes      = sizes
+        self.repeats    = repeats
+        self.BERTModel  = BERTModel
+        self.save_dir   = save_dir
+        self.seed       = seed
+        self.llm        = MockOllama( port = 0, prefill_rate = prefill_rate, decode_rate = decode_rate )
+        self.encoder    = BERTEncoder( BERTModel = BERTModel )
+        self.rerank_n   = rerank_n
+        self.reranker   = Reranker() if rerank_n > 0 else None
+        self.results    = {}
+
+        if not os.path.exists( self.save_dir ):
+            os.mkdir( self.save_dir )
+
+    # DONE: Times a function. Returns the timing stats and the last result.
+    def time_stage( self, func, setup = None ):
+
+        times   = []
+        result  = None
+        for _ in range( self.repeats ):
+            if setup is not None:
+                setup()
+            start   = time.perf_counter()
+            result  = func()
+            times.append( time.perf_counter() - start )
+
+        return { 'min_s':min( times ), 'median_s':statistics.median( times ), 'runs':times }, result
+
+    # DONE: Clears the embedding cache so each BERT stage is timed cold
+    def clear_embeddings( self ):
+        self.encoder.cache.clear()
+
+    # DONE: Measures the memory held by the masterlist as plain JSON dictionaries and as the typed Masterlist model (MB)
+    def memory_footprint( self, ml_file:str ):
+
+        with open( ml_file, 'r' ) as file:
+            text = file.read()
+
+        tracemalloc.start()
+        as_dict     = json.loads( text )
+        dict_mb     = tracemalloc.get_traced_memory()[0]/( 1024**2 )
+        tracemalloc.stop()
+        del as_dict
+
+        tracemalloc.start()
+        as_model    = Masterlist.from_dict( json.loads( text ) )
+        model_mb    = tracemalloc.get_traced_memory()[0]/( 1024**2 )
+        tracemalloc.stop()
+        del as_model
+
+        return { 'json_dict_mb':round( dict_mb, 3 ), 'masterlist_mb':round( model_mb, 3 ) }
+
+    # DONE: Benchmarks every stage for a single masterlist size
+    def run_size( self, name:str, counts:dict ):
+
+        print( f"###### Benchmarking '{name}' masterlist: {counts}" )
+
+        work_dir    = tempfile.mkdtemp( prefix = f"bench_{name}_" )
+        ml_file     = os.path.join( work_dir, f"masterlist_{name}.json" )
+        MasterlistGenerator( seed = self.seed, **counts ).save( ml_file )
+
+        stages      = {}
+        memory      = self.memory_footprint( ml_file )
+
+        try:
+            # Bullet rebuild. force_rebuild so the cached rebuild is never used. Every LLM call goes to the mock server.
+            def rebuild():
+                BR = BulletRebuilder( master_file = ml_file, modelSize = '1.5', force_rebuild = True, save_directory = work_dir, ollama_host = self.llm.url )
+                BR.process()
+                return BR
+            stages['rebuild'], BR   = self.time_stage( rebuild )
+
+            stages['summary'], summary = self.time_stage( lambda: BR.buildSummary( JOB_TITLE, JOB_COMPANY, JOB_DESC ) )
+
+            mList       = BR.master_list
+            parsed      = [ { 'type':1, 'title':v['jobtitle'], 'bullets':v['projects'] } for v in mList['experiences'] ]
+
+            # BERT bullets. The results file is never saved, so each run is a full scoring run
+            bb_dir      = os.path.join( work_dir, "BERT_rebuilds" )
+            def bullets():
+                BB = BERTBullets( jobTitle = JOB_TITLE, jobCompany = JOB_COMPANY, jobDesc = JOB_DESC, bulletPoints = parsed, minPoints = 5,
+                                  save_location = bb_dir, save_files = False, encoder = self.encoder )
+                return BB.render()
+            stages['bert_bullets'], resume_bullets = self.time_stage( bullets, setup = self.clear_embeddings )
+
+            # Hybrid BM25 + BERT ranking, with only the top keyword matches of each experience sent to the encoder
+            def bullets_hybrid():
+                BB = BERTBullets( jobTitle = JOB_TITLE, jobCompany = JOB_COMPANY, jobDesc = JOB_DESC, bulletPoints = parsed, minPoints = 5,
+                                  save_location = bb_dir, save_files = False, encoder = self.encoder, lexical_weight = 0.3, prefilter_m = 10 )
+                return BB.render()
+            stages['bert_bullets_hybrid'], _ = self.time_stage( bullets_hybrid, setup = self.clear_embeddings )
+
+            # Two-stage ranking: the bi-encoder retrieves, the cross-encoder reranks the top-N of each experience.
+            # The retrieve/rerank split of the last run is kept so the quality/latency trade-off can be read off directly.
+            if self.rerank_n > 0:
+                def bullets_rerank():
+                    BB = BERTBullets( jobTitle = JOB_TITLE, jobCompany = JOB_COMPANY, jobDesc = JOB_DESC, bulletPoints = parsed, minPoints = 5,
+                                      save_location = bb_dir, save_files = False, encoder = self.encoder, rerank_n = self.rerank_n, reranker = self.reranker )
+                    BB.render()
+                    return BB.timings
+                stages['bert_bullets_rerank'], timings = self.time_stage( bullets_rerank, setup = self.clear_embeddings )
+                stages['bert_bullets_rerank']['split_s'] = timings
+
+            def skills():
+                BS = BERTSkills( skills = mList['skills'], subskills = mList['subskills'], job_title = JOB_TITLE, job_description = JOB_DESC,
+                                 count = 5, encoder = self.encoder )
+                return BS.render()
+            stages['bert_skills'], resume_skills = self.time_stage( skills, setup = self.clear_embeddings )
+
+            def projects():
+                BP = BERTProjects( job_title = JOB_TITLE, job_description = JOB_DESC, projects = mList['projects'], count = 5, encoder = self.encoder )
+                return BP.render()
+            stages['bert_projects'], chosen_projects = self.time_stage( projects, setup = self.clear_embeddings )
+
+            # HTML render
+            RB                  = ResumeBuilder( masterlist = ml_file, job_title = JOB_TITLE, job_company = JOB_COMPANY, job_desc = JOB_DESC,
+                                                 save_dir = work_dir, cv_style = True, encoder = self.encoder )
+            RB.remastered_list  = mList
+            RB.resume_bullets   = resume_bullets
+            RB.resume_skills    = resume_skills
+            RB.chosen_projects  = chosen_projects
+            RB.summary          = summary
+            stages['render_html'], _ = self.time_stage( RB.parseToHTML )
+
+        finally:
+            shutil.rmtree( work_dir, ignore_errors = True )
+
+        total_bullets   = counts['experiences']*counts['bullets_per']
+        self.results[name] = { 'counts':dict( counts, total_bullets = total_bullets ), 'memory':memory, 'stages':stages }
+
+        print( f"    {'memory':<20} json dicts {memory['json_dict_mb']:8.2f} MB    Masterlist {memory['masterlist_mb']:8.2f} MB" )
+
+        for stage, st in stages.items():
+            print( f"    {stage:<20} median {st['median_s']*1000:10.2f} ms    min {st['min_s']*1000:10.2f} ms" )
+
+        return self.results[name]
+
+    # DONE: Benchmarks every size and saves the results
+    def run( self ):
+
+        # Load the model once, outside of the timings
+        self.encoder.load()
+        if self.reranker is not None:
+            self.reranker.load()
+
+        with self.llm:
+            for name, counts in self.sizes.items():
+                self.run_size( name, counts )
+
+        return self.save()
+
+    # DONE: Returns the current git commit, if this is a git repository
+    def git_commit( self ):
+        try:
+            return subprocess.run( [ "git", "rev-parse", "--short", "HEAD" ], capture_output = True, text = True,
+                                   cwd = os.path.dirname( os.path.abspath( __file__ ) ) ).stdout.strip() or "unknown"
+        except Exception:
+            return "unknown"
+
+    # DONE: Saves the results as a JSON file
+    def save( self ):
+
+        commit  = self.git_commit()
+        now     = datetime.now()
+        data    = { 'commit':       commit,
+                    'date':         now.isoformat( timespec = 'seconds' ),
+                    'python':       platform.python_version(),
+                    'machine':      platform.platform(),
+                    'BERTModel':    self.BERTModel,
+                    'repeats':      self.repeats,
+                    'llm':          { 'prefill_rate':self.llm.prefill_rate, 'decode_rate':self.llm.decode_rate },
+                    'sizes':        self.results }
+
+        file_name = os.path.join( self.save_dir, f"bench_{now.strftime( '%Y%m%d-%H%M%S' )}_{commit}.json" )
+        with open( file_name, 'w' ) as file:
+            json.dump( data, file, indent = 4 )
+
+        print( f"Benchmark results saved to {file_name}" )
+        return file_name
+
+
+# DONE: Prints the change of every stage between two saved benchmark results
+def compare( old_file:str, new_file:str, threshold:float = 0.10 ):
+
+    with open( old_file, 'r' ) as file:
+        old = json.load( file )
+    with open( new_file, 'r' ) as file:
+        new = json.load( file )
+
+    print( f"Comparing {old['commit']} ({old['date']}) -> {new['commit']} ({new['date']})" )
+
+    regressions = []
+    for size, res in new['sizes'].items():
+        if size not in old['sizes']:
+            continue
+        print( f"  {size}:" )
+        for stage, st in res['stages'].items():
+            if stage not in old['sizes'][size]['stages']:
+                continue
+            before  = old['sizes'][size]['stages'][stage]['median_s']
+            after   = st['median_s']
+            change  = ( after - before )/before if before > 0 else 0.
+            flag    = ""
+            if change > threshold:
+                flag = "  <-- REGRESSION"
+                regressions.append( ( size, stage, change ) )
+            print( f"    {stage:<15} {before*1000:10.2f} ms -> {after*1000:10.2f} ms  ({change*100:+.1f}%){flag}" )
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    # How many times to time each stage (the median is reported)
+    repeats         = 3
+
+    # Prefill and decode speeds (tokens per second) of the mock Ollama server. 0 = instant, which only measures our own code.
+    prefill_rate    = 0.
+    decode_rate     = 0.
+
+    BM  = Benchmark( sizes = SIZES, repeats = repeats, prefill_rate = prefill_rate, decode_rate = decode_rate )
+    new_results = BM.run()
+
+    # Compare against the previous results, if there are any
+    previous = sorted( f for f in os.listdir( BM.save_dir ) if re.match( r"bench_.*\.json$", f ) )
+    if len( previous ) > 1:
+        compare( os.path.join( BM.save_dir, previous[-2] ), new_results )
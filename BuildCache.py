@@ -0,0 +1,52 @@
+'''
+
+    Title:          Build Cache
+
+    Description:    LRU cache of objects that are slow to build and only depend on their inputs, such as the BM25 index of the
+                    bullets, the keyword matcher of the skills or the skill graph. The service scores many jobs against the
+                    same masterlist, so each is built once and then shared by every job (and thread) that asks for the same key.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import threading
+from collections import OrderedDict
+
+
+class BuildCache:
+
+    def __init__( self,
+                max_built:int   = 32 ):     # Objects kept. The least recently used go first
+
+        self.max_built  = max_built
+        self.built      = OrderedDict()
+        self.lock       = threading.Lock()
+
+    # DONE: Returns the object of a key, calling build() only the first time. Two threads may both build a missing
+    #       key; the later one is kept.
+    def get( self, key:str, build ):
+
+        with self.lock:
+            if key in self.built:
+                self.built.move_to_end( key )
+                return self.built[key]
+
+        obj = build()
+        with self.lock:
+            self.built[key] = obj
+            while len( self.built ) > self.max_built:
+                self.built.popitem( last = False )
+
+        return obj
+
+    # DONE: Drops every built object
+    def clear( self ):
+        with self.lock:
+            self.built.clear()
+
+    def __len__( self ):
+        return len( self.built )
@@ -13,10 +13,20 @@
 
 # Import libraries
 import os
-import json
+import time
 import string
+import hashlib
+import numpy as np
 from typing import Optional
-from sentence_transformers import SentenceTransformer, util
+from BERTEncoder import BERTEncoder
+from Tracer import tracer, traced
+from BM25Index import hybrid_scores
+from SkillGraph import SkillGraph
+from BulletSelector import BulletSelector
+from MMR import mmr_select, duplicate_clusters, duplicate_mask, cached_embeddings
+from Reranker import Reranker
+from SafeIO import key_lock
+from RankingStore import RankingStore
 
 # DONE: BERT bullet class
 class BERTBullets:
@@ -32,7 +42,22 @@ class BERTBullets:
         BERTModel:str           = "all-mpnet-base-v2",                          # The BERT model to use.
         save_location:str       = os.path.dirname(os.path.abspath(__file__)),   # The save location for the processed data
         force_rebuild:bool      = False,                                         # Whether to force a rebuile of the saved files. This is mostly done for testing.
-        save_files:bool         = True
+        save_files:bool         = True,
+        encoder:Optional[BERTEncoder] = None,                                   # Shared encoder. Keeps the model resident between jobs
+        lexical_weight:float    = 0.,                                           # Weight of the BM25 keyword score in the ranking. 0 = BERT only
+        prefilter_m:int         = 0,                                            # If > 0, only the top-M keyword matches of each experience are encoded
+        skills:Optional[list]   = None,                                         # Skills of the masterlist. Needed for the skill graph boost
+        subskills:Optional[list]= None,                                         # Subskills of the masterlist. Needed for the skill graph boost
+        skill_weight:float      = 0.,                                           # Weight of the relevance of each bullet's linked skills. 0 = off
+        budget:int              = 0,                                            # If > 0, bullets are chosen across all experiences under this page budget
+        budget_unit:str         = "lines",                                      # Unit of the budget: 'lines' or 'chars'
+        min_per:int             = 1,                                            # With a budget: minimum bullets of each experience
+        max_per:Optional[int]   = None,                                         # With a budget: maximum bullets of each experience. None = minPoints
+        mmr_lambda:float        = 1.,                                           # MMR trade-off of relevance vs. diversity. 1 = relevance only (off)
+        dup_threshold:float     = 0.9,                                          # Similarity above which two bullets are near-duplicates
+        rerank_n:int            = 0,                                            # If > 0, the top-N bullets of each experience are reranked with a cross-encoder
+        reranker:Optional[Reranker] = None,                                     # Cross-encoder used for the reranking. Shared between jobs
+        compress_results:bool   = True                                          # Whether the saved rankings are zlib-compressed
     ):
     
         # Externally set variables
@@ -41,10 +66,27 @@ class BERTBullets:
         self.jobDesc            = jobDesc
         self.bulletPnts         = bulletPoints
         self.minPnts            = minPoints
-        self.BERTmodel          = BERTModel
         self.force_rebuild      = force_rebuild
         self.save_location      = save_location
         self.save_files         = save_files
+        self.encoder            = encoder if encoder is not None else BERTEncoder( BERTModel = BERTModel )
+        self.BERTmodel          = self.encoder.BERTModel                        # The model that actually embeds, e.g. a StaticEncoder's "static:<dir>"
+        self.lexical_weight     = lexical_weight
+        self.prefilter_m        = prefilter_m
+        self.skills             = skills or []
+        self.subskills          = subskills or []
+        self.skill_weight       = skill_weight
+        self.budget             = budget
+        self.budget_unit        = budget_unit
+        self.min_per            = min_per
+        self.max_per            = max_per if max_per is not None else ( minPoints if minPoints and minPoints > 0 else None )
+        self.mmr_lambda         = mmr_lambda
+        self.dup_threshold      = dup_threshold
+        self.embeds             = None
+        self.rerank_n           = rerank_n
+        self.reranker           = reranker if reranker is not None or rerank_n <= 0 else Reranker()
+        self.timings            = {}
+        self.rankings           = RankingStore.open( save_location, compress = compress_results )
 
         # Internal
         self.newBulletPnts      = []
@@ -55,93 +97,184 @@ class BERTBullets:
             os.mkdir( self.save_location )
 
         # This should be of the form company_title_bulletpoints{5}_bertmodel.json
-        results_file_name       = f"{self.prepare_text_for_filename(self.jobCompany)}_{self.prepare_text_for_filename(self.jobTitle)}_bpcount{len(self.bulletPnts)}_BERTModel-{self.BERTmodel}"
-        self.BERTResultsFile    = os.path.join( save_location, f"{results_file_name}.json" )
-
-        # Only use this for testing purposes
-        if self.force_rebuild:
-            # Remove the BERTResultsFile if it exists
-            if os.path.isfile( self.BERTResultsFile ):
-                os.remove( self.BERTResultsFile )
+        results_file_name       = f"{self.prepare_text_for_filename(self.jobCompany)}_{self.prepare_text_for_filename(self.jobTitle)}_bpcount{len(self.bulletPnts)}_BERTModel-{self.BERTmodel.replace( '/', '__' ).replace( ':', '-' )}"
+        # Hybrid rankings are saved separately from the BERT-only rankings
+        if self.lexical_weight > 0 or self.prefilter_m > 0:
+            results_file_name   += f"_lex{self.lexical_weight:g}_pre{self.prefilter_m}"
+        if self.skill_weight > 0:
+            results_file_name   += f"_sk{self.skill_weight:g}"
+        if self.budget > 0:
+            results_file_name   += f"_budget{self.budget}{self.budget_unit}_min{self.min_per}_max{self.max_per}"
+        if self.mmr_lambda < 1.:
+            results_file_name   += f"_mmr{self.mmr_lambda:g}_dup{self.dup_threshold:g}"
+        if self.rerank_n > 0:
+            results_file_name   += f"_rr{self.rerank_n}-{os.path.basename( self.reranker.model_name )}"
+        # The posting itself, so a stripped or edited posting of the same company and title isn't given another's ranking
+        results_file_name       += f"_desc{hashlib.sha1( self.jobDesc.encode( 'utf-8' ) ).hexdigest()[:10]}"
+        # Key of this job's ranking in the save location's RankingStore
+        self.results_key        = results_file_name
     
     # DONE: Renders the result of BERT testing
+    @traced( "BERTBullets.render", "bert" )
     def render( self ):
 
-        # First, check if the file already exists. If so, skip the rest.
-        if os.path.isfile( self.BERTResultsFile ):
+        # Only one run computes the results of this job. Others wait for it, then read them from the store.
+        with key_lock( os.path.join( self.save_location, self.results_key ) ):
 
-            print( "Found previous BERT Results File!" )
-            # Open the file and save the results to self.newBulletPnts
-            with open(self.BERTResultsFile, 'r') as file:
-                self.newBulletPnts = json.load(file)
+            # First, check if the ranking is already stored. If so, skip the rest. Damaged or out-of-date records count as missing.
+            # force_rebuild (only for testing) ignores the stored ranking and then replaces it.
+            results = None if self.force_rebuild else self.rankings.get( self.results_key, self.bulletPnts )
+            if results is not None:
+
+                print( "Found previous BERT Results!" )
+                tracer.current().set( 'results_cache', 'hit' )
+                self.newBulletPnts = results
+            else:
+                print( f"{self.results_key} not found! Starting model" )
+                tracer.current().set( 'results_cache', 'miss' )
+
+                # Set new bullets list to a global variable (just in case for extra usage)
+                self.newBulletPnts = self.rank()
+
+                # Save the results for future use
+                if self.save_files:
+                    self.save_results()
+
+        # Return the values
+        return self.newBulletPnts
+
+    # DONE: Scores every bullet against the job and chooses the bullets of each experience
+    def rank( self ):
+
+        print( "Encoding Job Description for BERT model..." )
+        # Score every bullet of every experience in one batch. The keyword prefilter works per experience.
+        all_descs       = [ b['description'] for exp in self.bulletPnts for b in exp['bullets'] ]
+        groups          = []
+        for exp in self.bulletPnts:
+            start = groups[-1][1] if len( groups ) > 0 else 0
+            groups.append( ( start, start + len( exp['bullets'] ) ) )
+        # Stage 1: the bi-encoder (plus keywords and skill links) scores every bullet
+        start           = time.perf_counter()
+        with tracer.span( "BERTBullets.retrieve", "bert", bullets = len( all_descs ) ):
+            all_ratings     = hybrid_scores( self.encoder, self.jobDesc, all_descs, self.lexical_weight, self.prefilter_m,
+                                             groups = groups, min_keep = max( self.minPnts or 0, 0 ) )
+
+            # Boost each bullet by the relevance of the skills it is linked to
+            if self.skill_weight > 0 and len( self.skills ) + len( self.subskills ) > 0:
+                all_bullets = [ b for exp in self.bulletPnts for b in exp['bullets'] ]
+                graph       = SkillGraph.for_links( self.skills, self.subskills, bullets = all_bullets )
+                relevance   = graph.skill_relevance( self.encoder, self.jobTitle + " " + self.jobDesc )
+                all_ratings = all_ratings + self.skill_weight*graph.bullet_scores( relevance )
+        self.timings['retrieve_s'] = time.perf_counter() - start
+
+        # Stage 2: the cross-encoder reorders only the top-N bullets of each experience
+        if self.rerank_n > 0:
+            start           = time.perf_counter()
+            with tracer.span( "BERTBullets.rerank", "bert", top_n = self.rerank_n ):
+                all_ratings = self.reranker.rerank( self.jobDesc, all_descs, all_ratings, self.rerank_n, groups = groups )
+            self.timings['rerank_s'] = time.perf_counter() - start
+
+        all_ratings     = all_ratings.tolist()
+
+        # Embeddings for the diversity selection. They are all in the encoder cache already, so nothing is re-encoded.
+        # Bullets dropped by the keyword prefilter were never encoded, so they get zero vectors instead.
+        if self.mmr_lambda < 1.:
+            self.embeds = cached_embeddings( self.encoder, all_descs, all_ratings )
+
+        print( "Staring BERT Processing Cycle..." )
+        if self.budget > 0:
+            # Only the best bullet of each group of near-duplicates can be chosen
+            if self.embeds is not None:
+                for start, end in groups:
+                    drop = duplicate_mask( all_ratings[start:end], self.embeds[start:end], self.dup_threshold )
+                    for i in np.flatnonzero( drop ):
+                        all_ratings[start + i] = float( '-inf' )
+
+            # Choose the bullets of every experience together, under the page budget
+            selector        = BulletSelector( budget = self.budget, unit = self.budget_unit, min_per = self.min_per, max_per = self.max_per )
+            newBulletPnts   = selector.select( self.bulletPnts, all_ratings )
+            tracer.current().set( 'budget_used', selector.used )
+            if self.embeds is not None:
+                for exp, newD, ( start, end ) in zip( self.bulletPnts, newBulletPnts, groups ):
+                    newD['duplicates'] = self.duplicate_ids( exp, start, end )
         else:
-            print( f"{self.BERTResultsFile} not found! Starting model" )
-            print( f"Loading BERT model {self.BERTmodel}..." )
-            # Load the model
-            self.model      = SentenceTransformer( self.BERTmodel )
+            newBulletPnts = self.top_per_experience( all_ratings )
 
-            print( "Encoding Job Description for BERT model..." )
-            # Encode the job description
-            desc_embed      = self.model.encode( self.jobDesc )
+        return newBulletPnts
+    
+    # DONE: Keeps the top minPoints bullets of every experience, independently of the other experiences
+    def top_per_experience( self, all_ratings:list ):
 
-            # Define the new bulletPoints variable
-            newBulletPnts   = []
+        # Define the new bulletPoints variable
+        newBulletPnts   = []
 
-            print( "Staring BERT Processing Cycle..." )
-            # Cycle through the bullet points for each experience
-            # self.bulletPnts = structure( { 'type':1, 'title':v['jobtitle'], 'bullets':v['projects'] } )
-            for exp in self.bulletPnts:
+        # Cycle through the bullet points for each experience
+        # self.bulletPnts = structure( { 'type':1, 'title':v['jobtitle'], 'bullets':v['projects'] } )
+        offset          = 0
+        for exp in self.bulletPnts:
 
-                # Get the count of bullet points
-                bPntCnt     = len( exp['bullets'] )
+            # Get the count of bullet points
+            bPntCnt     = len( exp['bullets'] )
 
-                # Build the bullet count limit
-                bCntLimit   = bPntCnt
+            # Build the bullet count limit
+            bCntLimit   = bPntCnt
 
-                # Limit the points to the set cap, if defined
-                if self.minPnts > 0:
-                    if self.minPnts < bCntLimit:
-                        bCntLimit = self.minPnts
+            # Limit the points to the set cap, if defined
+            if self.minPnts > 0:
+                if self.minPnts < bCntLimit:
+                    bCntLimit = self.minPnts
 
-                # Cycle through each bullet point for BERT ratings
-                BERTRatings = []
-                for b in exp['bullets']:
-                    b_embed     = self.model.encode( b['description'] )
-                    BERTRatings.append( util.cos_sim( desc_embed, b_embed ).item() )
+            # Grab the BERT ratings of this experience's bullets
+            BERTRatings = all_ratings[offset:offset+bPntCnt]
+            offset      += bPntCnt
 
-                # Combine the BERT ratings and the bullets list for sorting
-                comb_bs     = list( zip( BERTRatings, exp['bullets'] ) )
-                comb_bs     = sorted( comb_bs, key = lambda x: x[0], reverse = True )
+            # Bullets dropped by the keyword prefilter are never chosen
+            bCntLimit   = min( bCntLimit, sum( 1 for r in BERTRatings if r != float( '-inf' ) ) )
 
-                # Separate the lists
-                sorted_BERT, sorted_bullets = zip( *comb_bs )
+            # Experiences without bullets stay empty
+            if bPntCnt == 0:
+                newBulletPnts.append( { 'type':exp['type'], 'title':exp['title'], 'bullets':[], 'BERTS':[] } )
+                continue
 
-                # Create the new dictionary
-                newD            = {}
-                newD['type']    = exp['type']
-                newD['title']   = exp['title']
+            # Diversity selection. Picks bCntLimit bullets with MMR instead of the plain top scores.
+            if self.embeds is not None:
+                picked = mmr_select( BERTRatings, self.embeds[offset-bPntCnt:offset], bCntLimit, self.mmr_lambda )
+                newBulletPnts.append( { 'type':         exp['type'],
+                                        'title':        exp['title'],
+                                        'bullets':      [ exp['bullets'][i] for i in picked ],
+                                        'BERTS':        [ BERTRatings[i] for i in picked ],
+                                        'duplicates':   self.duplicate_ids( exp, offset-bPntCnt, offset ) } )
+                continue
 
-                # Create sorted lists
-                s_BERT_lst      = list( sorted_BERT )
-                s_bull_lst      = list( sorted_bullets )
+            # Combine the BERT ratings and the bullets list for sorting
+            comb_bs     = list( zip( BERTRatings, exp['bullets'] ) )
+            comb_bs     = sorted( comb_bs, key = lambda x: x[0], reverse = True )
 
-                # Limit the bullets by count limit
-                newD['bullets'] = s_bull_lst[:bCntLimit]
-                newD['BERTS']   = s_BERT_lst[:bCntLimit]
+            # Separate the lists
+            sorted_BERT, sorted_bullets = zip( *comb_bs )
 
-                # Append the new points
-                newBulletPnts.append( newD )
+            # Create the new dictionary
+            newD            = {}
+            newD['type']    = exp['type']
+            newD['title']   = exp['title']
 
-            # Set new bullets list to a global variable (just in case for extra usage)
-            self.newBulletPnts = newBulletPnts
+            # Create sorted lists
+            s_BERT_lst      = list( sorted_BERT )
+            s_bull_lst      = list( sorted_bullets )
 
-            # Save the results for future use
-            if self.save_files:
-                self.save_results()
+            # Limit the bullets by count limit
+            newD['bullets'] = s_bull_lst[:bCntLimit]
+            newD['BERTS']   = s_BERT_lst[:bCntLimit]
+
+            # Append the new points
+            newBulletPnts.append( newD )
+
+        return newBulletPnts
+
+    # DONE: Returns the ids of the near-duplicate bullets of an experience, grouped into clusters
+    def duplicate_ids( self, exp:dict, start:int, end:int ):
+        return [ [ exp['bullets'][i]['id'] for i in cluster ] for cluster in duplicate_clusters( self.embeds[start:end], self.dup_threshold ) ]
 
-        # Return the values
-        return self.newBulletPnts
-    
     # DONE: Processes input text to remove punctuation/spaces. Puts all text to lowercase
     def prepare_text_for_filename( self, text:str = "" ):
 
@@ -159,10 +292,10 @@ class BERTBullets:
         return camelcase_text
         
     # DONE: Saves the BERT files for each job.
+    @traced( "BERTBullets.save_results", "io" )
     def save_results( self ):
-        print( f"Saving BERT model results to {self.BERTResultsFile}" )
-        with open( self.BERTResultsFile, 'w') as file:
-            json.dump( self.newBulletPnts, file, indent = 4 )
+        print( f"Saving BERT model results to {self.rankings.seg_file}" )
+        self.rankings.put( self.results_key, self.newBulletPnts, self.bulletPnts )
     
 # Local testing
 if __name__ == "__main__":
@@ -16,14 +16,59 @@ import os
 import re
 import sys
 import json
-import errno
+import time
 from typing import Optional
 import platform
 import psutil
 import GPUtil
 from datetime import datetime
-from ollama import chat, ChatResponse, ResponseError, pull
-import ollama
+from ollama import ChatResponse, ResponseError, Client
+from Tracer import tracer, traced
+from Masterlist import Masterlist, json_default
+from SemanticCache import scope_key
+from ResourceScheduler import MODEL_RAM_GB
+from SafeIO import atomic_write, key_lock
+
+
+# DONE: Replaces the exact mentions of the old job title and company in a text with the new ones
+def replace_job( text:str, old_title:str, old_company:str, job_title:str, job_company:str ):
+
+    replaced = text
+    if old_company != "":
+        replaced = replaced.replace( old_company, job_company )
+    if old_title != "":
+        replaced = replaced.replace( old_title, job_title )
+
+    return replaced
+
+
+# DONE: Formats a cover letter in HTML, dated today and addressed to the company, and saves it to save_dir.
+#       Returns the HTML and the file it was saved to.
+def save_cover_letter( letter:str, name:str, job_title:str, job_company:str, save_dir:str ):
+
+    # Create a format for the cover letter in HTML
+    now     = datetime.now()
+    month   = now.strftime( "%B" )
+    ret     = "<!DOCTYPE html><html><head><title>Resume</title></head><body>"
+    ret     += f"<div class='cl_header'><div class='cl_date'>{now.day} {month}, {now.year}</div>"
+    ret     += f"<div class='cl_company'>{job_company}</div>"
+    ret     += "</div>"
+    ret     += f"<div class='cl_letter'>{letter}</div>"
+    ret     += f"<div class='cl_signature'><div>Sincerely,</div><div>{name}</div></div>"
+    ret     += "</body></html>"
+
+    # Save the document and return it, just in case
+    lastname            = name.split()[-1]
+    jobTitle            = "".join(job_title.split())
+    comp_name           = job_company.split()[0]
+    basename            = f"{lastname}_{jobTitle.lower()}_{comp_name.lower()}"
+    basename            += "_coverletter.html"
+
+    save_file_loc       = os.path.join( save_dir, basename )
+
+    atomic_write( save_file_loc, ret )
+
+    return ret, save_file_loc
 
 
 class BulletRebuilder:
@@ -38,7 +83,17 @@ class BulletRebuilder:
                 override_default_prompt:bool    = False, 
                 prompt:str                      = '', 
                 force_all_models:bool           = False,
-                save_directory:str              = os.path.dirname(os.path.abspath(__file__)) ):
+                save_directory:str              = os.path.dirname(os.path.abspath(__file__)),
+                keep_alive                      = None,
+                ollama_host:Optional[str]       = None,
+                ollama_timeout:Optional[float]  = None,
+                store                           = None,
+                candidate:str                   = "",
+                semantic_cache                  = None,
+                cache_options:Optional[dict]    = None,
+                touchup_model:Optional[str]     = None,
+                scheduler                       = None,
+                precompute                      = None ):
         
         # Input variables
         self.master_file    = master_file               # Location of master file (in markdown language)
@@ -51,15 +106,32 @@ class BulletRebuilder:
                                                         # NOTE: This takes up a lot of local storage. Make sure the space exists!
 
         self.save_dir       = save_directory            # Where to save everything
+        self.keep_alive     = keep_alive                # How long Ollama keeps the model loaded after a call (e.g. '30m', -1 = forever). None = Ollama default
+        self.ollama_host    = ollama_host               # Ollama server to use (e.g. the MockOllama server for testing). None = OLLAMA_HOST or the local default
+        self.ollama_timeout = ollama_timeout            # Seconds before an Ollama request times out. None = no timeout
+        self.store          = store                     # Optional MasterlistStore. If set, the masterlist and the rewrites are kept there instead of JSON files
+        self.candidate      = candidate                 # Name of the candidate in the store
+        self.semantic_cache = semantic_cache            # Optional SemanticCache. Summaries/cover letters of near-identical postings are reused
+        self.cache_options  = cache_options             # Options of the prompts (e.g. the posting compression). Cached texts are only reused under the same options
+        self.touchup_model  = touchup_model             # Small model that fixes the job title/company in a reused text. None = plain text replacement only
+        self.cache_scope    = None                      # ( masterlist, its JSON ) of the semantic cache scope
+        self.scheduler      = scheduler                 # Optional ResourceScheduler. Frees RAM or picks a smaller model before each LLM stage
+        self.precompute     = precompute                # Optional EmbeddingPrecompute. The saved rewrites are encoded in the background.
+                                                        # Only for a rebuild that isn't scored in the same process (e.g. a nightly run)
+        self.cover_letter   = None                      # Text of the latest cover letter, without its header
+        self.llm_models     = {}                        # Model size each LLM stage last ran with, which the scheduler may have lowered
+
+        # Client for all Ollama calls
+        self.client         = Client( host = self.ollama_host, timeout = self.ollama_timeout )
 
         # Interval variables
         self.R1models           = [ '671', '70', '32', '14', '8', '7', '1.5' ]
         self.R1modelsFlt        = [ 671, 70, 32, 14, 8, 7, 1.5 ]
         self.bullets_lists      = []
-        self.mList              = {}                        # Dictionary of master list values 
+        self.mList              = None                      # Masterlist parsed from master_file
         self.master_modeled     = ""                        # file of the DeepSeek edited master_file
         self.master_mod_found   = False                     # Whether the DeepSeek edited master_modeled file was found
-        self.master_list        = {}                        # Dictionary of all experiences. This contains the values procesed from DeepSeek
+        self.master_list        = None                      # Masterlist of all experiences. This contains the values procesed from DeepSeek
         self.max_model_id       = 0
 
 
@@ -110,7 +182,7 @@ class BulletRebuilder:
             install_models  = self.R1models[max_id:]
 
             # Get models already installed
-            curr_models     = ollama.list()
+            curr_models     = self.client.list()
 
             inst_models     = [ a['model'] for a in curr_models.models ]
 
@@ -122,7 +194,7 @@ class BulletRebuilder:
                 if not mdl in inst_models:
                     print( f"Model {mdl} not found!" )
                     print( f"Installing model {mdl}..." )
-                    ollama.pull(mdl)
+                    self.client.pull(mdl)
 
 
         ########## CONFIGURE PROMPT
@@ -137,6 +209,13 @@ class BulletRebuilder:
 
 
         ########## CONFIGURE MASTER LIST BULLET POINTS   
+        self.find_rebuild()
+
+    # DONE: Sets where the rewrites of the current model size are saved, and whether they already exist
+    def find_rebuild( self ):
+
+        self.master_mod_found = False
+
         # Check if pre-configured master-lists already exist in master_file directory
         # format will be master_file_name_{self.modelSize}.json
         if self.master_list == "":
@@ -146,25 +225,58 @@ class BulletRebuilder:
         mast_mod_fn         = base_name+"_"+self.modelSize+"b.json"
         self.master_modeled = os.path.join( self.save_dir, mast_mod_fn )
 
+        # The rewrites are stored as a variant of the candidate's bullets, named after the model
+        self.variant        = self.modelSize+"b"
+
         # Check if file already exists
-        if os.path.isfile( self.master_modeled ):
+        if self.store is not None:
+            if self.store.has_variant( self.candidate, self.variant ):
+                print( f"{self.variant} rewrites of '{self.candidate}' already exist! Will use these, unless forced overwrite set." )
+                self.master_mod_found = True
+        elif os.path.isfile( self.master_modeled ):
             print( f"{mast_mod_fn} already exists! Will use this file, unless forced overwrite set." )
             self.master_mod_found = True
 
         if self.force_rebuild:
-            if os.path.exists(self.master_modeled):
-                # Remove the file and start rebuild
-                os.remove( self.master_modeled )
+            if self.store is not None:
+                self.store.delete_variant( self.candidate, self.variant )
+            # The file isn't removed, since another run may be reading it. The rebuild replaces it atomically.
             self.master_mod_found = False
 
     # Processes all steps necessary for rebuilding the masterlist
+    @traced( "BulletRebuilder.process", "llm" )
     def process( self ):
 
+        # The store has its own transactions. Files are locked, so only one run rewrites them and the others wait and reuse them.
+        if self.store is not None:
+            return self.rebuild()
+
+        with key_lock( self.master_modeled ):
+            return self.rebuild()
+
+    # Loads the rebuilt masterlist, or rewrites the bullets with the LLM and saves it
+    def rebuild( self ):
+
+        # Another run may have saved the rewrites while this one waited for the lock. A truncated file counts as missing.
+        if self.store is None and not self.force_rebuild:
+            try:
+                self.master_list        = Masterlist.load( self.master_modeled )
+                self.master_mod_found   = True
+            except ( FileNotFoundError, ValueError ) as e:
+                if self.master_mod_found:
+                    print( f"Ignoring unreadable file {self.master_modeled}: {e}" )
+                self.master_mod_found   = False
+
+        # Track whether the rebuilt masterlist came from the cache
+        tracer.current().set( 'masterlist_cache', 'hit' if self.master_mod_found else 'miss' )
+
         # Check if master_mod_found. If so, just load this and return.
         if self.master_mod_found:
-            print( f"master_mod:\n({self.master_modeled})\nwas found! Using previously calculated results." )
-            with open(self.master_modeled, 'r') as file:
-                self.master_list = json.load( file )
+            if self.store is not None:
+                print( f"{self.variant} rewrites of '{self.candidate}' were found! Using previously calculated results." )
+                self.master_list = self.store.load( self.candidate, self.variant )
+            else:
+                print( f"master_mod:\n({self.master_modeled})\nwas found! Using previously calculated results." )
         else:
             # Create the self.master_modeled file from DeepSeek by using self.mList derived from parse_masterlist()
             self.parse_masterlist()
@@ -182,29 +294,33 @@ class BulletRebuilder:
                     if j < bc:
                         self.master_list['experiences'][i]['projects'][j]['description'] = n
 
-            # Create new JSON file from saved master_list
-            with open( self.master_modeled, 'w') as file:
-                json.dump( self.master_list, file, indent = 4 )
+            # Create new JSON file from saved master_list (or store the rewrites)
+            if self.store is not None:
+                self.store.save_variant( self.candidate, self.variant, self.master_list )
+            else:
+                self.master_list.save( self.master_modeled )
+
+            # Encode the new bullets (and the skills and projects) in the background, so scoring finds them stored
+            if self.precompute is not None:
+                if self.store is not None:
+                    self.precompute.start( candidate = self.candidate, variant = self.variant )
+                else:
+                    self.precompute.start( masterlist_file = self.master_modeled )
 
     # Opens the masterlist.json and builds out new lists from given models
     def parse_masterlist( self ):
 
         self.bullets_lists = []
 
-        # Check if masterlist exists
-        if not os.path.isfile(self.master_file):
-            raise FileNotFoundError( errno.ENOENT, os.strerror(errno.ENOENT), self.remastered_json )
-        # Check that it is JSON format
-        if not self.master_file.lower().strip().endswith( ".json" ):
-            raise ValueError("Unsupported file type. Only .json files are allowed.")
-        
-        # Continue parsing
-        with open(self.master_file, 'r') as file:
-            self.mList = json.load(file)
+        # Load a private copy, since the bullet descriptions are rewritten in place. Raises if missing or not JSON.
+        if self.store is not None:
+            self.mList = self.store.load( self.candidate )
+        else:
+            self.mList = Masterlist.load( self.master_file, cache = False )
 
         # Parse experiences into self.bullets_lists
-        for v in self.mList['experiences']:
-            self.bullets_lists.append( v['projects'] ) # Appends each experience list of bullets
+        for v in self.mList.experiences:
+            self.bullets_lists.append( v.projects ) # Appends each experience list of bullets
 
     # DONE: Returns the system info of the current machine
     def get_system_info( self ):
@@ -256,7 +372,7 @@ class BulletRebuilder:
         """
 
         # Set the model size v VRAM
-        modelSizesRAM   = { '671':1342, '70':32.7, '32':14.9, '14':6.5, '8':3.7, '7':3.3, '1.5':0.7 }
+        modelSizesRAM   = MODEL_RAM_GB
 
         # Get the system values
         sys_vals        = self.get_system_info()
@@ -285,11 +401,21 @@ class BulletRebuilder:
         # Return the greater of the two
         return max_VRAM_model if max_VRAM_model>=max_RAM_model else max_RAM_model
 
+    # DONE: Returns the model size for an LLM stage. With a scheduler, RAM is freed first, or a smaller model is chosen
+    #       when the headroom is low. The rewrites keep their size (allow_smaller = False), since it names the saved variant.
+    def llm_model( self, stage:str, allow_smaller:bool = True ):
+
+        size    = self.modelSize if self.scheduler is None else self.scheduler.plan_llm( stage, self.modelSize, allow_smaller = allow_smaller )
+        self.llm_models[stage] = size
+
+        return size
+
     # DONE: Processes the bullets lists from the master_list with the given DeepSeek model
+    @traced( "BulletRebuilder.process_master_list", "llm" )
     def process_master_list( self ):
         
         new_bullet_lists    = []
-        modelName           = f'deepseek-r1:{self.modelSize}b'
+        modelName           = f'deepseek-r1:{self.llm_model( "rewrite", allow_smaller = False )}b'
 
         # Get the length of the experiences
         exp_length = len( self.bullets_lists )
@@ -311,21 +437,43 @@ class BulletRebuilder:
             
             # Build request
             try:
-                response: ChatResponse = chat( model = modelName, messages = [
-                    {
-                        'role': 'user',
-                        'content': prompt,
-                    }
-                ]) #, format = BulletList.model_json_schema())
+                with tracer.span( "BulletRebuilder.chat", "llm", model = modelName, experience = i ) as sp:
+                    response: ChatResponse = self.client.chat( model = modelName, messages = [
+                        {
+                            'role': 'user',
+                            'content': prompt,
+                        }
+                    ], keep_alive = self.keep_alive ) #, format = BulletList.model_json_schema())
+                    self.record_tokens( sp, response )
                 new_bullet_lists.append( self.processLLMResponse( response.message.content ) )
                 #new_bullet_lists.append( BulletList.model_validate_json( response.message.content ) )
             except ResponseError as e:
                 if e.status_code == 404:
                     print( f"Model {modelName} not installed. Downloading model. Please Re-run" )
-                    pull(modelName)
+                    self.client.pull(modelName)
 
         return new_bullet_lists
 
+    # DONE: Loads the model into Ollama ahead of time so the first request doesn't pay for the model load
+    @traced( "BulletRebuilder.warm_model", "llm" )
+    def warm_model( self, modelSize:Optional[str] = None ):
+
+        modelName   = f'deepseek-r1:{self.modelSize if modelSize is None else modelSize}b'
+
+        try:
+            # An empty prompt only loads the model
+            self.client.generate( model = modelName, prompt = '', keep_alive = self.keep_alive )
+        except ResponseError as e:
+            if e.status_code == 404:
+                print( f"Model {modelName} not installed. Downloading model." )
+                self.client.pull(modelName)
+                self.client.generate( model = modelName, prompt = '', keep_alive = self.keep_alive )
+
+    # DONE: Attaches the token counts of an Ollama response to a trace span
+    def record_tokens( self, span, response ):
+        span.set( 'prompt_tokens', getattr( response, 'prompt_eval_count', None ) )
+        span.set( 'tokens_generated', getattr( response, 'eval_count', None ) )
+
     # DONE: Parses the text returned from the LLM into a usable list
     def processLLMResponse( self, response:str ):
 
@@ -351,21 +499,84 @@ class BulletRebuilder:
         print( f"Processing all models capable of running on this machine:\n   - {process_models_list}" )
         for m in process_models_list:
             print( f"Starting model deepseek-r1:{m}b..." )
-            self.modelSize = m
-            list_dir            = os.path.dirname( self.master_file )
-            base_name           = os.path.basename( self.master_file )[:-5]
-            mast_mod_fn         = base_name+"_"+m+"b.json"
-            self.master_modeled = os.path.join( list_dir, mast_mod_fn )
+            self.modelSize      = m
+            self.modelSizeFloat = float( m )
+
+            # Each model size has its own file (or store variant)
+            self.find_rebuild()
             self.process()
             print( f"model {m} JSON file saved!" )
 
-    # DONE Build a summary for a job posting
+    # DONE: Returns a text from the semantic cache if a near-identical posting was seen before, otherwise generates it and
+    #       caches it. `generate` takes no arguments and returns the generated text.
+    def cached_generation( self, kind:str, job_title:str, job_company:str, job_description:str, generate ):
+
+        if self.semantic_cache is None:
+            return generate()
+
+        # Texts are only reused for the same masterlist, model and prompt options
+        if self.cache_scope is None or self.cache_scope[0] is not self.master_list:
+            self.cache_scope    = ( self.master_list, json.dumps( self.master_list.to_dict(), sort_keys = True, default = json_default ) )
+        ml_json = self.cache_scope[1]
+
+        hit     = self.semantic_cache.lookup( scope_key( ml_json, self.modelSize, self.cache_options ), kind, job_description )
+        if hit is not None:
+            print( f"Reusing the {kind} of '{hit['job_title']}' at '{hit['job_company']}' (posting similarity {hit['similarity']:.3f})" )
+            return self.touchUp( hit['output'], hit['job_title'], hit['job_company'], job_title, job_company )
+
+        start   = time.perf_counter()
+        text    = generate()
+
+        # Cached under the model it was generated with. A text of a smaller model, chosen by the scheduler, is not
+        # reused when the requested model runs.
+        scope   = scope_key( ml_json, self.llm_models.get( kind, self.modelSize ), self.cache_options )
+        self.semantic_cache.put( scope, kind, job_description, job_title, job_company, text, time.perf_counter() - start )
+
+        return text
+
+    # DONE: Adapts a reused text to a new job title and company. The small touch-up model rewrites it, if set.
+    #       Otherwise the exact mentions of the old title and company are replaced.
+    @traced( "BulletRebuilder.touchUp", "llm" )
+    def touchUp( self, text:str, old_title:str, old_company:str, job_title:str, job_company:str ):
+
+        if old_title == job_title and old_company == job_company:
+            return text
+
+        replaced = replace_job( text, old_title, old_company, job_title, job_company )
+
+        if self.touchup_model is None:
+            return replaced
+
+        prompt      = f"The following text was written for the job '{old_title}' at '{old_company}'. Rewrite it for the job '{job_title}' at \
+            '{job_company}'. Only change the job title and company name, keep everything else exactly the same, and only respond with the text:\n \
+            '{text}'"
+
+        response: ChatResponse = self.client.chat( model = f'deepseek-r1:{self.touchup_model}b', messages = [
+            {
+                'role': 'user',
+                'content': prompt,
+            }
+        ], keep_alive = self.keep_alive )
+        self.record_tokens( tracer.current(), response )
+
+        # Keep the plain replacement if the model gives nothing back
+        touched = response.message.content.split( '</think>' )[-1].strip()
+        return touched if touched != "" else replaced
+
+    # DONE Build a summary for a job posting. Reused from the semantic cache for near-identical postings.
+    @traced( "BulletRebuilder.buildSummary", "llm" )
     def buildSummary( self, job_title, job_company, job_description ):
+        return self.cached_generation( 'summary', job_title, job_company, job_description,
+                                       lambda: self.generateSummary( job_title, job_company, job_description ) )
+
+    # DONE: Generates a summary for a job posting with the LLM
+    @traced( "BulletRebuilder.generateSummary", "llm" )
+    def generateSummary( self, job_title, job_company, job_description ):
         
         # Take the current summary I have, along with the job description, company, and title, to create a summary
         summary     = self.master_list['summary']
 
-        modelName   = f'deepseek-r1:{self.modelSize}b'
+        modelName   = f'deepseek-r1:{self.llm_model( "summary" )}b'
 
         # Initialize the prompt
         prompt      = f"You are an expert at preparing resumes with over 20 years of experience. \
@@ -470,12 +681,13 @@ class BulletRebuilder:
             to one paragraph that is four sentences long."
 
         # Process request
-        response: ChatResponse = chat( model = modelName, messages = [
+        response: ChatResponse = self.client.chat( model = modelName, messages = [
             {
                 'role': 'user',
                 'content': prompt,
             }
-        ]) #, format = BulletList.model_json_schema())
+        ], keep_alive = self.keep_alive ) #, format = BulletList.model_json_schema())
+        self.record_tokens( tracer.current(), response )
 
         # Remove <think> component
         r           = response.message.content
@@ -484,9 +696,23 @@ class BulletRebuilder:
         return resp[1]
     
     # Generates and saves a cover letter
+    @traced( "BulletRebuilder.buildCoverLetter", "llm" )
     def buildCoverLetter( self, job_title, job_company, job_description, save_dir = os.path.dirname(os.path.abspath(__file__)) ):
+
+        # The letter text is reused from the semantic cache for near-identical postings
+        new_rsp = self.cached_generation( 'cover_letter', job_title, job_company, job_description,
+                                          lambda: self.generateCoverLetter( job_title, job_company, job_description ) )
+
+        # Kept without the header, so a near-duplicate posting can reuse it (see PostingDedup)
+        self.cover_letter   = new_rsp
+
+        return save_cover_letter( new_rsp, self.master_list['about']['name'], job_title, job_company, save_dir )
+
+    # DONE: Generates the text of a cover letter with the LLM
+    @traced( "BulletRebuilder.generateCoverLetter", "llm" )
+    def generateCoverLetter( self, job_title, job_company, job_description ):
         
-        modelName   = f'deepseek-r1:{self.modelSize}b'
+        modelName   = f'deepseek-r1:{self.llm_model( "cover_letter" )}b'
 
         # Initialize the prompt
         prompt      = f"You are an expert at preparing resumes with over 20 years of experience. \
@@ -582,44 +808,20 @@ class BulletRebuilder:
         Keep the cover letter to one page long."
 
         # Process request
-        response: ChatResponse = chat( model = modelName, messages = [
+        response: ChatResponse = self.client.chat( model = modelName, messages = [
             {
                 'role': 'user',
                 'content': prompt,
             }
-        ]) #, format = BulletList.model_json_schema())
+        ], keep_alive = self.keep_alive ) #, format = BulletList.model_json_schema())
+        self.record_tokens( tracer.current(), response )
 
         # Remove <think> component
         r       = response.message.content
         resp    = r.split( '</think>' )
 
         # check for \u2082
-        new_rsp = resp[1].replace( "\u2082", "<sub>2</sub>" )
-
-        # Create a format for the cover letter in HTML
-        now     = datetime.now()
-        month   = now.strftime( "%B" )
-        ret     = "<!DOCTYPE html><html><head><title>Resume</title></head><body>"
-        ret     += f"<div class='cl_header'><div class='cl_date'>{now.day} {month}, {now.year}</div>"
-        ret     += f"<div class='cl_company'>{job_company}</div>"
-        ret     += "</div>"
-        ret     += f"<div class='cl_letter'>{new_rsp}</div>"
-        ret     += f"<div class='cl_signature'><div>Sincerely,</div><div>{self.master_list['about']['name']}</div></div>"
-        ret     += "</body></html>"
-
-        # Save the document and return it, just in case
-        lastname            = self.master_list['about']['name'].split()[-1]
-        jobTitle            = "".join(job_title.split())
-        comp_name           = job_company.split()[0]
-        basename            = f"{lastname}_{jobTitle.lower()}_{comp_name.lower()}"
-        basename            += "_coverletter.html"
-
-        save_file_loc       = os.path.join( save_dir, basename )
-
-        with open( save_file_loc, "w" ) as file:
-            file.write( ret )
-        
-        return ret, save_file_loc
+        return resp[1].replace( "\u2082", "<sub>2</sub>" )
 
 
 if __name__ == "__main__":
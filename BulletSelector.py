@@ -0,0 +1,125 @@
+'''
+
+    Title:          Bullet Selector
+
+    Description:    Chooses the resume bullets of all experiences together, instead of a fixed top-k in every experience. The
+                    total relevance of the chosen bullets is maximized under a page budget (lines or characters), with a
+                    minimum and maximum amount of bullets for each experience. A strong, recent role can get more lines than a
+                    weak, old one, and the resume length is controlled directly.
+
+                    Solved greedily with bounds over the precomputed scores: every experience first gets its `min_per` best
+                    bullets, then the remaining budget goes to the bullets with the most relevance per line/character. Only
+                    the next-best bullet of each experience is a candidate at any time, so each experience's bullets stay in
+                    score order. O(n log n), so it stays interactive with thousands of bullets.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import math
+import heapq
+from typing import Optional
+
+
+class BulletSelector:
+
+    def __init__( self,
+                budget:int              = 40,           # Total budget of the chosen bullets
+                unit:str                = "lines",      # 'lines' or 'chars'
+                line_chars:int          = 100,          # Characters that fit on a single line of the resume
+                min_per:int             = 1,            # Minimum bullets of each experience (if it has that many)
+                max_per:Optional[int]   = None ):       # Maximum bullets of each experience. None = no limit
+
+        if unit not in [ "lines", "chars" ]:
+            raise ValueError( f"Unsupported budget unit '{unit}'. Use 'lines' or 'chars'." )
+
+        self.budget     = budget
+        self.unit       = unit
+        self.line_chars = line_chars
+        self.min_per    = max( min_per, 0 )
+        self.max_per    = max_per
+        self.used       = 0
+
+    # DONE: Returns the budget a bullet takes up
+    def cost( self, text:str ):
+        if self.unit == "chars":
+            return max( len( text ), 1 )
+        return max( math.ceil( len( text )/self.line_chars ), 1 )
+
+    # DONE: Chooses the bullets. `experiences` are { 'type', 'title', 'bullets' } and `ratings` has one score per bullet, in order.
+    #       Returns the experiences in the BERTBullets format ( 'bullets' and 'BERTS' sorted by score ).
+    def select( self, experiences:list, ratings:list ):
+
+        # Sort each experience's bullets by score. Bullets dropped by a prefilter (-inf) are never chosen.
+        ranked  = []
+        offset  = 0
+        for exp in experiences:
+            n       = len( exp['bullets'] )
+            items   = [ ( r, b ) for r, b in zip( ratings[offset:offset+n], exp['bullets'] ) if r != float( '-inf' ) ]
+            items.sort( key = lambda x: x[0], reverse = True )
+            ranked.append( items )
+            offset  += n
+
+        limit   = [ len( items ) if self.max_per is None else min( len( items ), self.max_per ) for items in ranked ]
+        taken   = [ 0 ]*len( ranked )
+        used    = 0
+
+        # Every experience gets its minimum first, in order of how relevant its best bullet is
+        order   = sorted( range( len( ranked ) ), key = lambda i: -ranked[i][0][0] if len( ranked[i] ) > 0 else math.inf )
+        for i in order:
+            while taken[i] < min( self.min_per, limit[i] ):
+                c = self.cost( ranked[i][taken[i]][1]['description'] )
+                if used + c > self.budget:
+                    break
+                used        += c
+                taken[i]    += 1
+
+        # Then fill the rest of the budget with the best relevance per unit of budget.
+        # The heap only holds the next bullet of each experience.
+        heap    = []
+        for i, items in enumerate( ranked ):
+            if taken[i] < limit[i]:
+                score, b = items[taken[i]]
+                heapq.heappush( heap, ( -score/self.cost( b['description'] ), i ) )
+
+        while heap:
+            _, i        = heapq.heappop( heap )
+            score, b    = ranked[i][taken[i]]
+            c           = self.cost( b['description'] )
+
+            # Doesn't fit. Bullets further down this experience score lower, but may be shorter, so keep looking.
+            if used + c > self.budget:
+                if taken[i] + 1 < len( ranked[i] ):
+                    nxt = self.next_fitting( ranked[i], taken[i] + 1, self.budget - used )
+                    if nxt is not None:
+                        # Move the fitting bullet up, so the experience stays a prefix of its chosen bullets
+                        ranked[i].insert( taken[i], ranked[i].pop( nxt ) )
+                        s, nb = ranked[i][taken[i]]
+                        heapq.heappush( heap, ( -s/self.cost( nb['description'] ), i ) )
+                continue
+
+            used        += c
+            taken[i]    += 1
+            if taken[i] < limit[i]:
+                s, nb = ranked[i][taken[i]]
+                heapq.heappush( heap, ( -s/self.cost( nb['description'] ), i ) )
+
+        self.used = used
+
+        # Build the output, each experience sorted by score
+        out = []
+        for exp, items, k in zip( experiences, ranked, taken ):
+            chosen = sorted( items[:k], key = lambda x: x[0], reverse = True )
+            out.append( { 'type':exp['type'], 'title':exp['title'], 'bullets':[ b for _, b in chosen ], 'BERTS':[ s for s, _ in chosen ] } )
+
+        return out
+
+    # DONE: Index of the best bullet in items[start:] that fits in the remaining budget, or None
+    def next_fitting( self, items:list, start:int, remaining:int ):
+        for j in range( start, len( items ) ):
+            if self.cost( items[j][1]['description'] ) <= remaining:
+                return j
+        return None
@@ -0,0 +1,181 @@
+'''
+
+    Title:          Cache Manager
+
+    Description:    Keeps the disk use of the save directory bounded. Nothing used to delete the old files in
+                    `BERT_rebuilds`, `resumes` or `cover_letters`, so a long-lived host kept every ranking and resume it
+                    ever made. The rebuilt masterlists in `masterlist_rebuilds` have no default budget, since users correct
+                    them by hand; give the directory a budget to collect them too.
+
+                    Each directory has a size budget and an age budget. Every build records the files it used or produced,
+                    with the time, in a manifest (`cache_manifest.json`). Garbage collection first removes whatever is older
+                    than the age budget, then the least recently used entries until the directory fits its size budget. Files
+                    the manifest doesn't know fall back to their modification time. The artifacts of the latest build are
+                    never removed. In `BERT_rebuilds` the entries are the rankings in the RankingStore, which are dropped by
+                    compacting the segment.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import time
+from Tracer import tracer
+from SafeIO import atomic_write_json, read_json, key_lock
+from RankingStore import RankingStore, SEGMENT_FILE, INDEX_FILE
+
+
+MANIFEST_FILE   = "cache_manifest.json"
+
+# Size (MB) and age (days) budget of each directory. 0 = no limit. Directories without a budget are never collected.
+# masterlist_rebuilds is left out, so the hand-corrected rebuilds are never deleted without asking.
+DEFAULT_BUDGETS = { 'BERT_rebuilds':        { 'max_mb':200,  'max_age_days':90 },
+                    'resumes':              { 'max_mb':1000, 'max_age_days':365 },
+                    'cover_letters':        { 'max_mb':500,  'max_age_days':365 } }
+
+MB              = 1024**2
+
+
+class CacheManager:
+
+    def __init__( self,
+                save_dir:str,                   # The ResumeBuilder save directory holding the cache directories
+                budgets:dict    = None ):       # { directory:{ 'max_mb', 'max_age_days' } }. None = DEFAULT_BUDGETS
+
+        self.save_dir       = save_dir
+        self.budgets        = budgets if budgets is not None else DEFAULT_BUDGETS
+        self.manifest_file  = os.path.join( save_dir, MANIFEST_FILE )
+
+    # DONE: Reads the manifest. A missing or damaged manifest starts empty.
+    def load_manifest( self ):
+
+        manifest = read_json( self.manifest_file )
+        if not isinstance( manifest, dict ):
+            manifest = {}
+        manifest.setdefault( 'access', {} )
+        manifest.setdefault( 'latest', [] )
+        return manifest
+
+    # DONE: Returns the manifest name of a file (its path relative to the save directory)
+    def entry( self, path:str ):
+        return os.path.relpath( os.path.abspath( path ), os.path.abspath( self.save_dir ) ).replace( os.sep, "/" )
+
+    # DONE: Records the files of a build as accessed now. A ranking is given as the path of its key in the store's
+    #       directory (e.g. BERT_rebuilds/<key>). They become the latest build, which garbage collection never removes.
+    def record_build( self, paths:list ):
+
+        now     = time.time()
+        entries = [ self.entry( p ) for p in paths if p ]
+        with key_lock( self.manifest_file ):
+            manifest = self.load_manifest()
+            for e in entries:
+                manifest['access'][e] = now
+            manifest['latest'] = entries
+            atomic_write_json( self.manifest_file, manifest )
+
+    # DONE: Lists the entries of a directory as [ ( entry, bytes, last access ) ]
+    def scan( self, directory:str, manifest:dict ):
+
+        path    = os.path.join( self.save_dir, directory )
+        if not os.path.isdir( path ):
+            return []
+
+        found   = []
+        for name in os.listdir( path ):
+            full = os.path.join( path, name )
+            # Lock and temporary files, and the ranking store itself, aren't entries
+            if name.startswith( "." ) or name in ( SEGMENT_FILE, INDEX_FILE ) or not os.path.isfile( full ):
+                continue
+            e       = f"{directory}/{name}"
+            stat    = os.stat( full )
+            found.append( ( e, stat.st_size, manifest['access'].get( e, stat.st_mtime ) ) )
+
+        # The rankings in the store. Unrecorded ones count as last used when the segment was last written.
+        if os.path.isfile( os.path.join( path, SEGMENT_FILE ) ):
+            written = os.path.getmtime( os.path.join( path, SEGMENT_FILE ) )
+            for key, size in RankingStore.open( path ).sizes().items():
+                e = f"{directory}/{key}"
+                found.append( ( e, size, manifest['access'].get( e, written ) ) )
+
+        return found
+
+    # DONE: Chooses the entries of a directory to remove: too old first, then least recently used until it fits the budget
+    def plan( self, directory:str, found:list, manifest:dict, now:float ):
+
+        budget  = self.budgets.get( directory, {} )
+        max_b   = budget.get( 'max_mb', 0 )*MB
+        max_age = budget.get( 'max_age_days', 0 )*86400.
+        latest  = set( manifest['latest'] )
+
+        found   = sorted( found, key = lambda f: f[2] )
+        total   = sum( f[1] for f in found )
+        remove  = []
+        for e, size, used in found:
+            if e in latest:
+                continue
+            if ( max_age > 0 and now - used > max_age ) or ( max_b > 0 and total > max_b ):
+                remove.append( ( e, size ) )
+                total -= size
+
+        return remove, total
+
+    # DONE: Removes the entries over the budgets of every directory. Returns what was (or, with dry_run, would be) reclaimed.
+    def gc( self, dry_run:bool = False ):
+
+        report  = {}
+        now     = time.time()
+        with tracer.span( "CacheManager.gc", "io" ) as sp, key_lock( self.manifest_file ):
+
+            manifest = self.load_manifest()
+            for directory in self.budgets:
+                # Forget the entries that are gone (removed by hand, or by another run)
+                found   = self.scan( directory, manifest )
+                present = set( e for e, _, _ in found )
+                for e in [ e for e in manifest['access'] if e.startswith( directory + "/" ) and e not in present ]:
+                    manifest['access'].pop( e )
+
+                remove, total   = self.plan( directory, found, manifest, now )
+                report[directory] = { 'removed':len( remove ), 'reclaimed_bytes':sum( s for _, s in remove ), 'remaining_bytes':total }
+                if dry_run or len( remove ) == 0:
+                    continue
+
+                path    = os.path.join( self.save_dir, directory )
+                store   = os.path.isfile( os.path.join( path, SEGMENT_FILE ) )
+                keys    = set()
+                for e, _ in remove:
+                    full = os.path.join( self.save_dir, *e.split( "/" ) )
+                    if os.path.isfile( full ):
+                        try:
+                            os.remove( full )
+                        except OSError as err:
+                            print( f"Could not remove {e}: {err}" )
+                    elif store:
+                        keys.add( e.split( "/", 1 )[1] )
+                    manifest['access'].pop( e, None )
+
+                # Dropped rankings leave the segment when it is compacted
+                if len( keys ) > 0:
+                    RankingStore.open( path ).compact( drop = keys )
+
+            if not dry_run:
+                atomic_write_json( self.manifest_file, manifest )
+
+            sp.set( 'reclaimed_bytes', sum( r['reclaimed_bytes'] for r in report.values() ) )
+
+        return report
+
+
+if __name__ == "__main__":
+
+    # The save directory to clean up. Set dry_run = False to actually remove the files.
+    save_directory  = os.path.dirname( os.path.abspath( __file__ ) )
+    dry_run         = True
+
+    report = CacheManager( save_directory ).gc( dry_run = dry_run )
+    for directory, r in report.items():
+        print( f"{directory:<20} {r['removed']:6d} entries, {r['reclaimed_bytes']/MB:10.2f} MB {'reclaimable' if dry_run else 'reclaimed'}, "
+               f"{r['remaining_bytes']/MB:10.2f} MB left" )
+    print( f"Total: {sum( r['reclaimed_bytes'] for r in report.values() )/MB:.2f} MB {'reclaimable' if dry_run else 'reclaimed'}" )
@@ -0,0 +1,139 @@
+'''
+
+    Title:          Embedding Precompute
+
+    Description:    Encodes a rebuilt masterlist ahead of time. The bullets, skills and projects only change when the
+                    masterlist is rebuilt, yet their embeddings used to be computed on the first scoring request that needed
+                    them, which put the model load and the encoding of every text on that request.
+
+                    When the rewrites are saved, a separate process encodes every bullet description, skill and subskill name
+                    and project text, formatted exactly as the BERT scorers format them, into the embedding store (the
+                    `embeddings` table of a MasterlistStore). Texts that are already stored are skipped. Scoring waits for a
+                    running precompute of its store before it starts, so it only reads the stored vectors and encodes nothing
+                    but the posting. A precompute started by another process holds a file lock on the store until it is done.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import time
+import threading
+import multiprocessing
+from filelock import Timeout
+from Tracer import tracer
+from Masterlist import Masterlist
+from MasterlistStore import MasterlistStore, ORIGINAL
+from BERTEncoder import BERTEncoder
+from SafeIO import key_lock
+
+
+EMBEDDINGS_FILE = "embeddings.db"
+
+
+# DONE: Returns the masterlist texts the BERT scorers embed, formatted as they format them (see BERTBullets, BERTSkills,
+#       BERTProjects and SkillGraph), grouped as { 'bullets', 'skills', 'projects' }
+def masterlist_groups( mList ):
+
+    return { 'bullets':     [ b['description'] for exp in mList['experiences'] for b in exp['projects'] ],
+             'skills':      [ s['skill'] for s in list( mList['skills'] ) + list( mList['subskills'] ) ],
+             'projects':    [ f"{p['title']} - {p['description']}" for p in mList['projects'] ] }
+
+
+# DONE: Returns every masterlist text the BERT scorers embed. Duplicates are only listed once.
+def masterlist_texts( mList ):
+    return list( dict.fromkeys( t for texts in masterlist_groups( mList ).values() for t in texts ) )
+
+
+# DONE: Encodes the texts of a masterlist into the embedding store. Runs in the precompute process.
+#       The masterlist is read from a JSON file, or from the store as a candidate's variant.
+def encode_masterlist( db_file:str, BERTModel:str, masterlist_file:str = "", candidate:str = "", variant:str = ORIGINAL ):
+
+    start   = time.perf_counter()
+    with key_lock( db_file ):
+        store   = MasterlistStore( db_file )
+        try:
+            mList   = Masterlist.load( masterlist_file, cache = False ) if masterlist_file else store.load( candidate, variant )
+            texts   = masterlist_texts( mList )
+            missing = [ t for t in texts if t not in store.get_embeddings( BERTModel, texts ) ]
+
+            # The encoder stores what it encodes
+            if len( missing ) > 0:
+                BERTEncoder( BERTModel = BERTModel, store = store ).encode( missing )
+        finally:
+            store.close()
+
+    print( f"Embedding precompute: {len( missing )} of {len( texts )} masterlist texts encoded in {time.perf_counter() - start:.2f} s" )
+
+    return len( texts ), len( missing )
+
+
+class EmbeddingPrecompute:
+
+    # Running precompute processes of each store, shared by every instance in the process
+    _running    = {}
+    _glock      = threading.Lock()
+
+    def __init__( self,
+                db_file:str,                                    # MasterlistStore database the embeddings are written to
+                BERTModel:str       = "all-mpnet-base-v2" ):    # The BERT model the scorers use
+
+        self.db_file    = db_file
+        self.BERTModel  = BERTModel
+
+        # Make sure the store exists before the first process or reader opens it
+        MasterlistStore( db_file ).close()
+
+    # DONE: Starts encoding a masterlist in a separate process and returns the process.
+    #       Pass the JSON file of the masterlist, or the candidate and variant it is stored as.
+    def start( self, masterlist_file:str = "", candidate:str = "", variant:str = ORIGINAL ):
+
+        # Spawned, not forked, since a fork of a process with the model loaded (and its threads running) can hang
+        ctx     = multiprocessing.get_context( "spawn" )
+        proc    = ctx.Process( target = encode_masterlist, args = ( self.db_file, self.BERTModel, masterlist_file, candidate, variant ),
+                               name = "EmbeddingPrecompute" )
+        proc.start()
+
+        with EmbeddingPrecompute._glock:
+            EmbeddingPrecompute._running.setdefault( self.db_file, [] ).append( proc )
+
+        tracer.current().set( 'embedding_precompute', 'started' )
+        print( f"Embedding precompute started for {masterlist_file or f'{candidate} ({variant})'}" )
+
+        return proc
+
+    # DONE: Whether a precompute of this store is still running in this process
+    def running( self ):
+        with EmbeddingPrecompute._glock:
+            return any( p.is_alive() for p in EmbeddingPrecompute._running.get( self.db_file, [] ) )
+
+    # DONE: Waits until the running precomputes of this store are done. Returns False if the timeout ran out first.
+    def wait( self, timeout:float = None ):
+
+        with EmbeddingPrecompute._glock:
+            procs = list( EmbeddingPrecompute._running.get( self.db_file, [] ) )
+
+        start   = time.perf_counter()
+        done    = True
+        with tracer.span( "EmbeddingPrecompute.wait", "bert", processes = len( procs ) ) as sp:
+            for p in procs:
+                p.join( None if timeout is None else max( 0., timeout - ( time.perf_counter() - start ) ) )
+                done = done and not p.is_alive()
+
+            # A precompute started by another process holds the lock of the store until it is done
+            if done:
+                try:
+                    with key_lock( self.db_file, timeout = -1 if timeout is None else max( 0., timeout - ( time.perf_counter() - start ) ) ):
+                        pass
+                except Timeout:
+                    done = False
+
+            sp.set( 'waited_s', round( time.perf_counter() - start, 3 ) )
+
+        # Forget the finished processes
+        with EmbeddingPrecompute._glock:
+            EmbeddingPrecompute._running[self.db_file] = [ p for p in EmbeddingPrecompute._running.get( self.db_file, [] ) if p.is_alive() ]
+
+        return done
@@ -0,0 +1,327 @@
+'''
+
+    Title:          Job Corpus Index
+
+    Description:    The other direction of the ResumeBuilder: instead of picking the bullets that fit one posting, rank a large
+                    local corpus of saved postings by how well they fit the masterlist. Running the ResumeBuilder once per
+                    posting is far too slow for that.
+
+                    Postings are embedded once, with the same encoder as the scorers (a BERTEncoder, or the StaticEncoder for
+                    large feeds), and appended to a float32 matrix on disk that is memory-mapped, not loaded. An inverted file
+                    index (IVF) clusters the vectors with spherical k-means and stores each cluster's vectors contiguously, so a
+                    query only scores the postings of its `nprobe` nearest clusters. Postings added after the last build are
+                    scored exactly until the next one. The query is a candidate profile vector: the weighted mean of the
+                    masterlist's bullet, skill and project embeddings.
+
+                    Files (in the index directory):
+                        vectors.f32         Embeddings of every posting, in the order they were added
+                        postings.jsonl      The postings, one JSON line each, with line offsets in offsets.npy
+                        ivf.npz             Cluster centroids, posting ids in cluster order and the cluster offsets
+                        ivf_vectors.f32     The embeddings in cluster order
+                        index.json          Model, dimensions, posting count and how many are in the IVF
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import io
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import scipy.sparse as sp
+from Tracer import tracer
+from BERTEncoder import BERTEncoder
+from SafeIO import atomic_write, atomic_write_json, atomic_open, read_json, key_lock
+from EmbeddingPrecompute import masterlist_groups
+
+
+VECTORS_FILE        = "vectors.f32"
+POSTINGS_FILE       = "postings.jsonl"
+OFFSETS_FILE        = "offsets.npy"
+IVF_FILE            = "ivf.npz"
+IVF_VECTORS_FILE    = "ivf_vectors.f32"
+INDEX_FILE          = "index.json"
+
+# Weight of each part of the masterlist in the candidate profile vector
+PROFILE_WEIGHTS     = { 'bullets':0.6, 'skills':0.2, 'projects':0.2 }
+
+
+# DONE: Returns the text of a posting that is embedded (the same as the triage in ResumeService)
+def posting_text( posting:dict ):
+    return f"{posting.get( 'job_title', '' )} {posting.get( 'job_desc', '' )}"
+
+
+# DONE: Returns the key of a posting. The same posting is only indexed once.
+def posting_key( posting:dict ):
+    return hashlib.sha1( f"{posting.get( 'job_company', '' )}\x1e{posting_text( posting )}".encode( "utf-8" ) ).hexdigest()
+
+
+# DONE: Returns the candidate profile vector of a masterlist: the weighted mean of the mean bullet, skill and project
+#       embeddings, normalized
+def profile_vector( encoder, mList, weights:dict = None ):
+
+    weights = weights if weights is not None else PROFILE_WEIGHTS
+    groups  = masterlist_groups( mList )
+    vec     = None
+    for part, w in weights.items():
+        if w <= 0 or len( groups.get( part, [] ) ) == 0:
+            continue
+        mean    = np.asarray( encoder.encode( groups[part] ), dtype = np.float32 ).mean( axis = 0 )
+        vec     = w*mean if vec is None else vec + w*mean
+
+    if vec is None:
+        raise ValueError( "The masterlist has no bullets, skills or projects to build a profile from" )
+
+    return ( vec/max( np.linalg.norm( vec ), 1e-12 ) ).astype( np.float32 )
+
+
+# DONE: Returns the top-k of ids by score, best first
+def top_k( ids:np.ndarray, scores:np.ndarray, k:int ):
+
+    if len( scores ) > k:
+        keep        = np.argpartition( -scores, k - 1 )[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.argsort( -scores, kind = "stable" )
+
+    return [ ( int( ids[i] ), float( scores[i] ) ) for i in order ]
+
+
+class JobCorpusIndex:
+
+    def __init__( self,
+                directory:str,                  # Directory of the index files. Created if missing.
+                encoder             = None ):   # Encoder of the postings and the profile. None = BERTEncoder(). Use the same one every time.
+
+        self.directory  = directory
+        self.encoder    = encoder if encoder is not None else BERTEncoder()
+        os.makedirs( directory, exist_ok = True )
+
+        self.load()
+
+    # DONE: Returns the path of an index file
+    def path( self, name:str ):
+        return os.path.join( self.directory, name )
+
+    # DONE: Opens the index files. The matrices are memory-mapped, so only the parts a query reads are paged in.
+    def load( self ):
+
+        self.info       = read_json( self.path( INDEX_FILE ) ) or { 'model':self.encoder.BERTModel, 'dim':0, 'count':0, 'indexed':0, 'nlist':0 }
+        if self.info['count'] > 0 and self.info['model'] != self.encoder.BERTModel:
+            raise ValueError( f"The index in {self.directory} was built with {self.info['model']}, not {self.encoder.BERTModel}" )
+
+        count, dim      = self.info['count'], self.info['dim']
+        self.vectors    = np.memmap( self.path( VECTORS_FILE ), dtype = np.float32, mode = "r", shape = ( count, dim ) ) if count > 0 \
+                          else np.zeros( ( 0, dim ), dtype = np.float32 )
+        self.offsets    = np.load( self.path( OFFSETS_FILE ) ) if count > 0 else np.zeros( 1, dtype = np.int64 )
+
+        self.centroids  = None
+        if self.info['indexed'] > 0:
+            with np.load( self.path( IVF_FILE ) ) as ivf:
+                self.centroids, self.ids, self.bounds = ivf['centroids'], ivf['ids'], ivf['bounds']
+            self.ivf_vectors = np.memmap( self.path( IVF_VECTORS_FILE ), dtype = np.float32, mode = "r", shape = ( self.info['indexed'], dim ) )
+
+    # DONE: Number of postings in the index
+    def __len__( self ):
+        return self.info['count']
+
+    # DONE: Keys of the postings in the index
+    def keys( self ):
+
+        keys = set()
+        if self.info['count'] > 0:
+            with open( self.path( POSTINGS_FILE ), "r", encoding = "utf-8" ) as file:
+                for _ in range( self.info['count'] ):
+                    keys.add( json.loads( file.readline() )['key'] )
+
+        return keys
+
+    # DONE: Embeds postings and appends them to the index. Postings already in it are skipped. Returns how many were added.
+    #       Each posting is a dictionary with 'job_title', 'job_company' and 'job_desc', and any other fields (e.g. a url).
+    def add( self, postings:list ):
+
+        with tracer.span( "JobCorpusIndex.add", "bert", postings = len( postings ) ) as span, key_lock( self.path( INDEX_FILE ) ):
+            # Another process may have added postings since this one loaded the index
+            self.load()
+            count   = self.info['count']
+            dim     = self.info['dim']
+            seen    = self.keys()
+            new     = []
+            for p in postings:
+                key = posting_key( p )
+                if key not in seen:
+                    seen.add( key )
+                    new.append( dict( p, key = key ) )
+
+            span.set( 'added', len( new ) )
+            if len( new ) == 0:
+                return 0
+
+            vecs    = np.asarray( self.encoder.encode( [ posting_text( p ) for p in new ] ), dtype = np.float32 ).reshape( len( new ), -1 )
+            dim     = dim or vecs.shape[1]
+
+            # Anything past the recorded count was left by a write that didn't finish, and is overwritten
+            mode    = "r+b" if count > 0 else "wb"
+            with open( self.path( VECTORS_FILE ), mode ) as file:
+                file.truncate( count*dim*4 )
+                file.seek( count*dim*4 )
+                file.write( vecs.tobytes() )
+                file.flush()
+                os.fsync( file.fileno() )
+
+            offsets = [ int( self.offsets[-1] ) ]
+            with open( self.path( POSTINGS_FILE ), mode ) as file:
+                file.truncate( offsets[0] )
+                file.seek( offsets[0] )
+                for p in new:
+                    line = ( json.dumps( p ) + "\n" ).encode( "utf-8" )
+                    file.write( line )
+                    offsets.append( offsets[-1] + len( line ) )
+                file.flush()
+                os.fsync( file.fileno() )
+
+            # The new count is recorded last, so a crash before it leaves the index as it was
+            buffer  = io.BytesIO()
+            np.save( buffer, np.concatenate( ( self.offsets[:-1], np.asarray( offsets, dtype = np.int64 ) ) ) )
+            atomic_write( self.path( OFFSETS_FILE ), buffer.getvalue() )
+            atomic_write_json( self.path( INDEX_FILE ), dict( self.info, model = self.encoder.BERTModel, dim = dim, count = count + len( new ) ) )
+            self.load()
+
+        return len( new )
+
+    # DONE: Clusters the postings with spherical k-means and writes the IVF. nlist = 0 picks about 4*sqrt( postings ) clusters.
+    #       The centroids are trained on a sample, then every posting is assigned to its nearest one.
+    def build( self, nlist:int = 0, iters:int = 10, sample:int = 50000, seed:int = 0, chunk:int = 65536 ):
+
+        with tracer.span( "JobCorpusIndex.build", "bert" ) as span, key_lock( self.path( INDEX_FILE ) ):
+            self.load()
+            count   = self.info['count']
+            if count == 0:
+                return 0
+
+            start   = time.perf_counter()
+            rng     = np.random.default_rng( seed )
+            nlist   = min( nlist if nlist > 0 else int( 4*np.sqrt( count ) ), count )
+            train   = np.asarray( self.vectors[np.sort( rng.choice( count, min( sample, count ), replace = False ) )] )
+            cents   = train[rng.choice( len( train ), nlist, replace = False )].copy()
+
+            for _ in range( iters ):
+                assign  = self.assign( train, cents )
+                member  = sp.csr_matrix( ( np.ones( len( assign ), dtype = np.float32 ), ( assign, np.arange( len( assign ) ) ) ), shape = ( nlist, len( train ) ) )
+                sums    = np.asarray( member @ train )
+
+                # Empty clusters start over from a random posting
+                empty           = np.flatnonzero( np.asarray( member.sum( axis = 1 ) ).ravel() == 0 )
+                sums[empty]     = train[rng.choice( len( train ), len( empty ) )]
+                cents           = sums/np.maximum( np.linalg.norm( sums, axis = 1, keepdims = True ), 1e-12 )
+
+            assign  = np.concatenate( [ self.assign( np.asarray( self.vectors[i:i + chunk] ), cents ) for i in range( 0, count, chunk ) ] )
+            ids     = np.argsort( assign, kind = "stable" )
+            bounds  = np.searchsorted( assign[ids], np.arange( nlist + 1 ) )
+
+            with atomic_open( self.path( IVF_VECTORS_FILE ), binary = True ) as file:
+                for i in range( 0, count, chunk ):
+                    file.write( np.asarray( self.vectors[ids[i:i + chunk]] ).tobytes() )
+            buffer  = io.BytesIO()
+            np.savez( buffer, centroids = cents.astype( np.float32 ), ids = ids.astype( np.int64 ), bounds = bounds.astype( np.int64 ) )
+            atomic_write( self.path( IVF_FILE ), buffer.getvalue() )
+            atomic_write_json( self.path( INDEX_FILE ), dict( self.info, indexed = count, nlist = nlist ) )
+            self.load()
+
+            span.set( 'nlist', nlist )
+            print( f"Job corpus index built: {count} postings in {nlist} clusters ({time.perf_counter() - start:.2f} s)" )
+
+        return nlist
+
+    # DONE: Returns the nearest centroid of each vector
+    def assign( self, vecs:np.ndarray, cents:np.ndarray ):
+        return np.argmax( vecs @ cents.T, axis = 1 )
+
+    # DONE: Returns the query vector of a text, a masterlist (its profile vector) or a vector
+    def query_vector( self, query ):
+
+        if isinstance( query, str ):
+            return np.asarray( self.encoder.encode( query ), dtype = np.float32 )
+        if isinstance( query, np.ndarray ):
+            return query.astype( np.float32 )
+
+        return profile_vector( self.encoder, query )
+
+    # DONE: Returns the k postings closest to the query as [ ( posting id, score ) ], best first. Only the postings of the
+    #       nprobe nearest clusters are scored, and those added since the last build.
+    def search( self, query, k:int = 20, nprobe:int = 32 ):
+
+        q       = self.query_vector( query )
+        ids     = []
+        scores  = []
+        indexed = self.info['indexed']
+
+        if self.centroids is not None:
+            probe   = np.argsort( -( self.centroids @ q ) )[:nprobe]
+            for c in probe:
+                a, b = self.bounds[c], self.bounds[c + 1]
+                ids.append( self.ids[a:b] )
+                scores.append( self.ivf_vectors[a:b] @ q )
+
+        if self.info['count'] > indexed:
+            ids.append( np.arange( indexed, self.info['count'] ) )
+            scores.append( self.vectors[indexed:] @ q )
+
+        if len( ids ) == 0:
+            return []
+
+        return top_k( np.concatenate( ids ), np.concatenate( scores ), k )
+
+    # DONE: Returns the k postings closest to the query, scoring every posting
+    def exact_search( self, query, k:int = 20 ):
+
+        q = self.query_vector( query )
+        return top_k( np.arange( self.info['count'] ), np.asarray( self.vectors @ q ), k ) if self.info['count'] > 0 else []
+
+    # DONE: Returns a posting by its id
+    def posting( self, pid:int ):
+
+        with open( self.path( POSTINGS_FILE ), "rb" ) as file:
+            file.seek( int( self.offsets[pid] ) )
+            return json.loads( file.readline() )
+
+    # DONE: Returns the k postings that fit a masterlist best, with their fit score
+    def rank( self, mList, k:int = 20, nprobe:int = 32 ):
+        return [ dict( self.posting( pid ), id = pid, fit = round( score, 4 ) ) for pid, score in self.search( mList, k = k, nprobe = nprobe ) ]
+
+
+if __name__ == "__main__":
+
+    from StaticEncoder import StaticEncoder
+    from MasterlistGenerator import MasterlistGenerator
+
+    # Builds an index of synthetic postings with the static tier, then times the profile queries and checks their recall
+    # against an exact scan. Point `directory` at your own index and add your saved postings with JCI.add( [ ... ] ).
+    directory   = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "job_corpus" )
+    postings    = 100000
+    k           = 20
+    nprobe      = 32
+
+    MG      = MasterlistGenerator( experiences = 10, bullets_per = 20 )
+    JCI     = JobCorpusIndex( directory, encoder = StaticEncoder() )
+    if len( JCI ) < postings:
+        JCI.add( MG.postings( postings ) )
+    JCI.build()
+
+    queries = [ MasterlistGenerator( experiences = 10, bullets_per = 20, seed = s ).generate() for s in range( 20 ) ]
+    vecs    = [ JCI.query_vector( q ) for q in queries ]
+    start   = time.perf_counter()
+    found   = [ JCI.search( v, k = k, nprobe = nprobe ) for v in vecs ]
+    ivf_ms  = ( time.perf_counter() - start )/len( vecs )*1000
+    start   = time.perf_counter()
+    exact   = [ JCI.exact_search( v, k = k ) for v in vecs ]
+    full_ms = ( time.perf_counter() - start )/len( vecs )*1000
+    recall  = np.mean( [ len( set( i for i, _ in f ) & set( i for i, _ in e ) )/k for f, e in zip( found, exact ) ] )
+
+    print( f"{len( JCI )} postings: {ivf_ms:.2f} ms per IVF query (nprobe = {nprobe}), {full_ms:.2f} ms per exact scan, recall@{k} = {recall:.3f}" )
+    for p in JCI.rank( queries[0], k = 5 ):
+        print( f"  {p['fit']:.3f}  {p['job_title']} at {p['job_company']}" )
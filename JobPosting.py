@@ -0,0 +1,225 @@
+'''
+
+    Title:          Job Posting
+
+    Description:    Splits a job posting into its headed sections and sentences, and strips the boilerplate (EEO statements,
+                    legal/export notices, clearance and citizenship paragraphs, benefits, pay and work-schedule text,
+                    application instructions). What is left is a compact "requirements" view of the posting. That view is
+                    what the BERT scorers embed and what the summary and cover letter prompts quote. The job vector isn't
+                    diluted by legal text, and the LLM prefill isn't spent on it.
+
+                    Each sentence is classified by fast regex rules first. Distinctive phrases ("equal opportunity employer",
+                    "401(k)") are enough on their own. Generic words ("benefits", "citizenship") need a second hit, or
+                    support from the embedding check. Sentences the rules don't settle are compared against a small set of
+                    boilerplate prototype sentences. The prototype embeddings are computed once per BERT model and kept.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import re
+import threading
+from Tracer import tracer
+
+
+# Phrases that mark a sentence as boilerplate on their own
+STRONG_RULES    = {
+    'eeo':          [ r"equal (employment )?opportunity", r"affirmative action", r"protected veteran", r"without regard to (race|sex|age|religion)",
+                      r"sexual orientation", r"gender identity", r"national origin", r"reasonable accommodation", r"\beeo\b" ],
+    'legal':        [ r"national defense authorization act", r"\bndaa\b", r"export control", r"\bitar\b", r"e-verify", r"at-will",
+                      r"drug (test|screen)", r"background (check|investigation)", r"pre-employment", r"prohibits citizens" ],
+    'clearance':    [ r"security clearance", r"\b[ql]-level\b", r"clearance which requires", r"\bts/sci\b", r"top secret" ],
+    'benefits':     [ r"\b401\(?k\)?", r"paid time off", r"\bpto\b", r"(salary|pay|compensation) range", r"\$\s?\d", r"tuition (reimbursement|assistance)",
+                      r"hybrid schedule", r"work from home", r"probationary period", r"relocation (assistance|package|benefits)" ],
+    'application':  [ r"how to apply", r"click (on )?apply", r"applicants (will|must|should) (be notified|submit)", r"job (requisition|id)", r"recruit(er|ment) (team|process)" ],
+}
+
+# Words that are often boilerplate, but also show up in real requirements. Two hits, or one plus the embedding check, are needed.
+WEAK_RULES      = {
+    'legal':        [ r"citizenship", r"permanent residen", r"in compliance with", r"\bsection \d+", r"eligible to (work|access)", r"sponsorship" ],
+    'benefits':     [ r"\bbenefits?\b", r"health (insurance|care|plan)", r"\bdental\b", r"\bvision\b", r"retirement", r"vacation", r"remote", r"telework",
+                      r"flexib(le|ility)", r"perks", r"competitive (salary|pay)", r"relocation" ],
+    'about':        [ r"\bour (mission|values|culture)\b", r"we are (a|an|the) (leading|premier|world)", r"founded in \d{4}" ],
+}
+
+# Headings whose whole section is boilerplate
+BOILERPLATE_HEADINGS = re.compile( r"^(benefits|perks|compensation|pay|salary|equal|eeo|about (us|the (company|team|lab|laboratory))|additional information|"
+                                   r"legal|disclaimer|notice|security clearance|clearance|why (work|join)|what we offer|how to apply|important information)", re.I )
+
+# Example boilerplate sentences. Sentences close to any of these count as boilerplate.
+PROTOTYPES      = [
+    "We are an equal opportunity employer and all qualified applicants will receive consideration without regard to race, color, religion, sex, or national origin.",
+    "Reasonable accommodations are available for applicants with disabilities during the application process.",
+    "Candidates must be eligible to access the facility in compliance with federal law.",
+    "This position requires the ability to obtain and maintain a security clearance, which requires U.S. citizenship.",
+    "Employment is contingent upon a successful background check and drug screening.",
+    "We offer competitive salary, health, dental and vision insurance, a 401(k) plan and paid time off.",
+    "This position may offer a hybrid schedule with the flexibility to work from home after a probationary period.",
+    "The pay range for this position is listed below and depends on experience.",
+    "To apply, submit your resume and cover letter through our careers website.",
+    "Our company is a world leader in innovation, and our mission is to make the world a better place.",
+]
+
+# Sentence ends, skipping initials and abbreviations like "U.S." and "e.g."
+SENTENCE_RE     = re.compile( r"(?<!\b[A-Za-z]\.)(?<![A-Z]\.[A-Z]\.)(?<!\be\.g\.)(?<!\bi\.e\.)(?<=[.!?])\s+(?=[A-Z(\"'])" )
+
+_compiled       = { kind:[ re.compile( p, re.I ) for p in pats ] for kind, pats in STRONG_RULES.items() }
+_compiled_weak  = { kind:[ re.compile( p, re.I ) for p in pats ] for kind, pats in WEAK_RULES.items() }
+
+
+# DONE: Rough token count (~4 characters per token, as used by the mock Ollama server)
+def estimate_tokens( text:str ):
+    return max( 1, len( text )//4 ) if len( text ) > 0 else 0
+
+
+# DONE: Whether a line of the posting looks like a section heading (short, no sentence punctuation)
+def is_heading( line:str ):
+    words = line.split()
+    return 0 < len( words ) <= 6 and not line.rstrip().endswith( ( ".", "!", "?", ",", ";" ) ) and line[0].isupper()
+
+
+# DONE: Splits a paragraph into sentences
+def split_sentences( text:str ):
+    return [ s.strip() for s in SENTENCE_RE.split( text.strip() ) if s.strip() != "" ]
+
+
+# DONE: Applies the regex rules to a sentence. Returns ( kind, strong ) of the best match, or ( None, 0 ) if no rule matched.
+#       strong is 2 for a distinctive phrase or two generic words, 1 for a single generic word.
+def rule_match( sentence:str ):
+
+    for kind, pats in _compiled.items():
+        if any( p.search( sentence ) for p in pats ):
+            return kind, 2
+
+    best, hits = None, 0
+    for kind, pats in _compiled_weak.items():
+        n = sum( 1 for p in pats if p.search( sentence ) )
+        if n > hits:
+            best, hits = kind, n
+    return best, min( hits, 2 )
+
+
+class JobPosting:
+
+    # Prototype embeddings, computed once for each BERT model
+    _prototypes = {}
+    _lock       = threading.Lock()
+
+    def __init__( self,
+                text:str,                           # The job posting
+                encoder             = None,         # Optional BERTEncoder for the prototype check. None = rules only
+                threshold:float     = 0.6,          # Similarity to a prototype above which a sentence is boilerplate
+                weak_threshold:float= 0.45 ):       # Lower similarity that confirms a single generic-word rule hit
+
+        self.text           = text
+        self.encoder        = encoder
+        self.threshold      = threshold
+        self.weak_threshold = weak_threshold
+
+        # [ { 'heading', 'sentences':[ { 'text', 'kind', 'reason' } ] } ]. kind is None for requirement text
+        self.sections       = []
+        self.requirements   = ""
+        self.report         = {}
+
+        self.parse()
+
+    # DONE: Returns the prototype embeddings for the encoder's model
+    def prototypes( self ):
+
+        with JobPosting._lock:
+            if self.encoder.BERTModel not in JobPosting._prototypes:
+                JobPosting._prototypes[self.encoder.BERTModel] = self.encoder.encode( PROTOTYPES )
+
+        return JobPosting._prototypes[self.encoder.BERTModel]
+
+    # DONE: Splits the posting into sections, classifies every sentence and builds the requirements view
+    def parse( self ):
+
+        with tracer.span( "JobPosting.parse", "bert" ) as sp:
+
+            # Sections start at each heading. Every other line is a paragraph of the current section.
+            # Only a short line after a blank line is a heading. Short lines in a list (e.g. "Dental, vision") are sentences.
+            section = { 'heading':"", 'boilerplate':False, 'sentences':[] }
+            self.sections = [ section ]
+            blank   = True
+            for line in self.text.splitlines():
+                line = line.strip()
+                if line == "":
+                    blank = True
+                    continue
+                starts  = blank and is_heading( line ) and not ( section['boilerplate'] and len( section['sentences'] ) == 0 )
+                blank   = False
+                if starts:
+                    section = { 'heading':line, 'boilerplate':bool( BOILERPLATE_HEADINGS.match( line ) ), 'sentences':[] }
+                    self.sections.append( section )
+                    continue
+                for s in split_sentences( line ):
+                    section['sentences'].append( { 'text':s, 'kind':None, 'reason':None } )
+
+            # Rules first
+            unsure  = []
+            for section in self.sections:
+                for s in section['sentences']:
+                    if section['boilerplate']:
+                        s['kind'], s['reason'] = 'section', f"heading '{section['heading']}'"
+                        continue
+                    kind, strength = rule_match( s['text'] )
+                    if strength == 2:
+                        s['kind'], s['reason'] = kind, 'rule'
+                    else:
+                        unsure.append( ( s, kind ) )
+
+            # Then the embedding check for the rest, in a single batch
+            if self.encoder is not None and len( unsure ) > 0:
+                sims    = self.encoder.encode( [ s['text'] for s, _ in unsure ] ) @ self.prototypes().T
+                best    = sims.max( axis = 1 )
+                for ( s, kind ), sim in zip( unsure, best.tolist() ):
+                    if sim >= self.threshold:
+                        s['kind'], s['reason'] = kind or 'boilerplate', f"prototype {sim:.2f}"
+                    elif kind is not None and sim >= self.weak_threshold:
+                        s['kind'], s['reason'] = kind, f"rule + prototype {sim:.2f}"
+
+            self.requirements   = self.build_requirements()
+            self.report         = self.build_report()
+            sp.set( 'tokens_saved', self.report['saved_tokens'] )
+
+        return self.requirements
+
+    # DONE: Joins the kept sentences back together. Headings are kept if their section kept anything.
+    def build_requirements( self ):
+
+        parts = []
+        for section in self.sections:
+            kept = [ s['text'] for s in section['sentences'] if s['kind'] is None ]
+            # A short line on its own (e.g. "PhD in Physics") looks like a heading, but is kept like any other line
+            if len( section['sentences'] ) == 0 and not section['boilerplate']:
+                parts.append( section['heading'] )
+                continue
+            if len( kept ) == 0:
+                continue
+            if section['heading'] != "":
+                parts.append( section['heading'] )
+            parts.append( "\n".join( kept ) )
+
+        # Never hand an empty posting downstream
+        return "\n\n".join( parts ) if len( parts ) > 0 else self.text
+
+    # DONE: Token savings and the removed sentences, grouped by kind
+    def build_report( self ):
+
+        removed = {}
+        for section in self.sections:
+            for s in section['sentences']:
+                if s['kind'] is not None:
+                    removed.setdefault( s['kind'], [] ).append( { 'text':s['text'], 'reason':s['reason'] } )
+
+        before  = estimate_tokens( self.text )
+        after   = estimate_tokens( self.requirements )
+        return {    'original_tokens':      before,
+                    'requirements_tokens':  after,
+                    'saved_tokens':         before - after,
+                    'saved_pct':            round( 100.*( before - after )/before, 1 ) if before > 0 else 0.,
+                    'removed':              removed }
@@ -0,0 +1,174 @@
+'''
+
+    Title:          Keyword Matcher
+
+    Description:    Aho-Corasick automaton built once from every skill and subskill name (plus any `aliases` given in the
+                    masterlist). A job posting is scanned in a single linear pass, no matter how many skills there are, and
+                    every exact mention is reported with its count. Matching is case-insensitive and only counts whole words,
+                    so "C" doesn't match inside "CNC" but "C++" and "C#" still match.
+
+                    The counts are used to boost the skills the posting names outright (BERTSkills `keyword_boost`) and to
+                    build a coverage report of the posting's keywords that none of the chosen bullets mention.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import hashlib
+from collections import deque
+from BuildCache import BuildCache
+
+
+# DONE: Whether a character can be part of a word (used for the whole-word check)
+def is_word_char( c:str ):
+    return c.isalnum() or c == "_"
+
+
+class KeywordMatcher:
+
+    # Matchers built from the same skills are reused
+    _built      = BuildCache( max_built = 32 )
+
+    def __init__( self,
+                skills:list     = [],       # Skills of the masterlist ( { 'id', 'skill', ['aliases'] } )
+                subskills:list  = [] ):     # Subskills of the masterlist ( { 'id', 'skill', ['aliases'] } )
+
+        # Automaton. goto[state] = { char:state }, fail[state] = state, out[state] = [ ( keyword index, length ) ]
+        self.goto       = [ {} ]
+        self.fail       = [ 0 ]
+        self.out        = [ [] ]
+
+        # keyword index -> ( kind, id, name )
+        self.keywords   = []
+
+        for kind, items in ( ( 'skill', skills ), ( 'subskill', subskills ) ):
+            for item in items:
+                names = [ item['skill'] ] + list( item.get( 'aliases', None ) or [] )
+                for name in names:
+                    self.add( name, kind, item['id'], item['skill'] )
+
+        self.build()
+
+    # DONE: Returns the matcher for these skills, building it only the first time
+    @classmethod
+    def for_skills( cls, skills:list, subskills:list ):
+
+        parts = [ f"{s['id']}:{s['skill']}:{','.join( s.get( 'aliases', None ) or [] )}" for s in skills ]
+        parts += [ "|" ] + [ f"{s['id']}:{s['skill']}:{','.join( s.get( 'aliases', None ) or [] )}" for s in subskills ]
+        key = hashlib.sha1( "\x1e".join( parts ).encode( "utf-8" ) ).hexdigest()
+
+        return cls._built.get( key, lambda: cls( skills, subskills ) )
+
+    # DONE: Adds a keyword to the trie
+    def add( self, name:str, kind:str, ref_id:int, canonical:str ):
+
+        word = " ".join( name.lower().split() )
+        if word == "":
+            return
+
+        state = 0
+        for c in word:
+            nxt = self.goto[state].get( c )
+            if nxt is None:
+                nxt = len( self.goto )
+                self.goto[state][c] = nxt
+                self.goto.append( {} )
+                self.fail.append( 0 )
+                self.out.append( [] )
+            state = nxt
+
+        self.out[state].append( ( len( self.keywords ), len( word ) ) )
+        self.keywords.append( ( kind, ref_id, canonical ) )
+
+    # DONE: Builds the failure links (breadth first), so the text is scanned without ever backtracking
+    def build( self ):
+
+        queue = deque()
+        for c, s in self.goto[0].items():
+            self.fail[s] = 0
+            queue.append( s )
+
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self.goto[state].items():
+                queue.append( nxt )
+                f = self.fail[state]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt]  = self.goto[f].get( c, 0 )
+                self.out[nxt]   = self.out[nxt] + self.out[self.fail[nxt]]
+
+    # DONE: Returns every whole-word match in the text as ( start, end, kind, id, name )
+    def matches( self, text:str ):
+
+        # Same normalization as the keywords: lowercase, runs of whitespace become a single space.
+        # `index` maps each normalized character back to its position in the original text.
+        norm    = []
+        index   = []
+        space   = False
+        for i, c in enumerate( text ):
+            if c.isspace():
+                if not space and len( norm ) > 0:
+                    norm.append( " " )
+                    index.append( i )
+                space = True
+                continue
+            space = False
+            norm.append( c.lower() )
+            index.append( i )
+
+        found   = []
+        state   = 0
+        n       = len( norm )
+        for i, c in enumerate( norm ):
+            while state and c not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get( c, 0 )
+
+            for k, length in self.out[state]:
+                start = i - length + 1
+                # Only whole words count
+                if start > 0 and is_word_char( norm[start-1] ) and is_word_char( norm[start] ):
+                    continue
+                if i + 1 < n and is_word_char( norm[i] ) and ( is_word_char( norm[i+1] ) or norm[i+1] in "+#" ):
+                    # A trailing '+' or '#' is part of the word, so "C" doesn't match inside "C++" or "C#"
+                    continue
+                kind, ref_id, name = self.keywords[k]
+                found.append( ( index[start], index[i] + 1, kind, ref_id, name ) )
+
+        return found
+
+    # DONE: Counts the mentions of each skill/subskill in the text. Returns { ( kind, id ):count }
+    def count( self, text:str ):
+
+        counts = {}
+        for _, _, kind, ref_id, _ in self.matches( text ):
+            counts[( kind, ref_id )] = counts.get( ( kind, ref_id ), 0 ) + 1
+
+        return counts
+
+    # DONE: Builds the coverage report of the posting's keywords against the chosen bullets.
+    #       A keyword is covered when a chosen bullet mentions it, or links to it through its skill/subskill ids.
+    def coverage( self, posting:str, bullets:list ):
+
+        posting_counts  = self.count( posting )
+
+        covered         = set()
+        for b in bullets:
+            covered.update( self.count( b['description'] ).keys() )
+            covered.update( ( 'skill', i ) for i in ( b.get( 'skills', None ) or [] ) )
+            covered.update( ( 'subskill', i ) for i in ( b.get( 'subskills', None ) or [] ) )
+
+        names           = { ( kind, ref_id ):name for kind, ref_id, name in self.keywords }
+        found           = [ { 'kind':k[0], 'id':k[1], 'keyword':names[k], 'count':c, 'covered':k in covered }
+                            for k, c in sorted( posting_counts.items(), key = lambda x: -x[1] ) ]
+        missing         = [ f for f in found if not f['covered'] ]
+
+        return {    'posting_keywords': len( found ),
+                    'covered':          len( found ) - len( missing ),
+                    'coverage':         round( ( len( found ) - len( missing ) )/len( found ), 3 ) if len( found ) > 0 else 1.,
+                    'missing':          missing,
+                    'keywords':         found }
@@ -0,0 +1,112 @@
+'''
+
+    Title:          Maximal Marginal Relevance
+
+    Description:    Diversity selection for the bullet, project and skill selectors. Masterlists often hold near-duplicate
+                    bullets, and pure cosine ranking happily picks both. MMR picks one item at a time, trading the item's
+                    relevance against its similarity to the items already picked:
+
+                        next = argmax  λ*relevance(i) - (1 - λ)*max_j similarity(i, j)     (j = already picked)
+
+                    λ = 1 is the plain relevance ranking. The pairwise similarities come from one matrix product of the
+                    embeddings that were already computed for the scoring (they are in the encoder cache), so no extra
+                    encoding is done. Near-duplicates (similarity above a threshold) are also grouped into clusters so they
+                    can be reported.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import numpy as np
+
+
+# DONE: Returns the embeddings of the scored texts from the encoder cache. Texts that were never scored (-inf) get a zero
+#       vector, since encoding them now would be extra work the prefilter meant to skip.
+def cached_embeddings( encoder, texts:list, scores ):
+
+    scored  = [ i for i, s in enumerate( scores ) if s != float( '-inf' ) ]
+    vecs    = encoder.encode( [ texts[i] for i in scored ] ) if len( scored ) > 0 else None
+    embeds  = np.zeros( ( len( texts ), vecs.shape[1] if vecs is not None else 1 ), dtype = np.float32 )
+    if vecs is not None:
+        embeds[scored] = vecs
+
+    return embeds
+
+
+# DONE: Picks k items with MMR. Returns the picked indices in the order they were picked.
+def mmr_select( scores, embeds:np.ndarray, k:int, lam:float = 0.7 ):
+
+    scores  = np.asarray( scores, dtype = np.float32 )
+    n       = len( scores )
+    k       = min( k, n )
+    if k <= 0:
+        return []
+
+    # Items dropped by a prefilter (-inf) are never picked
+    valid   = np.isfinite( scores )
+    k       = min( k, int( valid.sum() ) )
+
+    # Embeddings are normalized, so this is the cosine similarity of every pair
+    sims    = embeds @ embeds.T
+
+    picked  = []
+    max_sim = np.full( n, -np.inf, dtype = np.float32 )
+    taken   = ~valid
+    for _ in range( k ):
+        # Nothing picked yet: no redundancy penalty
+        penalty = np.where( np.isfinite( max_sim ), max_sim, 0. )
+        mmr     = lam*scores - ( 1. - lam )*penalty
+        mmr[taken] = -np.inf
+        best    = int( np.argmax( mmr ) )
+        picked.append( best )
+        taken[best] = True
+        max_sim = np.maximum( max_sim, sims[best] )
+
+    return picked
+
+
+# DONE: Groups items whose similarity is above the threshold (connected components). Returns the clusters with more than one item.
+def duplicate_clusters( embeds:np.ndarray, threshold:float = 0.9 ):
+
+    n = len( embeds )
+    if n < 2:
+        return []
+
+    close   = ( embeds @ embeds.T ) >= threshold
+
+    # Union-find over the close pairs
+    parent  = list( range( n ) )
+    def find( i ):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows, cols = np.nonzero( np.triu( close, 1 ) )
+    for i, j in zip( rows.tolist(), cols.tolist() ):
+        ri, rj = find( i ), find( j )
+        if ri != rj:
+            parent[rj] = ri
+
+    groups = {}
+    for i in range( n ):
+        groups.setdefault( find( i ), [] ).append( i )
+
+    return [ g for g in groups.values() if len( g ) > 1 ]
+
+
+# DONE: Marks every item that is a near-duplicate of a higher scored item. Returns a boolean mask of the items to drop.
+def duplicate_mask( scores, embeds:np.ndarray, threshold:float = 0.9 ):
+
+    scores  = np.asarray( scores, dtype = np.float32 )
+    drop    = np.zeros( len( scores ), dtype = bool )
+    for cluster in duplicate_clusters( embeds, threshold ):
+        best = max( cluster, key = lambda i: scores[i] )
+        for i in cluster:
+            if i != best:
+                drop[i] = True
+
+    return drop
@@ -0,0 +1,430 @@
+'''
+
+    Title:          Masterlist
+
+    Description:    Typed in-memory model of a masterlist.json. Every section is a `__slots__` dataclass, so a large masterlist
+                    takes a fraction of the memory of the nested dictionaries from `json.load`. The masterlist is parsed and
+                    validated once, and then shared by reference between the BulletRebuilder, the BERT processors and the
+                    ResumeBuilder. Skills, subskills and projects are indexed by id, so id references don't need a list scan.
+
+                    Records still support dictionary-style access (`bullet['description']`, `edu['start-date']`), so code and
+                    cached results written against the JSON structure keep working.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import errno
+import threading
+from typing import ClassVar, Optional
+from dataclasses import dataclass, field, fields
+from SafeIO import atomic_write_json
+
+
+# DONE: Base class for every masterlist record. Adds dictionary-style access and JSON conversion.
+class Record:
+
+    __slots__ = ()
+
+    # Python attribute -> JSON key, for keys that aren't valid attribute names
+    RENAMES:ClassVar[dict]  = {}
+
+    # JSON key -> record class, for lists of nested records
+    NESTED:ClassVar[dict]   = {}
+
+    # JSON key -> record class, for a single nested record
+    RECORDS:ClassVar[dict]  = {}
+
+    # Fields that hold lists of ids
+    ID_LISTS:ClassVar[tuple] = ()
+
+    @classmethod
+    def attr_name( cls, key:str ):
+        for attr, k in cls.RENAMES.items():
+            if k == key:
+                return attr
+        return key
+
+    @classmethod
+    def json_key( cls, attr:str ):
+        return cls.RENAMES.get( attr, attr )
+
+    def __getitem__( self, key:str ):
+        try:
+            return getattr( self, self.attr_name( key ) )
+        except AttributeError:
+            extra = getattr( self, 'extra', None )
+            if extra is not None and key in extra:
+                return extra[key]
+            raise KeyError( key )
+
+    def __setitem__( self, key:str, value ):
+        attr = self.attr_name( key )
+        if attr in self.field_names():
+            setattr( self, attr, value )
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__( self, key:str ):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def get( self, key:str, default = None ):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @classmethod
+    def field_names( cls ):
+        return [ f.name for f in fields( cls ) if f.init and not f.name == 'extra' ]
+
+    # DONE: Builds the record from its JSON dictionary
+    @classmethod
+    def from_dict( cls, data:dict ):
+
+        if not isinstance( data, dict ):
+            raise ValueError( f"Expected a JSON object for {cls.__name__}, got {type( data ).__name__}" )
+
+        kwargs  = {}
+        known   = set()
+        for attr in cls.field_names():
+            key = cls.json_key( attr )
+            known.add( key )
+            if key not in data:
+                continue
+            value = data[key]
+            if key in cls.NESTED:
+                if not isinstance( value, list ):
+                    raise ValueError( f"'{key}' of {cls.__name__} must be a list" )
+                value = [ cls.NESTED[key].from_dict( v ) for v in value ]
+            elif key in cls.RECORDS:
+                value = cls.RECORDS[key].from_dict( value )
+            elif attr in cls.ID_LISTS:
+                value = tuple( int( v ) for v in value )
+            kwargs[attr] = value
+
+        # Keep anything we don't know about, so it is saved back out
+        extra = { k:v for k, v in data.items() if k not in known }
+        if len( extra ) > 0:
+            kwargs['extra'] = extra
+
+        return cls( **kwargs )
+
+    # DONE: Converts the record back to its JSON dictionary
+    def to_dict( self ):
+
+        data = {}
+        for attr in self.field_names():
+            value = getattr( self, attr )
+            if isinstance( value, list ):
+                value = [ v.to_dict() if isinstance( v, Record ) else v for v in value ]
+            elif isinstance( value, tuple ):
+                value = list( value )
+            elif isinstance( value, Record ):
+                value = value.to_dict()
+            data[self.json_key( attr )] = value
+
+        if self.extra:
+            data.update( self.extra )
+
+        return data
+
+
+@dataclass( slots = True )
+class About( Record ):
+    name:str        = ""
+    email:str       = ""
+    phone:str       = ""
+    website:str     = ""
+    linkedin:str    = ""
+    github:str      = ""
+    location:str    = ""
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Education( Record ):
+    RENAMES:ClassVar[dict]  = { 'start_date':'start-date', 'end_date':'end-date' }
+    id:int          = 0
+    school:str      = ""
+    start_date:str  = ""
+    end_date:str    = ""
+    degree:str      = ""
+    minor:str       = ""
+    thesis:str      = ""
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Bullet( Record ):
+    ID_LISTS:ClassVar[tuple] = ( 'skills', 'subskills' )
+    id:int          = 0
+    description:str = ""
+    skills:tuple    = ()
+    subskills:tuple = ()
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Experience( Record ):
+    NESTED:ClassVar[dict]   = { 'projects':Bullet }
+    id:int              = 0
+    company:str         = ""
+    start:str           = ""
+    end:str             = ""
+    jobtitle:str        = ""
+    company_image:str   = ""
+    text_primary:str    = ""
+    text_secondary:str  = ""
+    projects:list       = field( default_factory = list )
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Project( Record ):
+    ID_LISTS:ClassVar[tuple] = ( 'skillsUsed', 'subSkillsUsed' )
+    id:int              = 0
+    title:str           = ""
+    link:str            = ""
+    description:str     = ""
+    skillsUsed:tuple    = ()
+    subSkillsUsed:tuple = ()
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Publication( Record ):
+    ID_LISTS:ClassVar[tuple] = ( 'skillsUsed', 'subSkillsUsed' )
+    id:int              = 0
+    title:str           = ""
+    authors:str         = ""
+    journal:str         = ""
+    year:str            = ""
+    volume:str          = ""
+    issue:str           = ""
+    page_range:str      = ""
+    DOI:str             = ""
+    link:str            = ""
+    skillsUsed:tuple    = ()
+    subSkillsUsed:tuple = ()
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Presentation( Record ):
+    ID_LISTS:ClassVar[tuple] = ( 'skillsUsed', 'subSkillsUsed' )
+    id:int              = 0
+    title:str           = ""
+    authors:str         = ""
+    link:str            = ""
+    event:str           = ""
+    date:str            = ""
+    skillsUsed:tuple    = ()
+    subSkillsUsed:tuple = ()
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Skill( Record ):
+    ID_LISTS:ClassVar[tuple] = ( 'subskills', )
+    id:int          = 0
+    skill:str       = ""
+    subskills:tuple = ()
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class SubSkill( Record ):
+    id:int          = 0
+    skill:str       = ""
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Outreach( Record ):
+    id:int          = 0
+    title:str       = ""
+    image:str       = ""
+    group:str       = ""
+    description:str = ""
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Award( Record ):
+    award:str           = ""
+    organization:str    = ""
+    link:str            = ""
+    description:str     = ""
+    extra:Optional[dict] = None
+
+
+@dataclass( slots = True )
+class Patent( Record ):
+    id:int              = 0
+    title:str           = ""
+    patent_number:str   = ""
+    link:str            = ""
+    extra:Optional[dict] = None
+
+
+# Loaded masterlists. abs path -> ( modified time, size, Masterlist )
+_loaded         = {}
+_loaded_lock    = threading.Lock()
+
+
+@dataclass( slots = True )
+class Masterlist( Record ):
+    RECORDS:ClassVar[dict]  = { 'about':About }
+    NESTED:ClassVar[dict]   = { 'education':Education, 'experiences':Experience, 'projects':Project, 'publications':Publication,
+                                'presentations':Presentation, 'skills':Skill, 'subskills':SubSkill, 'outreach':Outreach,
+                                'awards':Award, 'patents':Patent }
+    about:About             = field( default_factory = About )
+    summary:str             = ""
+    education:list          = field( default_factory = list )
+    experiences:list        = field( default_factory = list )
+    projects:list           = field( default_factory = list )
+    publications:list       = field( default_factory = list )
+    presentations:list      = field( default_factory = list )
+    skills:list             = field( default_factory = list )
+    subskills:list          = field( default_factory = list )
+    outreach:list           = field( default_factory = list )
+    awards:list             = field( default_factory = list )
+    patents:list            = field( default_factory = list )
+    extra:Optional[dict]    = None
+
+    # Indexes. Built once by build_indexes()
+    skill_by_id:dict        = field( default_factory = dict, init = False, repr = False )
+    subskill_by_id:dict     = field( default_factory = dict, init = False, repr = False )
+    project_by_id:dict      = field( default_factory = dict, init = False, repr = False )
+
+    # DONE: Builds the masterlist from the JSON dictionary
+    @classmethod
+    def from_dict( cls, data:dict ):
+
+        if not isinstance( data, dict ):
+            raise ValueError( "A masterlist must be a JSON object" )
+        if 'experiences' not in data:
+            raise ValueError( "The masterlist has no 'experiences' section" )
+
+        mList = Record.from_dict.__func__( cls, data )
+        mList.build_indexes()
+
+        return mList
+
+    # DONE: Builds the id -> record indexes
+    def build_indexes( self ):
+        self.skill_by_id    = { s.id:s for s in self.skills }
+        self.subskill_by_id = { s.id:s for s in self.subskills }
+        self.project_by_id  = { p.id:p for p in self.projects }
+
+    # DONE: Resolves lists of ids into their records. Unknown ids are skipped.
+    def skills_for( self, ids ):
+        return [ self.skill_by_id[i] for i in ids if i in self.skill_by_id ]
+
+    def subskills_for( self, ids ):
+        return [ self.subskill_by_id[i] for i in ids if i in self.subskill_by_id ]
+
+    # DONE: Returns every bullet with the index of its experience
+    def all_bullets( self ):
+        return [ ( i, b ) for i, exp in enumerate( self.experiences ) for b in exp.projects ]
+
+    # DONE: Checks the masterlist for problems. Returns a list of problem descriptions.
+    def validate( self ):
+
+        problems = []
+
+        if len( self.skill_by_id ) < len( self.skills ):
+            problems.append( "Duplicate skill ids" )
+        if len( self.subskill_by_id ) < len( self.subskills ):
+            problems.append( "Duplicate subskill ids" )
+
+        for exp in self.experiences:
+            for b in exp.projects:
+                if not isinstance( b.description, str ):
+                    problems.append( f"Bullet {b.id} of '{exp.company}' has no text description" )
+                missing = [ i for i in b.skills if i not in self.skill_by_id ] + [ i for i in b.subskills if i not in self.subskill_by_id ]
+                if len( missing ) > 0:
+                    problems.append( f"Bullet {b.id} of '{exp.company}' references unknown skill/subskill ids {missing}" )
+
+        for p in self.projects:
+            missing = [ i for i in p.skillsUsed if i not in self.skill_by_id ] + [ i for i in p.subSkillsUsed if i not in self.subskill_by_id ]
+            if len( missing ) > 0:
+                problems.append( f"Project {p.id} references unknown skill/subskill ids {missing}" )
+
+        for s in self.skills:
+            missing = [ i for i in s.subskills if i not in self.subskill_by_id ]
+            if len( missing ) > 0:
+                problems.append( f"Skill '{s.skill}' references unknown subskill ids {missing}" )
+
+        return problems
+
+    # DONE: Loads a masterlist JSON file. The same unchanged file is only parsed once and shared.
+    @classmethod
+    def load( cls, file_name:str, cache:bool = True, strict:bool = False ):
+
+        if not os.path.isfile( file_name ):
+            raise FileNotFoundError( errno.ENOENT, os.strerror(errno.ENOENT), file_name )
+        if not file_name.lower().strip().endswith( ".json" ):
+            raise ValueError("Unsupported file type. Only .json files are allowed.")
+
+        path    = os.path.abspath( file_name )
+        stat    = os.stat( path )
+
+        if cache:
+            with _loaded_lock:
+                found = _loaded.get( path )
+            if found is not None and found[0] == stat.st_mtime_ns and found[1] == stat.st_size:
+                return found[2]
+
+        with open( path, 'r' ) as file:
+            mList = cls.from_dict( json.load( file ) )
+
+        problems = mList.validate()
+        if len( problems ) > 0:
+            if strict:
+                raise ValueError( f"Invalid masterlist {file_name}:\n  - " + "\n  - ".join( problems ) )
+            print( f"Masterlist {os.path.basename( file_name )} has {len( problems )} problem(s):" )
+            for p in problems[:10]:
+                print( f"  - {p}" )
+
+        if cache:
+            with _loaded_lock:
+                _loaded[path] = ( stat.st_mtime_ns, stat.st_size, mList )
+
+        return mList
+
+    # DONE: Saves the masterlist as JSON (atomically) and keeps it as the loaded copy of that file.
+    #       indent = None writes compact JSON.
+    def save( self, file_name:str, indent:Optional[int] = 4 ):
+
+        atomic_write_json( file_name, self.to_dict(), indent = indent, separators = None if indent is not None else ( ',', ':' ) )
+
+        path = os.path.abspath( file_name )
+        stat = os.stat( path )
+        with _loaded_lock:
+            _loaded[path] = ( stat.st_mtime_ns, stat.st_size, self )
+
+    # DONE: Returns a fully independent copy (used before rewriting bullets)
+    def copy( self ):
+        return Masterlist.from_dict( self.to_dict() )
+
+
+# DONE: `default` for json.dump, so records can be saved directly
+def json_default( obj ):
+    if isinstance( obj, Record ):
+        return obj.to_dict()
+    if isinstance( obj, tuple ):
+        return list( obj )
+    raise TypeError( f"Object of type {type( obj ).__name__} is not JSON serializable" )
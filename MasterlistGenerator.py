@@ -0,0 +1,240 @@
+'''
+
+    Title:          Masterlist Generator
+
+    Description:    Builds synthetic masterlists of any size that follow the exact schema of `masterlist_example.json`
+                    (about, summary, education, experiences[].projects, projects, publications, presentations, skills,
+                    subskills, outreach, awards, patents). Every bullet and project references valid skill/subskill ids.
+                    The same seed and sizes always give the same masterlist, so results can be compared between commits.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import random
+
+
+# Words used to build the synthetic text
+VERBS       = [ "Developed", "Designed", "Built", "Led", "Analyzed", "Created", "Implemented", "Optimized", "Managed", "Automated",
+                "Trained", "Coordinated", "Discovered", "Engineered", "Modeled", "Simulated", "Calibrated", "Deployed", "Reduced", "Improved" ]
+OBJECTS     = [ "data pipeline", "simulation code", "control system", "diagnostic", "analysis software", "experimental setup",
+                "machine learning model", "circuit board", "web dashboard", "spectroscopy system", "synthesis method", "test suite",
+                "database", "laser system", "visualization tool", "fitting routine", "user interface", "safety protocol" ]
+PURPOSES    = [ "for high-throughput data collection", "to predict material synthesis parameters", "for faster measurements",
+                "to reduce computation time", "for automated quality control", "to support research collaborators",
+                "for real-time monitoring", "to improve experimental precision", "for large-scale parallel computing",
+                "to streamline laboratory operations" ]
+RESULTS     = [ "reducing cost by {n}%", "increasing throughput by {n}%", "saving {n} hours per week", "improving accuracy by {n}%",
+                "serving {n}+ users", "cutting processing time by {n}%", "across {n} projects" ]
+SKILLS      = [ "Python", "C++", "Fortran", "Matlab", "Machine Learning", "Condensed Matter Physics", "Computational Physics",
+                "Web Development", "Software Engineering", "Electrical Engineering", "Mechanical Engineering", "Data Analysis",
+                "Optics", "Plasma Physics", "Project Management", "Statistics", "Chemistry", "High Performance Computing" ]
+SUBSKILLS   = [ "Numpy", "Pandas", "SciPy", "PyTorch", "Tensorflow", "SciKit-Learn", "MPI", "OpenMP", "CUDA", "SolidWorks",
+                "FreeCAD", "CNC", "3D Printing", "Raman Spectroscopy", "DFT", "GPAW", "ASE", "Molecular Dynamics", "Fluid Dynamics",
+                "Bayesian Optimization", "Gaussian Processes", "Docker", "SQL", "Javascript", "React", "Qt", "Linux", "Git",
+                "Circuit Design", "PCB Layout", "Lattice Boltzmann", "Monte Carlo", "X-ray Diagnostics", "Laser Alignment" ]
+COMPANIES   = [ "Northeastern University", "Harvard University", "ACME Inc.", "National Laboratory", "Initech", "Globex",
+                "Stark Industries", "Wayne Enterprises", "Umbrella Research", "Cyberdyne Systems" ]
+TITLES      = [ "Research Scientist", "Postdoctoral Researcher", "Software Engineer", "Lab Manager", "Data Scientist",
+                "Graduate Researcher", "Staff Physicist", "Engineering Intern" ]
+
+# Words used to build the synthetic postings of other fields, so a ranking of postings has something to tell apart
+OTHER_TITLES    = [ "Pastry Chef", "Front Desk Agent", "Delivery Driver", "Retail Associate", "Warehouse Operator", "Receptionist" ]
+OTHER_DUTIES    = [ "prepare pastries and breads for the morning service", "manage the front desk and guest reservations",
+                    "drive a delivery route across the county", "stock shelves and run the checkout", "plan weekly menus with the head chef",
+                    "handle customer returns and complaints", "operate a forklift in the warehouse", "schedule appointments for the clinic" ]
+OTHER_SKILLS    = [ "Customer Service", "Food Safety", "Scheduling", "Cash Handling", "Inventory", "Forklift Certification", "Baking" ]
+
+
+class MasterlistGenerator:
+
+    def __init__( self,
+                experiences:int         = 5,        # Amount of experiences
+                bullets_per:int         = 10,       # Amount of bullets under each experience
+                skills:int              = 20,       # Amount of skills
+                subskills:int           = 60,       # Amount of subskills
+                projects:int            = 10,       # Amount of projects
+                publications:int        = 5,        # Amount of publications
+                presentations:int       = 5,        # Amount of presentations
+                patents:int             = 2,        # Amount of patents
+                awards:int              = 3,        # Amount of awards
+                outreach:int            = 2,        # Amount of outreach
+                education:int           = 2,        # Amount of education entries
+                seed:int                = 0 ):      # Random seed. The same seed always gives the same masterlist
+
+        self.experiences    = experiences
+        self.bullets_per    = bullets_per
+        self.skills         = skills
+        self.subskills      = subskills
+        self.projects       = projects
+        self.publications   = publications
+        self.presentations  = presentations
+        self.patents        = patents
+        self.awards         = awards
+        self.outreach       = outreach
+        self.education      = education
+        self.seed           = seed
+
+        self.rng            = random.Random( seed )
+
+    # DONE: Builds a numbered name when there are more items than words (e.g. 'Python 2')
+    def name( self, words:list, i:int ):
+        return words[i % len( words )] if i < len( words ) else f"{words[i % len( words )]} {i//len( words ) + 1}"
+
+    # DONE: Builds a single bullet-style sentence
+    def sentence( self ):
+        text = f"{self.rng.choice( VERBS )} a {self.rng.choice( OBJECTS )} {self.rng.choice( PURPOSES )}"
+        if self.rng.random() < 0.7:
+            text += ", " + self.rng.choice( RESULTS ).format( n = self.rng.randint( 5, 95 ) )
+        return text
+
+    # DONE: Builds a synthetic job posting. Related postings ask for the masterlist's kind of work, the others are from other fields.
+    def posting( self, related:bool = True ):
+
+        company = self.rng.choice( COMPANIES )
+        if related:
+            title   = self.rng.choice( TITLES )
+            duties  = [ f"Ideal candidates have {self.rng.choice( VERBS ).lower()} a {self.rng.choice( OBJECTS )} {self.rng.choice( PURPOSES )}."
+                        for _ in range( self.rng.randint( 3, 6 ) ) ]
+            wants   = self.rng.sample( SKILLS + SUBSKILLS, self.rng.randint( 3, 6 ) )
+        else:
+            title   = self.rng.choice( OTHER_TITLES )
+            duties  = [ f"You will {d}." for d in self.rng.sample( OTHER_DUTIES, self.rng.randint( 2, 4 ) ) ]
+            wants   = self.rng.sample( OTHER_SKILLS, self.rng.randint( 2, 4 ) )
+
+        desc    = f"{title} at {company}. " + " ".join( duties ) + f" Experience with {', '.join( wants[:-1] )} and {wants[-1]} is required."
+
+        return { 'job_title':title, 'job_company':company, 'job_desc':desc }
+
+    # DONE: Builds n synthetic job postings. About `related_share` of them are related to the masterlist.
+    def postings( self, n:int, related_share:float = 0.5 ):
+
+        # Reset the random generator so postings() is repeatable
+        self.rng    = random.Random( self.seed )
+
+        return [ self.posting( self.rng.random() < related_share ) for _ in range( n ) ]
+
+    # DONE: Picks skill ids and the subskill ids that belong to them
+    def pick_skills( self, skill_list:list ):
+
+        if len( skill_list ) == 0:
+            return [], []
+
+        chosen  = self.rng.sample( skill_list, min( len( skill_list ), self.rng.randint( 1, 4 ) ) )
+        subs    = []
+        for sk in chosen:
+            if len( sk['subskills'] ) > 0:
+                subs += self.rng.sample( sk['subskills'], min( len( sk['subskills'] ), self.rng.randint( 1, 3 ) ) )
+
+        return sorted( sk['id'] for sk in chosen ), sorted( set( subs ) )
+
+    # DONE: Builds the full masterlist dictionary
+    def generate( self ):
+
+        # Reset the random generator so generate() is repeatable
+        self.rng    = random.Random( self.seed )
+
+        # Subskills first, so the skills can reference them
+        subskills   = [ { 'id':i+1, 'skill':self.name( SUBSKILLS, i ) } for i in range( self.subskills ) ]
+
+        skills      = []
+        for i in range( self.skills ):
+            # Spread the subskills across the skills
+            subs = [ s['id'] for j, s in enumerate( subskills ) if self.skills > 0 and j % self.skills == i ]
+            skills.append( { 'id':i+1, 'skill':self.name( SKILLS, i ), 'subskills':subs } )
+
+        mList = {}
+
+        mList['about'] = {  'name':         "Jane Synthetic",
+                            'email':        "jane@example.com",
+                            'phone':        "",
+                            'website':      "https://example.com/",
+                            'linkedin':     "https://www.linkedin.com/in/example/",
+                            'github':       "https://github.com/example",
+                            'location':     "Cambridge, MA" }
+
+        mList['summary']    = "Scientist and engineer with experience in " + ", ".join( sk['skill'] for sk in skills[:5] ) + "."
+
+        mList['education']  = [ {   'id':           i+1,
+                                    'school':       self.name( COMPANIES, i ),
+                                    'start-date':   str( 2005 + 4*i ),
+                                    'end-date':     str( 2009 + 4*i ),
+                                    'degree':       f"Degree {i+1} in {self.rng.choice( SKILLS )}",
+                                    'minor':        self.rng.choice( [ "", "Mathematics" ] ),
+                                    'thesis':       self.rng.choice( [ "", self.sentence() ] ) } for i in range( self.education ) ]
+
+        experiences = []
+        for i in range( self.experiences ):
+            bullets = []
+            for j in range( self.bullets_per ):
+                sk, sub = self.pick_skills( skills )
+                bullets.append( { 'id':j+1, 'description':self.sentence(), 'skills':sk, 'subskills':sub } )
+
+            experiences.append( {   'id':               i+1,
+                                    'company':          self.name( COMPANIES, i ),
+                                    'start':            str( 2024 - 2*i - 2 ),
+                                    'end':              str( 2024 - 2*i ),
+                                    'jobtitle':         self.rng.choice( TITLES ),
+                                    'company_image':    "",
+                                    'text_primary':     "",
+                                    'text_secondary':   "",
+                                    'projects':         bullets } )
+        mList['experiences'] = experiences
+
+        projects = []
+        for i in range( self.projects ):
+            sk, sub = self.pick_skills( skills )
+            projects.append( { 'id':i+1, 'title':f"{self.rng.choice( OBJECTS ).title()} Project {i+1}", 'link':"",
+                               'description':". ".join( self.sentence() for _ in range( 3 ) ) + ".",
+                               'skillsUsed':sk, 'subSkillsUsed':sub } )
+        mList['projects'] = projects
+
+        publications = []
+        for i in range( self.publications ):
+            sk, sub = self.pick_skills( skills )
+            publications.append( { 'id':i+1, 'title':self.sentence(), 'authors':"Synthetic, J.; Doe, J.; Roe, R.", 'journal':"Journal of Examples",
+                                   'year':str( 2015 + i % 10 ), 'volume':str( i+1 ), 'issue':"1", 'page_range':f"{i*10+1}-{i*10+9}",
+                                   'DOI':f"10.0000/example.{i+1}", 'link':"", 'skillsUsed':sk, 'subSkillsUsed':sub } )
+        mList['publications'] = publications
+
+        presentations = []
+        for i in range( self.presentations ):
+            sk, sub = self.pick_skills( skills )
+            presentations.append( { 'id':i+1, 'title':self.sentence(), 'authors':"Synthetic, J.; Doe, J.", 'link':"",
+                                    'event':"Annual Meeting of Examples", 'date':str( 2015 + i % 10 ), 'skillsUsed':sk, 'subSkillsUsed':sub } )
+        mList['presentations']  = presentations
+
+        mList['skills']         = skills
+        mList['subskills']      = subskills
+
+        mList['outreach']       = [ { 'id':i+1, 'title':f"Outreach {i+1}", 'image':"", 'group':self.rng.choice( COMPANIES ),
+                                      'description':self.sentence() } for i in range( self.outreach ) ]
+
+        mList['awards']         = [ { 'award':f"Award {i+1}", 'organization':self.rng.choice( COMPANIES ), 'link':"",
+                                      'description':self.sentence() } for i in range( self.awards ) ]
+
+        mList['patents']        = [ { 'id':i+1, 'title':self.sentence(), 'patent_number':f"US{10000000 + i}", 'link':"" } for i in range( self.patents ) ]
+
+        return mList
+
+    # DONE: Builds the masterlist and saves it to a JSON file
+    def save( self, file_name:str ):
+
+        with open( file_name, 'w' ) as file:
+            json.dump( self.generate(), file, indent = 4 )
+
+        return file_name
+
+
+if __name__ == "__main__":
+
+    # Build a large masterlist for testing
+    save_directory  = os.path.dirname( os.path.abspath( __file__ ) )
+
+    MG  = MasterlistGenerator( experiences = 50, bullets_per = 40, skills = 100, subskills = 400, projects = 50 )
+    MG.save( os.path.join( save_directory, "masterlist_synthetic_large.json" ) )
@@ -0,0 +1,401 @@
+'''
+
+    Title:          Masterlist Store
+
+    Description:    Optional SQLite storage backend for masterlists. One database holds any number of candidate profiles, the
+                    rewritten bullets of every model (as 'variants' of the original bullets), cached BERT embeddings and the
+                    ranking results of each job. Bullet and project text are indexed with FTS5 for keyword search.
+
+                    Loading one candidate is a few indexed queries instead of parsing a whole JSON file, and every update runs
+                    in a single transaction, so a single bullet or a single model's rewrites can be changed without rewriting
+                    the rest of the profile. The existing JSON schema can be imported and exported at any time.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import errno
+import hashlib
+import numpy as np
+from datetime import datetime
+from Masterlist import Masterlist
+from SafeIO import atomic_write_json
+from SQLiteDB import SQLiteDB
+
+
+# Masterlist sections stored as one JSON record per row. Experience bullets and projects have their own tables.
+SECTIONS    = [ 'education', 'experiences', 'publications', 'presentations', 'skills', 'subskills', 'outreach', 'awards', 'patents' ]
+
+# Variant name of the original (not rewritten) bullets
+ORIGINAL    = ""
+
+SCHEMA      = """
+CREATE TABLE IF NOT EXISTS candidates (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT UNIQUE NOT NULL,
+    about       TEXT,
+    summary     TEXT,
+    extra       TEXT,
+    updated     TEXT
+);
+
+CREATE TABLE IF NOT EXISTS records (
+    candidate_id    INTEGER NOT NULL REFERENCES candidates(id) ON DELETE CASCADE,
+    section         TEXT NOT NULL,
+    position        INTEGER NOT NULL,
+    data            TEXT NOT NULL,
+    PRIMARY KEY ( candidate_id, section, position )
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS bullets (
+    id              INTEGER PRIMARY KEY,
+    candidate_id    INTEGER NOT NULL REFERENCES candidates(id) ON DELETE CASCADE,
+    variant         TEXT NOT NULL,
+    exp_pos         INTEGER NOT NULL,
+    position        INTEGER NOT NULL,
+    bullet_id       INTEGER,
+    description     TEXT NOT NULL,
+    skills          TEXT,
+    subskills       TEXT,
+    extra           TEXT,
+    UNIQUE ( candidate_id, variant, exp_pos, position )
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    id              INTEGER PRIMARY KEY,
+    candidate_id    INTEGER NOT NULL REFERENCES candidates(id) ON DELETE CASCADE,
+    position        INTEGER NOT NULL,
+    title           TEXT,
+    description     TEXT,
+    data            TEXT NOT NULL,
+    UNIQUE ( candidate_id, position )
+);
+
+CREATE TABLE IF NOT EXISTS embeddings (
+    model           TEXT NOT NULL,
+    hash            TEXT NOT NULL,
+    dim             INTEGER NOT NULL,
+    vector          BLOB NOT NULL,
+    PRIMARY KEY ( model, hash )
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rankings (
+    candidate_id    INTEGER NOT NULL REFERENCES candidates(id) ON DELETE CASCADE,
+    job_key         TEXT NOT NULL,
+    kind            TEXT NOT NULL,
+    exp_pos         INTEGER NOT NULL,
+    rank            INTEGER NOT NULL,
+    ref_id          INTEGER,
+    score           REAL,
+    created         TEXT,
+    PRIMARY KEY ( candidate_id, job_key, kind, exp_pos, rank )
+) WITHOUT ROWID;
+
+-- Full text indexes. The triggers keep them in sync with the bullets and projects tables.
+CREATE VIRTUAL TABLE IF NOT EXISTS bullets_fts USING fts5( description, content = 'bullets', content_rowid = 'id' );
+CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5( title, description, content = 'projects', content_rowid = 'id' );
+
+CREATE TRIGGER IF NOT EXISTS bullets_ai AFTER INSERT ON bullets BEGIN
+    INSERT INTO bullets_fts( rowid, description ) VALUES ( new.id, new.description );
+END;
+CREATE TRIGGER IF NOT EXISTS bullets_ad AFTER DELETE ON bullets BEGIN
+    INSERT INTO bullets_fts( bullets_fts, rowid, description ) VALUES ( 'delete', old.id, old.description );
+END;
+CREATE TRIGGER IF NOT EXISTS bullets_au AFTER UPDATE OF description ON bullets BEGIN
+    INSERT INTO bullets_fts( bullets_fts, rowid, description ) VALUES ( 'delete', old.id, old.description );
+    INSERT INTO bullets_fts( rowid, description ) VALUES ( new.id, new.description );
+END;
+
+CREATE TRIGGER IF NOT EXISTS projects_ai AFTER INSERT ON projects BEGIN
+    INSERT INTO projects_fts( rowid, title, description ) VALUES ( new.id, new.title, new.description );
+END;
+CREATE TRIGGER IF NOT EXISTS projects_ad AFTER DELETE ON projects BEGIN
+    INSERT INTO projects_fts( projects_fts, rowid, title, description ) VALUES ( 'delete', old.id, old.title, old.description );
+END;
+CREATE TRIGGER IF NOT EXISTS projects_au AFTER UPDATE OF title, description ON projects BEGIN
+    INSERT INTO projects_fts( projects_fts, rowid, title, description ) VALUES ( 'delete', old.id, old.title, old.description );
+    INSERT INTO projects_fts( rowid, title, description ) VALUES ( new.id, new.title, new.description );
+END;
+"""
+
+
+# DONE: Key used to store the rankings of a single job
+def job_key( job_title:str, job_company:str, job_desc:str, BERTModel:str = "" ):
+    return hashlib.sha1( "\x1f".join( [ job_title, job_company, job_desc, BERTModel ] ).encode( "utf-8" ) ).hexdigest()
+
+
+# DONE: Key used to store the embedding of a single text
+def text_key( text:str ):
+    return hashlib.sha1( text.encode( "utf-8" ) ).hexdigest()
+
+
+class MasterlistStore( SQLiteDB ):
+
+    PRAGMAS = ( "PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL", "PRAGMA foreign_keys = ON" )
+
+    def __init__( self,
+                db_file:str         = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "masterlists.db" ),
+                timeout:float       = 30. ):                    # Seconds to wait for another writer before giving up
+
+        # One connection per thread, so the store can be shared by the service workers
+        super().__init__( db_file, SCHEMA, timeout )
+
+    # DONE: Returns the id of a candidate. Raises a KeyError if the candidate doesn't exist.
+    def candidate_id( self, candidate:str ):
+
+        row = self.db.execute( "SELECT id FROM candidates WHERE name = ?", ( candidate, ) ).fetchone()
+        if row is None:
+            raise KeyError( f"Candidate '{candidate}' not found in {self.db_file}" )
+
+        return row['id']
+
+    # DONE: Returns the names of every stored candidate
+    def list_candidates( self ):
+        return [ r['name'] for r in self.db.execute( "SELECT name FROM candidates ORDER BY name" ) ]
+
+    # DONE: Removes a candidate and everything stored for them
+    def delete_candidate( self, candidate:str ):
+        with self.transaction() as db:
+            db.execute( "DELETE FROM candidates WHERE name = ?", ( candidate, ) )
+
+    ########## IMPORT / EXPORT
+
+    # DONE: Imports a masterlist JSON file. Replaces the candidate if they already exist.
+    def import_json( self, file_name:str, candidate:str = "" ):
+
+        if not os.path.isfile( file_name ):
+            raise FileNotFoundError( errno.ENOENT, os.strerror(errno.ENOENT), file_name )
+
+        return self.import_masterlist( Masterlist.load( file_name, cache = False ), candidate or os.path.basename( file_name )[:-5] )
+
+    # DONE: Stores a Masterlist as the original profile of a candidate. Returns the candidate id.
+    def import_masterlist( self, mList:Masterlist, candidate:str ):
+
+        with self.transaction() as db:
+
+            db.execute( "DELETE FROM candidates WHERE name = ?", ( candidate, ) )
+            cur = db.execute( "INSERT INTO candidates ( name, about, summary, extra, updated ) VALUES ( ?, ?, ?, ?, ? )",
+                              ( candidate, json.dumps( mList.about.to_dict() ), mList.summary,
+                                json.dumps( mList.extra ) if mList.extra else None, datetime.now().isoformat( timespec = 'seconds' ) ) )
+            cid = cur.lastrowid
+
+            for section in SECTIONS:
+                rows = []
+                for i, rec in enumerate( mList[section] ):
+                    data = rec.to_dict()
+                    # The bullets of each experience are stored in their own table
+                    if section == 'experiences':
+                        data.pop( 'projects', None )
+                    rows.append( ( cid, section, i, json.dumps( data ) ) )
+                db.executemany( "INSERT INTO records ( candidate_id, section, position, data ) VALUES ( ?, ?, ?, ? )", rows )
+
+            db.executemany( "INSERT INTO projects ( candidate_id, position, title, description, data ) VALUES ( ?, ?, ?, ?, ? )",
+                            [ ( cid, i, p.title, p.description, json.dumps( p.to_dict() ) ) for i, p in enumerate( mList.projects ) ] )
+
+            self.write_bullets( db, cid, ORIGINAL, mList )
+
+        return cid
+
+    # DONE: Writes every bullet of the masterlist as the given variant
+    def write_bullets( self, db, cid:int, variant:str, mList:Masterlist ):
+
+        rows = []
+        for i, exp in enumerate( mList.experiences ):
+            for j, b in enumerate( exp.projects ):
+                rows.append( ( cid, variant, i, j, b.id, b.description, json.dumps( list( b.skills ) ), json.dumps( list( b.subskills ) ),
+                               json.dumps( b.extra ) if b.extra else None ) )
+
+        db.executemany( """INSERT INTO bullets ( candidate_id, variant, exp_pos, position, bullet_id, description, skills, subskills, extra )
+                           VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? )""", rows )
+
+    # DONE: Loads a candidate as a Masterlist. `variant` picks the rewritten bullets of a model (e.g. '32b'). "" = the original bullets.
+    def load( self, candidate:str, variant:str = ORIGINAL ):
+
+        db  = self.db
+        row = db.execute( "SELECT id, about, summary, extra FROM candidates WHERE name = ?", ( candidate, ) ).fetchone()
+        if row is None:
+            raise KeyError( f"Candidate '{candidate}' not found in {self.db_file}" )
+        cid = row['id']
+
+        data                = json.loads( row['extra'] ) if row['extra'] else {}
+        data['about']       = json.loads( row['about'] )
+        data['summary']     = row['summary']
+        for section in SECTIONS:
+            data[section] = []
+
+        for r in db.execute( "SELECT section, data FROM records WHERE candidate_id = ? ORDER BY section, position", ( cid, ) ):
+            data[r['section']].append( json.loads( r['data'] ) )
+
+        data['projects']    = [ json.loads( r['data'] ) for r in db.execute( "SELECT data FROM projects WHERE candidate_id = ? ORDER BY position", ( cid, ) ) ]
+
+        for exp in data['experiences']:
+            exp['projects'] = []
+        for b in db.execute( """SELECT exp_pos, bullet_id, description, skills, subskills, extra FROM bullets
+                                WHERE candidate_id = ? AND variant = ? ORDER BY exp_pos, position""", ( cid, variant ) ):
+            bullet = { 'id':b['bullet_id'], 'description':b['description'], 'skills':json.loads( b['skills'] ), 'subskills':json.loads( b['subskills'] ) }
+            if b['extra']:
+                bullet.update( json.loads( b['extra'] ) )
+            data['experiences'][b['exp_pos']]['projects'].append( bullet )
+
+        return Masterlist.from_dict( data )
+
+    # DONE: Exports a candidate to a masterlist JSON file
+    def export_json( self, candidate:str, file_name:str, variant:str = ORIGINAL ):
+
+        return atomic_write_json( file_name, self.load( candidate, variant ).to_dict(), indent = 4 )
+
+    ########## REWRITTEN BULLETS
+
+    # DONE: Whether the rewritten bullets of a variant have been stored
+    def has_variant( self, candidate:str, variant:str ):
+        cid = self.candidate_id( candidate )
+        return self.db.execute( "SELECT 1 FROM bullets WHERE candidate_id = ? AND variant = ? LIMIT 1", ( cid, variant ) ).fetchone() is not None
+
+    # DONE: Returns the variants stored for a candidate
+    def list_variants( self, candidate:str ):
+        cid = self.candidate_id( candidate )
+        return [ r['variant'] for r in self.db.execute( "SELECT DISTINCT variant FROM bullets WHERE candidate_id = ? ORDER BY variant", ( cid, ) ) ]
+
+    # DONE: Replaces the bullets of a variant with the bullets of the masterlist. The rest of the profile isn't touched.
+    def save_variant( self, candidate:str, variant:str, mList:Masterlist ):
+
+        if variant == ORIGINAL:
+            raise ValueError( "Use import_masterlist() to replace the original bullets" )
+
+        cid = self.candidate_id( candidate )
+        with self.transaction() as db:
+            db.execute( "DELETE FROM bullets WHERE candidate_id = ? AND variant = ?", ( cid, variant ) )
+            self.write_bullets( db, cid, variant, mList )
+
+    # DONE: Removes the bullets of a variant (e.g. to force a rebuild)
+    def delete_variant( self, candidate:str, variant:str ):
+
+        if variant == ORIGINAL:
+            raise ValueError( "The original bullets can't be removed" )
+
+        cid = self.candidate_id( candidate )
+        with self.transaction() as db:
+            db.execute( "DELETE FROM bullets WHERE candidate_id = ? AND variant = ?", ( cid, variant ) )
+
+    # DONE: Changes the text of a single bullet. The FTS index is updated in the same transaction.
+    def update_bullet( self, candidate:str, exp_pos:int, position:int, description:str, variant:str = ORIGINAL ):
+
+        cid = self.candidate_id( candidate )
+        with self.transaction() as db:
+            cur = db.execute( "UPDATE bullets SET description = ? WHERE candidate_id = ? AND variant = ? AND exp_pos = ? AND position = ?",
+                              ( description, cid, variant, exp_pos, position ) )
+            if cur.rowcount == 0:
+                raise KeyError( f"No bullet {position} in experience {exp_pos} of '{candidate}' (variant '{variant}')" )
+            db.execute( "UPDATE candidates SET updated = ? WHERE id = ?", ( datetime.now().isoformat( timespec = 'seconds' ), cid ) )
+
+    ########## SEARCH
+
+    # DONE: Keyword search over a candidate's bullets. Returns dictionaries sorted by BM25 relevance (best first).
+    def search_bullets( self, candidate:str, query:str, variant:str = ORIGINAL, limit:int = 20 ):
+
+        cid = self.candidate_id( candidate )
+        rows = self.db.execute( """SELECT b.exp_pos, b.position, b.bullet_id, b.description, bm25( bullets_fts ) AS rank
+                                   FROM bullets_fts JOIN bullets b ON b.id = bullets_fts.rowid
+                                   WHERE bullets_fts MATCH ? AND b.candidate_id = ? AND b.variant = ?
+                                   ORDER BY rank LIMIT ?""", ( self.fts_query( query ), cid, variant, limit ) )
+
+        return [ dict( r ) for r in rows ]
+
+    # DONE: Keyword search over a candidate's projects. Returns dictionaries sorted by BM25 relevance (best first).
+    def search_projects( self, candidate:str, query:str, limit:int = 20 ):
+
+        cid = self.candidate_id( candidate )
+        rows = self.db.execute( """SELECT p.position, p.title, p.description, bm25( projects_fts ) AS rank
+                                   FROM projects_fts JOIN projects p ON p.id = projects_fts.rowid
+                                   WHERE projects_fts MATCH ? AND p.candidate_id = ?
+                                   ORDER BY rank LIMIT ?""", ( self.fts_query( query ), cid, limit ) )
+
+        return [ dict( r ) for r in rows ]
+
+    # DONE: Turns free text (e.g. a job description) into an FTS5 query that matches any of its words
+    def fts_query( self, text:str ):
+
+        words = []
+        for w in "".join( c if c.isalnum() else " " for c in text.lower() ).split():
+            if len( w ) > 1 and w not in words:
+                words.append( w )
+
+        # Quote every word, so FTS5 keywords (AND, OR, NEAR) are searched for as plain words
+        return " OR ".join( f'"{w}"' for w in words ) if len( words ) > 0 else '""'
+
+    ########## EMBEDDINGS
+
+    # DONE: Returns the stored embeddings of the texts that have one. text -> float32 vector
+    def get_embeddings( self, model:str, texts:list ):
+
+        keys    = { text_key( t ):t for t in texts }
+        found   = {}
+        key_lst = list( keys )
+
+        # Stay below the SQLite variable limit
+        for i in range( 0, len( key_lst ), 500 ):
+            chunk   = key_lst[i:i+500]
+            rows    = self.db.execute( f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ( {','.join( '?'*len( chunk ) )} )",
+                                       [ model ] + chunk )
+            for r in rows:
+                found[keys[r['hash']]] = np.frombuffer( r['vector'], dtype = np.float32 )
+
+        return found
+
+    # DONE: Stores embeddings. text -> vector
+    def put_embeddings( self, model:str, embeds:dict ):
+
+        if len( embeds ) == 0:
+            return
+
+        with self.transaction() as db:
+            db.executemany( "INSERT OR REPLACE INTO embeddings ( model, hash, dim, vector ) VALUES ( ?, ?, ?, ? )",
+                            [ ( model, text_key( t ), len( v ), np.asarray( v, dtype = np.float32 ).tobytes() ) for t, v in embeds.items() ] )
+
+    ########## RANKINGS
+
+    # DONE: Stores the ranked items of a job. `ranked` is a list of ( exp_pos, [ ( ref_id, score ), ... ] ). Replaces older rankings.
+    def save_rankings( self, candidate:str, key:str, kind:str, ranked:list ):
+
+        cid     = self.candidate_id( candidate )
+        now     = datetime.now().isoformat( timespec = 'seconds' )
+        rows    = [ ( cid, key, kind, exp_pos, rank, ref_id, score, now ) for exp_pos, items in ranked for rank, ( ref_id, score ) in enumerate( items ) ]
+
+        with self.transaction() as db:
+            db.execute( "DELETE FROM rankings WHERE candidate_id = ? AND job_key = ? AND kind = ?", ( cid, key, kind ) )
+            db.executemany( """INSERT INTO rankings ( candidate_id, job_key, kind, exp_pos, rank, ref_id, score, created )
+                               VALUES ( ?, ?, ?, ?, ?, ?, ?, ? )""", rows )
+
+    # DONE: Returns the stored rankings of a job in the same form they were saved. Empty if none were saved.
+    def get_rankings( self, candidate:str, key:str, kind:str ):
+
+        cid     = self.candidate_id( candidate )
+        ranked  = {}
+        for r in self.db.execute( """SELECT exp_pos, ref_id, score FROM rankings WHERE candidate_id = ? AND job_key = ? AND kind = ?
+                                     ORDER BY exp_pos, rank""", ( cid, key, kind ) ):
+            ranked.setdefault( r['exp_pos'], [] ).append( ( r['ref_id'], r['score'] ) )
+
+        return list( ranked.items() )
+
+
+if __name__ == "__main__":
+
+    save_directory  = os.path.dirname( os.path.abspath( __file__ ) )
+
+    # Database to use and the masterlist to import into it
+    db_file         = os.path.join( save_directory, "masterlists.db" )
+    master_list     = os.path.join( save_directory, "masterlist_example.json" )
+    candidate       = "example"
+
+    with MasterlistStore( db_file ) as MS:
+        MS.import_json( master_list, candidate )
+        print( f"Candidates: {MS.list_candidates()}" )
+
+        # Search the bullets of the candidate
+        for r in MS.search_bullets( candidate, "python machine learning", limit = 5 ):
+            print( f"{r['rank']:8.3f}  {r['description'][:100]}" )
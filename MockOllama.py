@@ -0,0 +1,440 @@
+'''
+
+    Title:          Mock Ollama
+
+    Description:    Local stand-in for the Ollama server API, for benchmarking and regression testing the LLM code without a
+                    GPU or real models. It implements the endpoints the software uses (/api/chat, /api/generate, /api/pull,
+                    /api/tags, /api/ps, /api/version) with both regular and streamed responses. Answers are canned and wrapped
+                    in <think> tags like Deepseek R1, and are delayed by a configurable model load time, prefill rate and
+                    decode rate. Errors (404 for missing models, other HTTP errors, and hung requests that time out) can be
+                    injected at a set rate.
+
+                    Point the software at it with `ollama_host = "http://127.0.0.1:11435"` (or the OLLAMA_HOST environment
+                    variable). Statistics are available at GET /mock/stats.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import json
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Default answer for anything that isn't a bullet rewrite
+DEFAULT_RESPONSE    = "I am a scientist and engineer whose experience lines up closely with the needs of this role. " \
+                      "I have built and analyzed complex experiments and the software that runs them. " \
+                      "I have led teams across disciplines and communicated results in publications and presentations. " \
+                      "I am excited to bring these skills to the team."
+
+
+# DONE: Request handler for the mock API
+class MockOllamaHandler( BaseHTTPRequestHandler ):
+
+    # Set by MockOllama before the server starts
+    mock = None
+
+    # Use HTTP/1.1 so the client can keep the connection open between requests
+    protocol_version = "HTTP/1.1"
+
+    # Don't let small writes wait on delayed ACKs, or every request gets ~40 ms slower
+    disable_nagle_algorithm = True
+
+    def log_message( self, format, *args ):
+        if self.mock.verbose:
+            super().log_message( format, *args )
+
+    def send_json( self, code:int, data:dict ):
+        body = json.dumps( data ).encode( "utf-8" )
+        self.send_response( code )
+        self.send_header( "Content-Type", "application/json; charset=utf-8" )
+        self.send_header( "Content-Length", str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def read_body( self ):
+        length = int( self.headers.get( "Content-Length", 0 ) )
+        return json.loads( self.rfile.read( length ) or b"{}" )
+
+    def do_GET( self ):
+
+        if self.path == "/api/tags":
+            self.send_json( 200, { 'models':[ self.mock.model_info( m ) for m in sorted( self.mock.installed ) ] } )
+        elif self.path == "/api/ps":
+            self.send_json( 200, { 'models':[ self.mock.model_info( m ) for m in sorted( self.mock.loaded ) ] } )
+        elif self.path == "/api/version":
+            self.send_json( 200, { 'version':"0.5.0-mock" } )
+        elif self.path == "/mock/stats":
+            self.send_json( 200, self.mock.get_stats() )
+        elif self.path in [ "/", "" ]:
+            body = b"Ollama is running"
+            self.send_response( 200 )
+            self.send_header( "Content-Length", str( len( body ) ) )
+            self.end_headers()
+            self.wfile.write( body )
+        else:
+            self.send_json( 404, { 'error':"404 page not found" } )
+
+    def do_HEAD( self ):
+        self.send_response( 200 )
+        self.send_header( "Content-Length", "0" )
+        self.end_headers()
+
+    def do_POST( self ):
+
+        try:
+            request = self.read_body()
+        except ValueError as e:
+            self.send_json( 400, { 'error':f"invalid JSON: {e}" } )
+            return
+
+        if self.path in [ "/api/chat", "/api/generate" ]:
+            self.mock.handle_generate( self, self.path, request )
+        elif self.path == "/api/pull":
+            self.mock.handle_pull( self, request )
+        elif self.path == "/api/show":
+            model = self.mock.full_name( request.get( 'model', request.get( 'name', "" ) ) )
+            if model in self.mock.installed:
+                self.send_json( 200, { 'modelfile':"", 'parameters':"", 'template':"", 'details':self.mock.model_info( model )['details'] } )
+            else:
+                self.send_json( 404, { 'error':f"model '{model}' not found" } )
+        else:
+            self.send_json( 404, { 'error':"404 page not found" } )
+
+    def do_DELETE( self ):
+        request = self.read_body()
+        model   = self.mock.full_name( request.get( 'model', request.get( 'name', "" ) ) )
+        with self.mock.lock:
+            self.mock.installed.discard( model )
+            self.mock.loaded.pop( model, None )
+        self.send_json( 200, {} )
+
+
+class MockOllama:
+
+    def __init__( self,
+                host:str                = "127.0.0.1",
+                port:int                = 11435,        # Not the real Ollama port, so both can run at the same time
+                models:list             = [ 'deepseek-r1:1.5b', 'deepseek-r1:7b', 'deepseek-r1:8b', 'deepseek-r1:14b', 'deepseek-r1:32b' ],
+                prefill_rate:float      = 0.,           # Prompt tokens per second. 0 = instant
+                decode_rate:float       = 0.,           # Generated tokens per second. 0 = instant
+                load_time:float         = 0.,           # Seconds to "load" a model that isn't loaded yet
+                num_parallel:int        = 1,            # Requests processed at the same time, like OLLAMA_NUM_PARALLEL. Others wait.
+                responses:dict          = {},           # Canned answers. { 'text in the prompt':'answer' }
+                think:str               = "Thinking about the request.",
+                error_rate:float        = 0.,           # Fraction of requests that fail with error_code
+                error_code:int          = 500,
+                timeout_rate:float      = 0.,           # Fraction of requests that hang for timeout_seconds before answering
+                timeout_seconds:float   = 30.,
+                stream_chunk:int        = 4,            # Characters per streamed chunk (roughly one token)
+                seed:int                = 0,
+                verbose:bool            = False ):
+
+        self.host               = host
+        self.port               = port
+        self.installed          = set( models )
+        self.prefill_rate       = prefill_rate
+        self.decode_rate        = decode_rate
+        self.load_time          = load_time
+        self.responses          = dict( responses )
+        self.think              = think
+        self.error_rate         = error_rate
+        self.error_code         = error_code
+        self.timeout_rate       = timeout_rate
+        self.timeout_seconds    = timeout_seconds
+        self.stream_chunk       = stream_chunk
+        self.verbose            = verbose
+
+        # Internal
+        self.rng        = random.Random( seed )
+        self.lock       = threading.Lock()
+        self.slots      = threading.Semaphore( num_parallel )
+        self.loaded     = {}                        # model -> time when it gets unloaded (None = never)
+        self.server     = None
+        self.thread     = None
+        self.stats      = { 'requests':0, 'chat':0, 'generate':0, 'pull':0, 'errors':0, 'not_found':0, 'timeouts':0,
+                            'loads':0, 'prompt_tokens':0, 'tokens_generated':0, 'busy_seconds':0. }
+
+    # The URL to give to the ollama client
+    @property
+    def url( self ):
+        return f"http://{self.host}:{self.port}"
+
+    # DONE: Adds the ':latest' tag the same way Ollama does
+    def full_name( self, model:str ):
+        return model if ":" in model else f"{model}:latest"
+
+    # DONE: Model details in the same form as /api/tags
+    def model_info( self, model:str ):
+        size = model.split( ":" )[-1]
+        return {    'name':         model,
+                    'model':        model,
+                    'modified_at':  datetime.now( timezone.utc ).isoformat(),
+                    'size':         0,
+                    'digest':       "0"*64,
+                    'details':      { 'format':"gguf", 'family':"mock", 'parameter_size':size.upper(), 'quantization_level':"Q4_K_M" } }
+
+    # DONE: Returns a copy of the statistics
+    def get_stats( self ):
+        with self.lock:
+            return dict( self.stats, installed = sorted( self.installed ), loaded = sorted( self.loaded ) )
+
+    def count( self, key:str, value = 1 ):
+        with self.lock:
+            self.stats[key] += value
+
+    # DONE: Rough token count (~4 characters per token)
+    def tokens( self, text:str ):
+        return max( 1, len( text )//4 )
+
+    # DONE: Builds the canned answer for a prompt
+    def answer( self, prompt:str ):
+
+        for key, value in self.responses.items():
+            if key in prompt:
+                return f"<think>\n{self.think}\n</think>\n{value}"
+
+        # Bullet rebuild prompts get their bullets echoed back as a markdown list
+        if "Rewrite the following bullet points" in prompt:
+            bullets = [ line[2:] for line in prompt.split( "\n" ) if line.startswith( "- " ) ]
+            return f"<think>\n{self.think}\n</think>\n" + "".join( f"\n- {b}" for b in bullets )
+
+        return f"<think>\n{self.think}\n</think>\n{DEFAULT_RESPONSE}"
+
+    # DONE: Loads a model (if needed) and applies the keep-alive. Returns the load time in seconds.
+    def load_model( self, model:str, keep_alive ):
+
+        now     = time.time()
+        wait    = 0.
+
+        with self.lock:
+            # Unload models whose keep-alive has run out
+            for m, until in list( self.loaded.items() ):
+                if until is not None and until < now:
+                    del self.loaded[m]
+
+            if model not in self.loaded:
+                wait = self.load_time
+                self.stats['loads'] += 1
+
+            # Work out the keep-alive. Ollama's default is 5 minutes
+            seconds = parse_keep_alive( keep_alive )
+            if seconds is not None and seconds == 0:
+                self.loaded.pop( model, None )
+            else:
+                self.loaded[model] = None if seconds is not None and seconds < 0 else now + ( 300 if seconds is None else seconds )
+
+        if wait > 0:
+            time.sleep( wait )
+
+        return wait
+
+    # DONE: Handles /api/chat and /api/generate
+    def handle_generate( self, handler:MockOllamaHandler, path:str, request:dict ):
+
+        self.count( 'requests' )
+        self.count( 'chat' if path == "/api/chat" else 'generate' )
+
+        model   = self.full_name( request.get( 'model', "" ) )
+        stream  = request.get( 'stream', True )
+
+        if model not in self.installed:
+            self.count( 'not_found' )
+            handler.send_json( 404, { 'error':f"model \"{model}\" not found, try pulling it first" } )
+            return
+
+        # Injected failures
+        with self.lock:
+            roll_err    = self.rng.random()
+            roll_to     = self.rng.random()
+        if roll_err < self.error_rate:
+            self.count( 'errors' )
+            handler.send_json( self.error_code, { 'error':f"mock error {self.error_code}" } )
+            return
+        if roll_to < self.timeout_rate:
+            self.count( 'timeouts' )
+            time.sleep( self.timeout_seconds )
+
+        if path == "/api/chat":
+            prompt = "\n".join( m.get( 'content', "" ) for m in request.get( 'messages', [] ) )
+        else:
+            prompt = request.get( 'prompt', "" )
+
+        # Only one request per slot at a time, like a real Ollama server
+        with self.slots:
+            start       = time.perf_counter()
+            load_time   = self.load_model( model, request.get( 'keep_alive' ) )
+
+            # An empty generate request only loads the model
+            if path == "/api/generate" and prompt == "":
+                handler.send_json( 200, { 'model':model, 'created_at':now_iso(), 'response':"", 'done':True, 'done_reason':"load" } )
+                return
+
+            content         = self.answer( prompt )
+            prompt_tokens   = self.tokens( prompt )
+            tokens          = self.tokens( content )
+
+            prefill = prompt_tokens/self.prefill_rate if self.prefill_rate > 0 else 0.
+            if prefill > 0:
+                time.sleep( prefill )
+
+            decode_per_chunk    = self.stream_chunk/4/self.decode_rate if self.decode_rate > 0 else 0.
+            final               = { 'model':model, 'created_at':now_iso(), 'done':True, 'done_reason':"stop",
+                                    'load_duration':int( load_time*1e9 ), 'prompt_eval_count':prompt_tokens,
+                                    'prompt_eval_duration':int( prefill*1e9 ), 'eval_count':tokens }
+
+            if stream:
+                handler.send_response( 200 )
+                handler.send_header( "Content-Type", "application/x-ndjson" )
+                handler.send_header( "Transfer-Encoding", "chunked" )
+                handler.end_headers()
+
+                for i in range( 0, len( content ), self.stream_chunk ):
+                    piece = content[i:i+self.stream_chunk]
+                    if decode_per_chunk > 0:
+                        time.sleep( decode_per_chunk )
+                    chunk = { 'model':model, 'created_at':now_iso(), 'done':False }
+                    if path == "/api/chat":
+                        chunk['message']    = { 'role':"assistant", 'content':piece }
+                    else:
+                        chunk['response']   = piece
+                    write_chunk( handler, chunk )
+
+                if path == "/api/chat":
+                    final['message']    = { 'role':"assistant", 'content':"" }
+                else:
+                    final['response']   = ""
+                final['eval_duration']  = int( ( time.perf_counter() - start - prefill - load_time )*1e9 )
+                final['total_duration'] = int( ( time.perf_counter() - start )*1e9 )
+                write_chunk( handler, final )
+                handler.wfile.write( b"0\r\n\r\n" )
+
+            else:
+                decode = tokens/self.decode_rate if self.decode_rate > 0 else 0.
+                if decode > 0:
+                    time.sleep( decode )
+                if path == "/api/chat":
+                    final['message']    = { 'role':"assistant", 'content':content }
+                else:
+                    final['response']   = content
+                final['eval_duration']  = int( decode*1e9 )
+                final['total_duration'] = int( ( time.perf_counter() - start )*1e9 )
+                handler.send_json( 200, final )
+
+            self.count( 'prompt_tokens', prompt_tokens )
+            self.count( 'tokens_generated', tokens )
+            self.count( 'busy_seconds', time.perf_counter() - start )
+
+    # DONE: Handles /api/pull. The model is "installed" right away.
+    def handle_pull( self, handler:MockOllamaHandler, request:dict ):
+
+        self.count( 'requests' )
+        self.count( 'pull' )
+
+        model = self.full_name( request.get( 'model', request.get( 'name', "" ) ) )
+        with self.lock:
+            self.installed.add( model )
+
+        if request.get( 'stream', True ):
+            handler.send_response( 200 )
+            handler.send_header( "Content-Type", "application/x-ndjson" )
+            handler.send_header( "Transfer-Encoding", "chunked" )
+            handler.end_headers()
+            for status in [ "pulling manifest", "verifying sha256 digest", "writing manifest", "success" ]:
+                write_chunk( handler, { 'status':status } )
+            handler.wfile.write( b"0\r\n\r\n" )
+        else:
+            handler.send_json( 200, { 'status':"success" } )
+
+    # DONE: Starts the server in a background thread
+    def start( self ):
+
+        MockOllamaHandler.mock  = self
+        self.server             = ThreadingHTTPServer( ( self.host, self.port ), MockOllamaHandler )
+        self.server.daemon_threads = True
+
+        # Port 0 picks a free port
+        self.port               = self.server.server_address[1]
+        self.thread             = threading.Thread( target = self.server.serve_forever, daemon = True )
+        self.thread.start()
+
+        print( f"Mock Ollama listening on {self.url}" )
+        return self
+
+    # DONE: Stops the server
+    def stop( self ):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__( self ):
+        return self.start()
+
+    def __exit__( self, *args ):
+        self.stop()
+        return False
+
+
+# DONE: Converts an Ollama keep_alive value to seconds. None = server default, negative = forever
+def parse_keep_alive( keep_alive ):
+
+    if keep_alive is None:
+        return None
+    if isinstance( keep_alive, ( int, float ) ):
+        return float( keep_alive )
+
+    text    = str( keep_alive ).strip()
+    units   = { 'ms':0.001, 's':1, 'm':60, 'h':3600 }
+    for unit in [ 'ms', 's', 'm', 'h' ]:
+        if text.endswith( unit ):
+            try:
+                return float( text[:-len( unit )] )*units[unit]
+            except ValueError:
+                return None
+    try:
+        return float( text )
+    except ValueError:
+        return None
+
+
+def now_iso():
+    return datetime.now( timezone.utc ).isoformat()
+
+
+# DONE: Writes a single NDJSON line as an HTTP chunk
+def write_chunk( handler, data:dict ):
+    line = ( json.dumps( data ) + "\n" ).encode( "utf-8" )
+    handler.wfile.write( f"{len( line ):X}\r\n".encode( "ascii" ) + line + b"\r\n" )
+    handler.wfile.flush()
+
+
+if __name__ == "__main__":
+
+    # Where to listen. Point the software at it with ollama_host = "http://127.0.0.1:11435"
+    host            = "127.0.0.1"
+    port            = 11435
+
+    # Simulated speed of the model. Roughly a 32b model on a CPU.
+    prefill_rate    = 50.
+    decode_rate     = 5.
+    load_time       = 10.
+
+    # Fraction of requests that fail or hang
+    error_rate      = 0.
+    timeout_rate    = 0.
+
+    MO = MockOllama( host = host, port = port, prefill_rate = prefill_rate, decode_rate = decode_rate, load_time = load_time,
+                     error_rate = error_rate, timeout_rate = timeout_rate, verbose = True )
+    MO.start()
+
+    try:
+        MO.thread.join()
+    except KeyboardInterrupt:
+        MO.stop()
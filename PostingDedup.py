@@ -0,0 +1,331 @@
+'''
+
+    Title:          Posting Dedup
+
+    Description:    Near-duplicate detection for incoming job postings. Job feeds repeat the same posting many times, re-posted,
+                    posted for another location or copied by a recruiter under another company name. Each copy used to cost a
+                    full build (the LLM summary and cover letter, the BERT scoring and the PDF rendering) for documents that
+                    come out essentially the same.
+
+                    Each posting is cut into word shingles and given a MinHash signature, whose share of equal values estimates
+                    the Jaccard similarity of the shingle sets. The signature is split into bands, and postings sharing the hash
+                    of any band are the candidates (locality-sensitive hashing), so a lookup reads a handful of buckets instead
+                    of comparing every stored posting. Candidates are kept above the Jaccard threshold.
+
+                    Every finished build is stored with its signature: the rebuilt masterlist, the chosen bullets, skills and
+                    projects, the summary and the cover letter text. A near-duplicate posting of the same scope (masterlist and
+                    options) reuses them, and only the job title and company are put in again before the documents are
+                    rendered. Lookups, duplicates and the build time saved are counted in the database.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import re
+import time
+import json
+import zlib
+import hashlib
+import numpy as np
+from Tracer import tracer
+from Masterlist import json_default
+from SQLiteDB import SQLiteDB
+
+
+DEDUP_FILE  = "posting_dedup.db"
+
+# Prime modulus of the MinHash permutations. Shingle hashes are taken below it, so a*h + b fits in 64 bits.
+PRIME       = ( 1 << 31 ) - 1
+
+SCHEMA  = """
+CREATE TABLE IF NOT EXISTS postings (
+    id          INTEGER PRIMARY KEY,
+    scope       TEXT NOT NULL,
+    job_title   TEXT,
+    job_company TEXT,
+    signature   BLOB NOT NULL,
+    build       TEXT NOT NULL,
+    seconds     REAL NOT NULL,
+    created     REAL NOT NULL,
+    last_used   REAL NOT NULL,
+    reused      INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS postings_scope ON postings ( scope, last_used );
+
+CREATE TABLE IF NOT EXISTS bands (
+    scope       TEXT NOT NULL,
+    band        INTEGER NOT NULL,
+    bucket      INTEGER NOT NULL,
+    posting     INTEGER NOT NULL,
+    PRIMARY KEY ( scope, band, bucket, posting )
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS stats (
+    key         TEXT PRIMARY KEY,
+    value       REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+# DONE: `default` for json.dumps of a build. Records as dictionaries, numpy scores as numbers.
+def build_default( obj ):
+    if isinstance( obj, np.generic ):
+        return obj.item()
+    if isinstance( obj, np.ndarray ):
+        return obj.tolist()
+    return json_default( obj )
+
+
+# DONE: Key of the masterlist and the options a build was made with. Only builds of the same scope are reused.
+def build_scope( mList, options:dict ):
+    return hashlib.sha1( json.dumps( [ mList.to_dict(), options ], sort_keys = True, default = build_default ).encode( "utf-8" ) ).hexdigest()
+
+
+class MinHash:
+
+    def __init__( self,
+                num_perm:int    = 128,      # Length of the signatures
+                bands:int       = 16,       # LSH bands. Postings sharing one band are compared. num_perm must be a multiple
+                shingle:int     = 3,        # Words per shingle
+                seed:int        = 1 ):      # Seed of the permutations. Stored signatures are only comparable with the same seed
+
+        if num_perm % bands != 0:
+            raise ValueError( f"num_perm ({num_perm}) must be a multiple of bands ({bands})" )
+
+        self.num_perm   = num_perm
+        self.bands      = bands
+        self.rows       = num_perm//bands
+        self.shingle    = shingle
+
+        rng             = np.random.RandomState( seed )
+        self.a          = rng.randint( 1, PRIME, size = num_perm ).astype( np.uint64 )
+        self.b          = rng.randint( 0, PRIME, size = num_perm ).astype( np.uint64 )
+
+    # DONE: Returns the hashed word shingles of a text. The job title and company are left out, since a repost under
+    #       another title or company is still the same posting.
+    def shingles( self, text:str, drop = () ):
+
+        text    = text.lower()
+        for d in drop:
+            if d.strip() != "":
+                text = text.replace( d.lower(), " " )
+
+        words   = re.findall( r"[a-z0-9+#]+", text )
+        k       = min( self.shingle, max( len( words ), 1 ) )
+        grams   = { " ".join( words[i:i + k] ) for i in range( max( len( words ) - k + 1, 1 ) ) }
+
+        return np.array( [ zlib.crc32( g.encode( "utf-8" ) ) % PRIME for g in grams ], dtype = np.uint64 )
+
+    # DONE: Returns the MinHash signature of a text
+    def signature( self, text:str, drop = () ):
+
+        h   = self.shingles( text, drop )
+        return ( ( self.a[:, None]*h[None, :] + self.b[:, None] ) % PRIME ).min( axis = 1 ).astype( np.uint32 )
+
+    # DONE: Returns the bucket of each band of a signature, as signed 64-bit integers for SQLite
+    def buckets( self, sig:np.ndarray ):
+        return [ int.from_bytes( hashlib.blake2b( sig[i*self.rows:( i + 1 )*self.rows].tobytes(), digest_size = 8 ).digest(), "little", signed = True )
+                 for i in range( self.bands ) ]
+
+    # DONE: Estimated Jaccard similarity of two signatures
+    @staticmethod
+    def similarity( a:np.ndarray, b:np.ndarray ):
+        return float( np.mean( a == b ) ) if len( a ) == len( b ) else 0.
+
+
+# DONE: Finds the near-duplicates within a batch of postings. Returns, for each posting, the index of the earlier posting it
+#       duplicates, or None. Postings are given as texts or as job dictionaries ('job_title', 'job_company', 'job_desc').
+def near_duplicates( postings:list, threshold:float = 0.8, hasher:MinHash = None ):
+
+    hasher  = hasher if hasher is not None else MinHash()
+    tables  = [ {} for _ in range( hasher.bands ) ]
+    sigs    = []
+    dup_of  = []
+
+    for i, p in enumerate( postings ):
+        if isinstance( p, dict ):
+            sig = hasher.signature( p.get( 'job_desc', "" ), ( p.get( 'job_company', "" ), p.get( 'job_title', "" ) ) )
+        else:
+            sig = hasher.signature( p )
+        sigs.append( sig )
+
+        # Compare with the earlier postings sharing a band, and keep the closest above the threshold
+        found       = None
+        best        = threshold
+        buckets     = hasher.buckets( sig )
+        candidates  = { j for band, bucket in enumerate( buckets ) for j in tables[band].get( bucket, () ) }
+        for j in candidates:
+            s = MinHash.similarity( sig, sigs[j] )
+            if s >= best:
+                found, best = j, s
+
+        # Only originals go into the buckets, so every duplicate points at one of them
+        if found is None:
+            for band, bucket in enumerate( buckets ):
+                tables[band].setdefault( bucket, [] ).append( i )
+        else:
+            found = found if dup_of[found] is None else dup_of[found]
+        dup_of.append( found )
+
+    return dup_of
+
+
+class PostingDedup( SQLiteDB ):
+
+    def __init__( self,
+                db_file:str,                            # SQLite database of the stored builds
+                threshold:float     = 0.8,              # Estimated Jaccard similarity above which a posting reuses a build
+                hasher:MinHash      = None,             # Shingling and MinHash settings. None = MinHash()
+                max_entries:int     = 2000 ):           # Max builds kept per scope. The least recently used go first
+
+        self.threshold      = threshold
+        self.hasher         = hasher if hasher is not None else MinHash()
+        self.max_entries    = max_entries
+
+        # One connection per thread, so the dedup can be shared by the service workers
+        super().__init__( db_file, SCHEMA )
+
+    # DONE: Returns the signature of a posting, leaving its title and company out
+    def signature( self, posting:str, job_title:str = "", job_company:str = "" ):
+        return self.hasher.signature( posting, ( job_company, job_title ) )
+
+    # DONE: Returns the stored build of the closest near-duplicate posting, or None if none is above the threshold.
+    #       The returned entry has 'id', 'job_title', 'job_company', 'build' (parsed), 'seconds' and 'similarity'.
+    def find( self, scope:str, posting:str, job_title:str = "", job_company:str = "" ):
+
+        with tracer.span( "PostingDedup.find", "cache" ) as sp:
+
+            sig         = self.signature( posting, job_title, job_company )
+            candidates  = set()
+            for band, bucket in enumerate( self.hasher.buckets( sig ) ):
+                candidates.update( r[0] for r in self.db.execute( "SELECT posting FROM bands WHERE scope = ? AND band = ? AND bucket = ?",
+                                                                  ( scope, band, bucket ) ) )
+
+            best        = None
+            if len( candidates ) > 0:
+                rows    = self.db.execute( f"SELECT id, signature FROM postings WHERE id IN ( {','.join( '?'*len( candidates ) )} )",
+                                           list( candidates ) ).fetchall()
+                sims    = [ ( MinHash.similarity( sig, np.frombuffer( r['signature'], dtype = np.uint32 ) ), r['id'] ) for r in rows ]
+                sim, i  = max( sims, default = ( 0., None ) )
+                if sim >= self.threshold:
+                    best                = dict( self.db.execute( "SELECT id, job_title, job_company, build, seconds FROM postings WHERE id = ?", ( i, ) ).fetchone() )
+                    best['build']       = json.loads( best['build'] )
+                    best['similarity']  = sim
+
+            with self.transaction() as db:
+                self.count( db, 'lookups' )
+                if best is not None:
+                    self.count( db, 'duplicates' )
+                    db.execute( "UPDATE postings SET last_used = ? WHERE id = ?", ( time.time(), best['id'] ) )
+
+            sp.set( 'candidates', len( candidates ) )
+            sp.set( 'posting_dedup', 'duplicate' if best is not None else 'new' )
+
+        return best
+
+    # DONE: Records that a stored build was reused, and the time that saved
+    def reused( self, entry_id:int, seconds_saved:float ):
+
+        with self.transaction() as db:
+            self.count( db, 'seconds_saved', max( seconds_saved, 0. ) )
+            db.execute( "UPDATE postings SET reused = reused + 1 WHERE id = ?", ( entry_id, ) )
+
+    # DONE: Stores the build of a posting and the time it took, then evicts the scope down to its limit
+    def add( self, scope:str, posting:str, job_title:str, job_company:str, build:dict, seconds:float ):
+
+        sig     = self.signature( posting, job_title, job_company )
+        now     = time.time()
+
+        with self.transaction() as db:
+            cur = db.execute( "INSERT INTO postings ( scope, job_title, job_company, signature, build, seconds, created, last_used ) VALUES ( ?, ?, ?, ?, ?, ?, ?, ? )",
+                              ( scope, job_title, job_company, sig.tobytes(), json.dumps( build, default = build_default ), seconds, now, now ) )
+            db.executemany( "INSERT OR IGNORE INTO bands ( scope, band, bucket, posting ) VALUES ( ?, ?, ?, ? )",
+                            [ ( scope, band, bucket, cur.lastrowid ) for band, bucket in enumerate( self.hasher.buckets( sig ) ) ] )
+            self.evict_scope( db, scope )
+
+        return cur.lastrowid
+
+    # DONE: Removes the least recently used builds of a scope over max_entries. Returns how many were removed.
+    def evict_scope( self, db, scope:str ):
+
+        if self.max_entries <= 0:
+            return 0
+
+        ids = [ r[0] for r in db.execute( "SELECT id FROM postings WHERE scope = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?", ( scope, self.max_entries ) ) ]
+        for i in ids:
+            db.execute( "DELETE FROM bands WHERE scope = ? AND posting = ?", ( scope, i ) )
+            db.execute( "DELETE FROM postings WHERE id = ?", ( i, ) )
+
+        return len( ids )
+
+    # DONE: Removes every stored build, or those of one scope
+    def clear( self, scope:str = None ):
+
+        with self.transaction() as db:
+            if scope is None:
+                db.execute( "DELETE FROM bands" )
+                db.execute( "DELETE FROM postings" )
+            else:
+                db.execute( "DELETE FROM bands WHERE scope = ?", ( scope, ) )
+                db.execute( "DELETE FROM postings WHERE scope = ?", ( scope, ) )
+
+    # DONE: Returns the stored builds, the lookups, the duplicates found, the dedup rate and the build time saved
+    def stats( self ):
+
+        values      = self.counters()
+        entries     = self.db.execute( "SELECT COUNT(*) FROM postings" ).fetchone()[0]
+        lookups     = int( values.get( 'lookups', 0 ) )
+        duplicates  = int( values.get( 'duplicates', 0 ) )
+
+        return {    'entries':          entries,
+                    'lookups':          lookups,
+                    'duplicates':       duplicates,
+                    'dedup_rate':       round( duplicates/lookups, 3 ) if lookups > 0 else 0.,
+                    'seconds_saved':    round( values.get( 'seconds_saved', 0. ), 2 ) }
+
+
+if __name__ == "__main__":
+
+    import random
+    from MasterlistGenerator import MasterlistGenerator
+
+    # A synthetic job feed. Part of it are reposts of earlier postings by a recruiter, under their name, with a line added.
+    feed_size       = 20000
+    repost_share    = 0.3
+    threshold       = 0.8
+    recruiters      = [ "Acme Staffing", "Northwind Talent", "Globex Recruiting" ]
+
+    rng     = random.Random( 7 )
+    feed    = []
+    reposts = []
+    for p in MasterlistGenerator( seed = 7 ).postings( feed_size ):
+        repost  = len( feed ) > 0 and rng.random() < repost_share
+        if repost:
+            src     = rng.choice( feed )
+            company = rng.choice( recruiters )
+            p       = { 'job_title':   src['job_title'],
+                        'job_company': company,
+                        'job_desc':    src['job_desc'].replace( src['job_company'], company ) + rng.choice( [ " Remote friendly.", " Apply today." ] ) }
+        feed.append( p )
+        reposts.append( repost )
+
+    hasher  = MinHash()
+    start   = time.perf_counter()
+    dup_of  = near_duplicates( feed, threshold = threshold, hasher = hasher )
+    seconds = time.perf_counter() - start
+
+    # The exact Jaccard similarity of each flagged posting and its original. The generator repeats itself too,
+    # so some postings that aren't reposts are near-copies all the same.
+    def jaccard( p, q ):
+        a, b = [ set( hasher.shingles( x['job_desc'], ( x['job_company'], x['job_title'] ) ).tolist() ) for x in ( p, q ) ]
+        return len( a & b )/max( len( a | b ), 1 )
+
+    found   = [ d is not None for d in dup_of ]
+    exact   = [ jaccard( feed[i], feed[d] ) for i, d in enumerate( dup_of ) if d is not None ]
+    print( f"{len( feed )} postings deduplicated in {seconds:.2f} s ({seconds/len( feed )*1000:.3f} ms per posting)" )
+    print( f"Dedup rate: {sum( found )/len( feed )*100:.1f}% ({sum( found )} duplicates, {sum( reposts )} reposts in the feed)" )
+    print( f"Reposts found: {sum( f and r for f, r in zip( found, reposts ) )/max( sum( reposts ), 1 )*100:.1f}%" )
+    print( f"Duplicates with an exact Jaccard similarity of {threshold - 0.1:.1f} or more to their original: {np.mean( np.array( exact ) >= threshold - 0.1 )*100:.1f}%" )
@@ -14,9 +14,15 @@
 # Import libraries
 import os
 import json
+import time
 import string
 from typing import Optional
-from sentence_transformers import SentenceTransformer, util
+from BERTEncoder import BERTEncoder
+from Tracer import tracer, traced
+from BM25Index import hybrid_scores
+from SkillGraph import SkillGraph
+from MMR import mmr_select, duplicate_clusters, cached_embeddings
+from Reranker import Reranker
 
 
 class BERTProjects:
@@ -26,32 +32,75 @@ class BERTProjects:
                 job_description:str = "", 
                 projects:list       = [],
                 BERTModel:str       = "all-mpnet-base-v2",
-                count:int           = 5  ):
+                count:int           = 5,
+                encoder:Optional[BERTEncoder] = None,
+                lexical_weight:float    = 0.,
+                prefilter_m:int         = 0,
+                skills:Optional[list]   = None,
+                subskills:Optional[list]= None,
+                skill_weight:float      = 0.,
+                mmr_lambda:float        = 1.,
+                dup_threshold:float     = 0.9,
+                rerank_n:int            = 0,
+                reranker:Optional[Reranker] = None ):
         
         self.job_desc   = job_description
         self.projects   = projects
         self.count      = count
         self.job_title  = job_title
         self.BERTModel  = BERTModel
+        self.encoder    = encoder if encoder is not None else BERTEncoder( BERTModel = BERTModel )
+        self.lexical_weight = lexical_weight    # Weight of the BM25 keyword score in the ranking. 0 = BERT only
+        self.prefilter_m    = prefilter_m       # If > 0, only the top-M keyword matches are encoded
+        self.skills         = skills or []      # Skills and subskills of the masterlist, for the skill graph boost
+        self.subskills      = subskills or []
+        self.skill_weight   = skill_weight      # Weight of the relevance of each project's linked skills. 0 = off
+        self.mmr_lambda     = mmr_lambda        # MMR trade-off of relevance vs. diversity. 1 = relevance only (off)
+        self.dup_threshold  = dup_threshold     # Similarity above which two projects are near-duplicates
+        self.duplicates     = []
+        self.rerank_n       = rerank_n          # If > 0, the top-N projects are reranked with a cross-encoder
+        self.reranker       = reranker if reranker is not None or rerank_n <= 0 else Reranker()
+        self.timings        = {}
 
         self.results    = {}
         self.fulldesc   = self.job_title + " " + self.job_desc
 
     # Process the BERT model
+    @traced( "BERTProjects.render", "bert" )
     def render( self ):
         # Ensure that there are more projects that the listed count max
         if len( self.projects ) > self.count:
-            self.model      = SentenceTransformer( self.BERTModel )
-            desc_embed      = self.model.encode( self.fulldesc )
-
-            BERTRatings = []
-            for b in self.projects:
-                b_embed     = self.model.encode( f"{b['title']} - {b['description']}" )
-                BERTRatings.append( util.cos_sim( desc_embed, b_embed ).item() )
+            # Score every project against the description in one batch
+            texts       = [ f"{b['title']} - {b['description']}" for b in self.projects ]
+            start       = time.perf_counter()
+            with tracer.span( "BERTProjects.retrieve", "bert", projects = len( texts ) ):
+                BERTRatings = hybrid_scores( self.encoder, self.fulldesc, texts, self.lexical_weight, self.prefilter_m, min_keep = self.count )
+
+                # Boost each project by the relevance of the skills it used
+                if self.skill_weight > 0 and len( self.skills ) + len( self.subskills ) > 0:
+                    graph       = SkillGraph.for_links( self.skills, self.subskills, projects = self.projects )
+                    BERTRatings = BERTRatings + self.skill_weight*graph.project_scores( graph.skill_relevance( self.encoder, self.fulldesc ) )
+            self.timings['retrieve_s'] = time.perf_counter() - start
+
+            # The cross-encoder reorders only the top-N projects
+            if self.rerank_n > 0:
+                start       = time.perf_counter()
+                with tracer.span( "BERTProjects.rerank", "bert", top_n = self.rerank_n ):
+                    BERTRatings = self.reranker.rerank( self.fulldesc, texts, BERTRatings, self.rerank_n )
+                self.timings['rerank_s'] = time.perf_counter() - start
+
+            BERTRatings = BERTRatings.tolist()
+
+            # Diversity selection from the cached project embeddings
+            if self.mmr_lambda < 1.:
+                embeds          = cached_embeddings( self.encoder, texts, BERTRatings )
+                self.duplicates = [ [ self.projects[i]['id'] for i in c ] for c in duplicate_clusters( embeds, self.dup_threshold ) ]
+                self.results    = [ self.projects[i] for i in mmr_select( BERTRatings, embeds, self.count, self.mmr_lambda ) ]
+                return self.results
 
             # Combine the BERT ratings and the skills list for sorting
             comb_bs     = list( zip( BERTRatings, self.projects ) )
-            comb_bs.sort( reverse = True )
+            comb_bs.sort( key = lambda x: x[0], reverse = True )
 
             # Separate the lists
             _, sorted_projects  = zip( *comb_bs )
@@ -0,0 +1,107 @@
+'''
+
+    Title:          Prompt Compressor
+
+    Description:    Shortens the job posting that is quoted in the summary and cover letter prompts. On CPU-bound hosts the
+                    prefill of a long posting dominates the LLM latency, while most of its sentences add little to the answer.
+
+                    Every sentence is scored by how central it is to the posting (cosine to the mean sentence embedding, so
+                    the sentences that say what the whole posting is about win) and by how many skill keywords of the
+                    masterlist it names. The best sentences are kept up to a token budget, in their original order. The skill
+                    keywords of the whole posting are listed on their own line first, so none of them are lost. Sentence
+                    embeddings come from the shared encoder cache.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import time
+import math
+import numpy as np
+from Tracer import tracer
+from JobPosting import split_sentences, estimate_tokens, is_heading
+
+
+class PromptCompressor:
+
+    def __init__( self,
+                encoder,                            # BERTEncoder for the sentence embeddings
+                matcher             = None,         # Optional KeywordMatcher of the masterlist's skills
+                budget:int          = 256,          # Token budget of the compressed posting
+                keyword_weight:float= 0.3 ):        # Weight of the keyword hits vs. the centrality. 0 = centrality only
+
+        self.encoder        = encoder
+        self.matcher        = matcher
+        self.budget         = budget
+        self.keyword_weight = keyword_weight
+        self.report         = {}
+
+    # DONE: Returns the compressed posting. Postings already within the budget are returned unchanged.
+    def compress( self, text:str ):
+
+        with tracer.span( "PromptCompressor.compress", "llm" ) as sp:
+
+            before      = estimate_tokens( text )
+            sentences   = [ s for line in text.splitlines() if line.strip() != "" and not is_heading( line.strip() ) for s in split_sentences( line ) ]
+            if before <= self.budget or len( sentences ) == 0:
+                self.report = { 'original_tokens':before, 'compressed_tokens':before, 'sentences_kept':len( sentences ), 'sentences_total':len( sentences ) }
+                return text
+
+            # Centrality: cosine of each sentence to the normalized mean of all of them
+            embeds      = self.encoder.encode( sentences )
+            centroid    = embeds.mean( axis = 0 )
+            centroid    /= max( np.linalg.norm( centroid ), 1e-12 )
+            centrality  = embeds @ centroid
+
+            # Keyword hits, log-scaled so a list of twenty skills doesn't drown out everything else
+            keywords    = []
+            hits        = np.zeros( len( sentences ), dtype = np.float32 )
+            if self.matcher is not None:
+                keywords    = list( dict.fromkeys( name for _, _, _, _, name in self.matcher.matches( text ) ) )
+                for i, s in enumerate( sentences ):
+                    hits[i] = math.log1p( len( self.matcher.matches( s ) ) )
+                if hits.max() > 0:
+                    hits /= hits.max()
+
+            scores      = ( 1. - self.keyword_weight )*centrality + self.keyword_weight*hits
+
+            # The posting's skill keywords come first, then the best sentences that still fit
+            header      = f"Key skills: {', '.join( keywords )}" if len( keywords ) > 0 else ""
+            used        = estimate_tokens( header )
+            chosen      = []
+            for i in np.argsort( -scores, kind = 'stable' ).tolist():
+                cost = estimate_tokens( sentences[i] ) + 1
+                if used + cost > self.budget:
+                    continue
+                used    += cost
+                chosen.append( i )
+
+            parts       = ( [ header ] if header != "" else [] ) + [ sentences[i] for i in sorted( chosen ) ]
+            compressed  = "\n".join( parts )
+
+            self.report = { 'original_tokens':      before,
+                            'compressed_tokens':    estimate_tokens( compressed ),
+                            'sentences_kept':       len( chosen ),
+                            'sentences_total':      len( sentences ),
+                            'keywords':             len( keywords ) }
+            sp.set( 'tokens_saved', before - self.report['compressed_tokens'] )
+
+        return compressed
+
+    # DONE: Runs the same generation with the full and the compressed posting. Returns the latency of each and the
+    #       cosine similarity of the two outputs. `generate` takes the posting text and returns the generated text.
+    def evaluate( self, generate, full:str, compressed:str ):
+
+        results = {}
+        for name, text in ( ( 'full', full ), ( 'compressed', compressed ) ):
+            start           = time.perf_counter()
+            output          = generate( text )
+            results[name]   = { 'seconds':time.perf_counter() - start, 'prompt_tokens':estimate_tokens( text ), 'output':output }
+
+        results['similarity']   = float( self.encoder.encode( results['full']['output'] ) @ self.encoder.encode( results['compressed']['output'] ) )
+        results['speedup']      = results['full']['seconds']/results['compressed']['seconds'] if results['compressed']['seconds'] > 0 else None
+
+        return results
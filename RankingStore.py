@@ -0,0 +1,337 @@
+'''
+
+    Title:          Ranking Store
+
+    Description:    Compact storage of the cached BERT bullet rankings. Up to now every job got its own pretty-printed JSON file
+                    in `BERT_rebuilds`, holding a full copy of every chosen bullet (text, skill and subskill ids) and the scores
+                    as text. Over thousands of postings the directory grows large and slow to scan.
+
+                    All rankings of a directory now go to one append-only segment file (`rankings.seg`) with an index
+                    (`rankings.idx`) of where each job's record starts. A record only references the chosen bullets by their id
+                    within each experience, stores the scores as float32, and is zlib-compressed unless turned off. The bullets
+                    themselves come from the rebuilt masterlist when a record is loaded. A record whose bullets can't be found
+                    (the masterlist has changed) counts as a miss. Every record carries a CRC, so a torn write is detected
+                    and ignored.
+
+                    Appends are serialized with a file lock, so several processes can share the directory. Records that are
+                    written again (force_rebuild) leave their old copy behind; `compact` rewrites the segment without them.
+                    `compare` reports the size and load time of the old JSON caches against the same rankings in a store. The
+                    JSON caches can't be moved into the store: their names don't hold the hash of the posting that the keys
+                    now end with, so their jobs are ranked again on their next run.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import time
+import zlib
+import tempfile
+import struct
+import threading
+import numpy as np
+from Tracer import tracer
+from SafeIO import atomic_write, read_json, key_lock
+
+
+# Record header: magic, flags, key length, payload length, CRC32 of key + payload
+HEADER          = struct.Struct( "<4sBIII" )
+MAGIC           = b"RKS1"
+FLAG_ZLIB       = 1
+
+SEGMENT_FILE    = "rankings.seg"
+INDEX_FILE      = "rankings.idx"
+
+
+# DONE: Packs the ranking of a job: per experience the chosen bullet ids (or positions, if the ids aren't unique) and the scores
+def pack( ranking:list, experiences:list ):
+
+    meta    = []
+    scores  = []
+    for exp, chosen in zip( experiences, ranking ):
+        ids     = [ b['id'] for b in exp['bullets'] ]
+        by_id   = len( set( ids ) ) == len( ids )
+        if by_id:
+            refs = [ b['id'] for b in chosen['bullets'] ]
+        else:
+            # Without unique ids, the chosen bullets (the same objects) are referenced by their position instead
+            pos  = { id( b ):i for i, b in enumerate( exp['bullets'] ) }
+            refs = [ pos[id( b )] for b in chosen['bullets'] ]
+        entry   = { 'ids':refs } if by_id else { 'pos':refs }
+        if 'duplicates' in chosen:
+            entry['duplicates'] = chosen['duplicates']
+        meta.append( entry )
+        scores.extend( chosen['BERTS'] )
+
+    meta    = json.dumps( meta, separators = ( ',', ':' ) ).encode( 'utf-8' )
+    return struct.pack( "<I", len( meta ) ) + meta + np.asarray( scores, dtype = np.float32 ).tobytes()
+
+
+# DONE: Rebuilds a ranking from its packed form and the bullets it references. Returns None if a bullet can't be found.
+def unpack( payload:bytes, experiences:list ):
+
+    n       = struct.unpack_from( "<I", payload )[0]
+    meta    = json.loads( payload[4:4+n].decode( 'utf-8' ) )
+    scores  = np.frombuffer( payload, dtype = np.float32, offset = 4 + n ).tolist()
+    if len( meta ) != len( experiences ):
+        return None
+
+    ranking = []
+    offset  = 0
+    for exp, entry in zip( experiences, meta ):
+        if 'ids' in entry:
+            by_id   = { b['id']:b for b in exp['bullets'] }
+            if any( i not in by_id for i in entry['ids'] ):
+                return None
+            bullets = [ by_id[i] for i in entry['ids'] ]
+        else:
+            if any( i >= len( exp['bullets'] ) for i in entry['pos'] ):
+                return None
+            bullets = [ exp['bullets'][i] for i in entry['pos'] ]
+
+        chosen  = { 'type':exp['type'], 'title':exp['title'], 'bullets':bullets, 'BERTS':scores[offset:offset+len( bullets )] }
+        if 'duplicates' in entry:
+            chosen['duplicates'] = entry['duplicates']
+        offset  += len( bullets )
+        ranking.append( chosen )
+
+    return ranking
+
+
+class RankingStore:
+
+    # One store per directory in the process, so the index is only read once
+    _stores     = {}
+    _glock      = threading.Lock()
+
+    def __init__( self,
+                directory:str,                  # Directory of the segment and index files (e.g. BERT_rebuilds)
+                compress:bool   = True ):       # Whether new records are zlib-compressed
+
+        self.directory  = directory
+        self.compress   = compress
+        self.seg_file   = os.path.join( directory, SEGMENT_FILE )
+        self.idx_file   = os.path.join( directory, INDEX_FILE )
+        self.index      = {}                    # key -> ( offset, length ) of the latest record
+        self.idx_read   = 0                     # Bytes of the index file already read
+        self.idx_inode  = None                  # Inode of the index file read, to notice when it is replaced
+        self.lock       = threading.Lock()
+
+        os.makedirs( directory, exist_ok = True )
+
+    # DONE: Returns the shared store of a directory
+    @classmethod
+    def open( cls, directory:str, compress:bool = True ):
+
+        path = os.path.abspath( directory )
+        with cls._glock:
+            if path not in cls._stores:
+                cls._stores[path] = cls( path, compress = compress )
+            store           = cls._stores[path]
+            store.compress  = compress
+
+        return store
+
+    # DONE: Reads the index lines other processes (or this one) have appended since the last read.
+    #       A torn last line is left for the next read. A replaced index (compaction) is read again from the start.
+    def refresh( self ):
+
+        try:
+            stat        = os.stat( self.idx_file )
+            size, inode = stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            size, inode = 0, None
+        if inode != self.idx_inode or size < self.idx_read:
+            self.index, self.idx_read, self.idx_inode = {}, 0, inode
+        if size == self.idx_read:
+            return
+
+        with open( self.idx_file, 'rb' ) as file:
+            file.seek( self.idx_read )
+            data = file.read( size - self.idx_read )
+
+        end = data.rfind( b"\n" ) + 1
+        for line in data[:end].decode( 'utf-8' ).splitlines():
+            try:
+                key, offset, length = line.rsplit( "\t", 2 )
+                self.index[key] = ( int( offset ), int( length ) )
+            except ValueError:
+                continue
+        self.idx_read += end
+
+    # DONE: Whether a ranking is stored for the key
+    def __contains__( self, key:str ):
+        with self.lock:
+            self.refresh()
+            return key in self.index
+
+    # DONE: Returns the number of stored rankings
+    def __len__( self ):
+        with self.lock:
+            self.refresh()
+            return len( self.index )
+
+    # DONE: Reads the record of a key. Returns the payload, or None if it is missing or damaged.
+    def read( self, key:str ):
+
+        with self.lock:
+            self.refresh()
+            found = self.index.get( key )
+        if found is None:
+            return None
+
+        offset, length = found
+        try:
+            with open( self.seg_file, 'rb' ) as file:
+                file.seek( offset )
+                data = file.read( length )
+        except FileNotFoundError:
+            return None
+
+        if len( data ) < HEADER.size:
+            return None
+        magic, flags, klen, plen, crc = HEADER.unpack_from( data )
+        body = data[HEADER.size:]
+        if magic != MAGIC or len( body ) != klen + plen or zlib.crc32( body ) != crc or body[:klen].decode( 'utf-8' ) != key:
+            print( f"Ignoring damaged ranking record '{key}'" )
+            return None
+
+        payload = body[klen:]
+        return zlib.decompress( payload ) if flags & FLAG_ZLIB else payload
+
+    # DONE: Returns the ranking of a key, rebuilt from the given experiences. None if it is missing, damaged or out of date.
+    def get( self, key:str, experiences:list ):
+
+        with tracer.span( "RankingStore.get", "io" ) as sp:
+            payload = self.read( key )
+            ranking = unpack( payload, experiences ) if payload is not None else None
+            sp.set( 'rankings_cache', 'hit' if ranking is not None else 'miss' )
+
+        return ranking
+
+    # DONE: Appends a record to the segment and its offset to the index
+    def write( self, key:str, payload:bytes ):
+
+        flags   = 0
+        if self.compress:
+            payload = zlib.compress( payload, 6 )
+            flags   |= FLAG_ZLIB
+        kbytes  = key.encode( 'utf-8' )
+        record  = HEADER.pack( MAGIC, flags, len( kbytes ), len( payload ), zlib.crc32( kbytes + payload ) ) + kbytes + payload
+
+        # Only one process appends at a time. The index line is written after the record is on disk.
+        with key_lock( self.seg_file ):
+            with open( self.seg_file, 'ab' ) as file:
+                offset = file.seek( 0, os.SEEK_END )
+                file.write( record )
+                file.flush()
+                os.fsync( file.fileno() )
+            with open( self.idx_file, 'ab' ) as file:
+                file.write( f"{key}\t{offset}\t{len( record )}\n".encode( 'utf-8' ) )
+                file.flush()
+                os.fsync( file.fileno() )
+
+        with self.lock:
+            self.refresh()
+
+        return len( record )
+
+    # DONE: Stores the ranking of a job
+    def put( self, key:str, ranking:list, experiences:list ):
+
+        with tracer.span( "RankingStore.put", "io" ) as sp:
+            sp.set( 'bytes', self.write( key, pack( ranking, experiences ) ) )
+
+    # DONE: Returns the size in bytes of the latest record of each key
+    def sizes( self ):
+        with self.lock:
+            self.refresh()
+            return { key:length for key, ( _, length ) in self.index.items() }
+
+    # DONE: Rewrites the segment with only the latest record of each key, leaving out the keys in `drop`.
+    #       Returns the bytes reclaimed.
+    def compact( self, drop:set = None ):
+
+        with key_lock( self.seg_file ):
+            with self.lock:
+                self.refresh()
+                keys    = [ k for k in self.index.keys() if drop is None or k not in drop ]
+            before  = os.path.getsize( self.seg_file ) if os.path.exists( self.seg_file ) else 0
+
+            records = []
+            for key in keys:
+                offset, length = self.index[key]
+                with open( self.seg_file, 'rb' ) as file:
+                    file.seek( offset )
+                    records.append( ( key, file.read( length ) ) )
+
+            segment = bytearray()
+            lines   = []
+            for key, record in records:
+                lines.append( f"{key}\t{len( segment )}\t{len( record )}\n" )
+                segment += record
+
+            # The segment first, then the index. A reader between the two finds a key mismatch and misses, never wrong data.
+            atomic_write( self.seg_file, bytes( segment ) )
+            atomic_write( self.idx_file, "".join( lines ) )
+
+            with self.lock:
+                self.refresh()
+
+        return before - len( segment )
+
+
+# DONE: Compares the disk size and load time of the JSON caches of a directory with the same rankings in a store.
+#       The store is written to a temporary directory, since the old file names can't be looked up as keys.
+def compare( directory:str, compress:bool = True ):
+
+    names       = [ n for n in sorted( os.listdir( directory ) ) if n.endswith( ".json" ) ]
+    start       = time.perf_counter()
+    rankings    = [ read_json( os.path.join( directory, n ) ) for n in names ]
+    json_s      = time.perf_counter() - start
+
+    # Only the files that hold a ranking
+    kept        = [ ( n, r ) for n, r in zip( names, rankings ) if isinstance( r, list ) ]
+    if len( kept ) == 0:
+        return None
+    names       = [ n for n, _ in kept ]
+    json_bytes  = sum( os.path.getsize( os.path.join( directory, n ) ) for n in names )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store   = RankingStore( tmp, compress = compress )
+
+        # The JSON cache holds the chosen bullets themselves, so they serve as the experiences to reference
+        for n, ranking in kept:
+            store.put( n[:-5], ranking, ranking )
+
+        start       = time.perf_counter()
+        for n, ranking in kept:
+            store.get( n[:-5], ranking )
+        store_s     = time.perf_counter() - start
+        store_bytes = os.path.getsize( store.seg_file ) + os.path.getsize( store.idx_file )
+
+    return {    'rankings':         len( names ),
+                'json_bytes':       json_bytes,
+                'store_bytes':      store_bytes,
+                'size_ratio':       round( json_bytes/store_bytes, 2 ) if store_bytes > 0 else None,
+                'json_load_ms':     round( json_s*1000/len( names ), 3 ),
+                'store_load_ms':    round( store_s*1000/len( names ), 3 ) }
+
+
+if __name__ == "__main__":
+
+    save_directory  = os.path.dirname( os.path.abspath( __file__ ) )
+
+    # The directory of the cached rankings. Its old JSON files are compared with the same rankings in a store.
+    # Set compact = True to drop the stale records of its store.
+    directory       = os.path.join( save_directory, "BERT_rebuilds" )
+    compress        = True
+    compact         = False
+
+    print( compare( directory, compress = compress ) )
+    if compact:
+        print( f"Compaction reclaimed {RankingStore.open( directory ).compact()} bytes" )
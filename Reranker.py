@@ -0,0 +1,106 @@
+'''
+
+    Title:          Cross-Encoder Reranker
+
+    Description:    Second stage of the BERT scoring. The bi-encoder (BERTEncoder) scores every bullet/project against the job
+                    with a single cosine, which is fast but coarse. A cross-encoder reads the job and the bullet together, so
+                    it ranks far better, but it has to run once per (job, bullet) pair and can't use the embedding cache.
+                    So only the top-N candidates of each section from the bi-encoder are reranked, and the cost stays bounded
+                    by N no matter how large the masterlist is.
+
+                    The reranked candidates keep the bi-encoder's score values, handed out in the cross-encoder's order. The
+                    scores stay on the cosine scale, so the page budget, MMR and the saved BERTS keep working unchanged.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import threading
+import numpy as np
+from sentence_transformers import CrossEncoder
+from Tracer import tracer
+
+
+class Reranker:
+
+    # Loaded models are kept at the class level so every reranker in the process shares them
+    _models     = {}
+    _glock      = threading.Lock()
+
+    def __init__( self,
+                model:str       = "cross-encoder/ms-marco-MiniLM-L-6-v2",  # The cross-encoder model to use
+                batch_size:int  = 32 ):                                     # Batch size handed to the model
+
+        self.model_name = model
+        self.batch_size = batch_size
+
+    # DONE: Returns the loaded model, loading it the first time it is needed
+    @property
+    def model( self ):
+
+        with Reranker._glock:
+            if self.model_name not in Reranker._models:
+                print( f"Loading cross-encoder model {self.model_name}..." )
+                with tracer.span( "Reranker.load", "bert", model = self.model_name ):
+                    Reranker._models[self.model_name] = CrossEncoder( self.model_name )
+
+        return Reranker._models[self.model_name]
+
+    # DONE: Whether the model is already resident in memory
+    def is_loaded( self ):
+        return self.model_name in Reranker._models
+
+    # DONE: Loads the model ahead of time (used to warm up the service)
+    def load( self ):
+        return self.model
+
+    # DONE: Removes the model from memory
+    def unload( self ):
+        with Reranker._glock:
+            Reranker._models.pop( self.model_name, None )
+
+    # DONE: Returns the cross-encoder relevance of each text to the query
+    def score( self, query:str, texts:list ):
+
+        if len( texts ) == 0:
+            return np.zeros( 0, dtype = np.float32 )
+
+        model = self.model
+        with tracer.span( "Reranker.score", "bert", pairs = len( texts ) ):
+            scores = model.predict( [ ( query, t ) for t in texts ], batch_size = self.batch_size, show_progress_bar = False )
+
+        return np.asarray( scores, dtype = np.float32 ).ravel()
+
+    # DONE: Reranks the top-n scored texts of each group with the cross-encoder. Returns the new scores.
+    #       The candidates' score values are handed out again in the cross-encoder's order, so the scale doesn't change.
+    #       Texts outside the top-n (and texts dropped by a prefilter, -inf) keep their scores.
+    def rerank( self, query:str, texts:list, scores, n:int, groups:list = None ):
+
+        scores  = np.array( scores, dtype = np.float32 )
+        if n <= 0 or len( texts ) == 0:
+            return scores
+
+        # The top-n candidates of every group, all scored in a single batch
+        chosen  = []
+        for start, end in ( groups if groups is not None else [ ( 0, len( texts ) ) ] ):
+            finite  = [ i for i in range( start, end ) if np.isfinite( scores[i] ) ]
+            finite.sort( key = lambda i: -scores[i] )
+            chosen.append( finite[:n] )
+
+        flat    = [ i for cand in chosen for i in cand ]
+        tracer.current().set( 'rerank_pairs', len( flat ) )
+        if len( flat ) == 0:
+            return scores
+
+        ce      = dict( zip( flat, self.score( query, [ texts[i] for i in flat ] ).tolist() ) )
+
+        for cand in chosen:
+            values  = [ scores[i] for i in cand ]
+            order   = sorted( cand, key = lambda i: -ce[i] )
+            for i, v in zip( order, values ):
+                scores[i] = v
+
+        return scores
@@ -0,0 +1,169 @@
+'''
+
+    Title:          Resource Scheduler
+
+    Description:    Keeps the BERT embedder and the Ollama models from competing for the same RAM. `get_max_model_size` only
+                    checks which model fits in the machine's total RAM. During a run, though, the SentenceTransformer, the
+                    rewrite/summary model and possibly a cover letter model can all be resident at once, and on smaller
+                    machines that ends in swapping.
+
+                    Before each stage the scheduler reads the live available RAM (psutil) and the models Ollama has loaded
+                    (/api/ps), and estimates the footprint of what the stage needs. It then decides, in order of preference:
+                    run as planned, unload the embedder before a large LLM call, move the summary/cover letter to a smaller
+                    model, or unload idle Ollama models before BERT scoring. Every decision is logged with the readings it
+                    was based on (JSON lines), so the budget can be tuned. Only system RAM is scheduled, not GPU VRAM.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import json
+import time
+import threading
+import psutil
+from typing import Optional
+from ollama import Client
+from Tracer import tracer
+
+
+# Approximate RAM of each DeepSeek R1 model (GB). Taken from:
+# https://dev.to/askyt/deepseek-r1-671b-complete-hardware-requirements-optimal-deployment-setup-2e48
+MODEL_RAM_GB    = { '671':1342, '70':32.7, '32':14.9, '14':6.5, '8':3.7, '7':3.3, '1.5':0.7 }
+
+# Estimated RAM of an embedding model that isn't loaded yet (GB). A loaded model is measured instead.
+EMBEDDER_RAM_GB = 0.5
+
+GB              = 1024**3
+
+
+class ResourceScheduler:
+
+    def __init__( self,
+                budget_gb:Optional[float]   = None,     # RAM our process and the Ollama models may use together. None = 85% of the total RAM
+                reserve_gb:float            = 2.,       # RAM always left free for the OS and other programs
+                encoder                     = None,     # BERTEncoder that may be unloaded to make room
+                ollama_host:Optional[str]   = None,     # Ollama server. None = OLLAMA_HOST or the local default
+                log_file:Optional[str]      = None ):   # JSON lines file the decisions are appended to. None = only printed
+
+        self.budget_gb  = budget_gb if budget_gb is not None else 0.85*psutil.virtual_memory().total/GB
+        self.reserve_gb = reserve_gb
+        self.encoder    = encoder
+        self.client     = Client( host = ollama_host )
+        self.log_file   = log_file
+        self.decisions  = []
+        self.lock       = threading.Lock()
+
+    # DONE: Returns the loaded Ollama models and their RAM (GB). Falls back to the table when Ollama doesn't report a size.
+    def ollama_loaded( self ):
+
+        try:
+            models = self.client.ps().models
+        except Exception:
+            return {}
+
+        loaded = {}
+        for m in models:
+            size = ( getattr( m, 'size', 0 ) or 0 )/GB
+            if size <= 0:
+                size = MODEL_RAM_GB.get( m.model.split( ':' )[-1].rstrip( 'b' ), 0. )
+            loaded[m.model] = size
+
+        return loaded
+
+    # DONE: RAM held by the embedder (GB). Measured from the model parameters when it is loaded.
+    def embedder_gb( self ):
+
+        if self.encoder is None:
+            return 0.
+        if not self.encoder.is_loaded():
+            return EMBEDDER_RAM_GB
+
+        try:
+            return sum( p.numel()*p.element_size() for p in self.encoder.model.parameters() )/GB
+        except Exception:
+            return EMBEDDER_RAM_GB
+
+    # DONE: Live readings: available RAM, the RAM of this process and of the loaded Ollama models, and the headroom (GB)
+    def readings( self ):
+
+        available   = psutil.virtual_memory().available/GB
+        process     = psutil.Process().memory_info().rss/GB
+        loaded      = self.ollama_loaded()
+
+        # Headroom is limited by both the free RAM and what is left of the budget
+        headroom    = min( available - self.reserve_gb, self.budget_gb - process - sum( loaded.values() ) )
+
+        return { 'available_gb':round( available, 2 ), 'process_gb':round( process, 2 ), 'ollama_gb':round( sum( loaded.values() ), 2 ),
+                 'headroom_gb':round( headroom, 2 ), 'loaded':loaded }
+
+    # DONE: Records a decision, prints it and appends it to the log file
+    def log( self, stage:str, action:str, need_gb:float, reads:dict, detail:str = "" ):
+
+        entry = { 'time':time.time(), 'stage':stage, 'action':action, 'need_gb':round( need_gb, 2 ), 'budget_gb':round( self.budget_gb, 2 ),
+                  **{ k:v for k, v in reads.items() if k != 'loaded' }, 'loaded':list( reads['loaded'].keys() ), 'detail':detail }
+
+        with self.lock:
+            self.decisions.append( entry )
+            if self.log_file is not None:
+                with open( self.log_file, "a" ) as file:
+                    file.write( json.dumps( entry ) + "\n" )
+
+        tracer.current().set( 'scheduler', action )
+        print( f"Scheduler [{stage}]: {action} (needs {need_gb:.1f} GB, headroom {reads['headroom_gb']:.1f} GB){' - ' + detail if detail else ''}" )
+
+    # DONE: Chooses the model size of an LLM stage. Unloads the embedder, or moves to a smaller model, if the model doesn't fit.
+    #       `allow_smaller` is False for stages whose output is tied to the model size (the bullet rewrites).
+    def plan_llm( self, stage:str, modelSize:str, allow_smaller:bool = True ):
+
+        reads   = self.readings()
+        name    = f"deepseek-r1:{modelSize}b"
+
+        # A model that is already loaded needs no new RAM
+        need    = 0. if name in reads['loaded'] else MODEL_RAM_GB.get( modelSize, 0. )
+        if need <= reads['headroom_gb']:
+            self.log( stage, "run", need, reads, name )
+            return modelSize
+
+        # Unloading the embedder frees enough. It is loaded again the next time it is needed.
+        freed   = self.embedder_gb() if self.encoder is not None and self.encoder.is_loaded() else 0.
+        if freed > 0 and need <= reads['headroom_gb'] + freed:
+            self.encoder.unload()
+            self.log( stage, "unload_embedder", need, reads, f"{name} after freeing {freed:.2f} GB" )
+            return modelSize
+
+        # Move to the largest smaller model that fits
+        if allow_smaller:
+            smaller = sorted( ( s for s, gb in MODEL_RAM_GB.items() if gb < MODEL_RAM_GB.get( modelSize, 0. ) ), key = lambda s: -MODEL_RAM_GB[s] )
+            for s in smaller:
+                s_need = 0. if f"deepseek-r1:{s}b" in reads['loaded'] else MODEL_RAM_GB[s]
+                if s_need <= reads['headroom_gb'] + freed:
+                    if s_need > reads['headroom_gb']:
+                        self.encoder.unload()
+                    self.log( stage, "smaller_model", need, reads, f"deepseek-r1:{s}b instead of {name}" )
+                    return s
+
+        self.log( stage, "run_over_budget", need, reads, f"nothing smaller fits, running {name}" )
+        return modelSize
+
+    # DONE: Makes room for the embedder before BERT scoring by unloading the Ollama models, if it doesn't fit
+    def plan_bert( self, stage:str = "bert" ):
+
+        if self.encoder is None or self.encoder.is_loaded():
+            return
+
+        reads   = self.readings()
+        need    = self.embedder_gb()
+        if need <= reads['headroom_gb']:
+            self.log( stage, "run", need, reads )
+            return
+
+        # An empty request with keep_alive = 0 makes Ollama unload the model
+        for model in reads['loaded']:
+            try:
+                self.client.generate( model = model, prompt = '', keep_alive = 0 )
+            except Exception as e:
+                print( f"Could not unload {model}: {e}" )
+        self.log( stage, "unload_ollama", need, reads, ", ".join( reads['loaded'].keys() ) )
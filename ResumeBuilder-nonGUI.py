@@ -13,15 +13,30 @@
 
 
 import os
-import json
 import errno
+import time
 import pdfkit
 #from txt2pdf.core import txt2pdf
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlsplit
 from SkillsBERT import BERTSkills
 from BulletBERT import BERTBullets
 from ProjectsBERT import BERTProjects
-from BulletRebuilder import BulletRebuilder
+from BERTEncoder import BERTEncoder
+from BulletRebuilder import BulletRebuilder, replace_job, save_cover_letter
+from ResourceScheduler import ResourceScheduler
+from Masterlist import Masterlist
+from MasterlistStore import MasterlistStore, job_key
+from KeywordMatcher import KeywordMatcher
+from Reranker import Reranker
+from JobPosting import JobPosting
+from PromptCompressor import PromptCompressor
+from SemanticCache import SemanticCache
+from Tracer import tracer, traced
+from SafeIO import atomic_write, atomic_write_json
+from CacheManager import CacheManager
+from EmbeddingPrecompute import EmbeddingPrecompute, EMBEDDINGS_FILE
+from PostingDedup import PostingDedup, build_scope, DEDUP_FILE
 
 
 class ResumeBuilder:
@@ -41,7 +56,42 @@ class ResumeBuilder:
                 resume_css:str      = os.path.join( os.path.dirname(os.path.abspath(__file__)), 'css', 'resume.css'),
                 save_dir:str        = os.path.dirname(os.path.abspath(__file__)),
                 force_rebuilds      = False,
-                include_summary     = True ):
+                include_summary     = True,
+                encoder             = None,
+                keep_alive          = None,
+                trace:bool          = False,
+                ollama_host         = None,
+                store               = None,
+                candidate:str       = "",
+                lexical_weight:float= 0.,
+                prefilter_m:int     = 0,
+                keyword_boost:float = 0.,
+                keyword_report:bool = False,
+                skill_weight:float  = 0.,
+                bullet_budget:int   = 0,
+                budget_unit:str     = "lines",
+                bullets_min:int     = 1,
+                mmr_lambda:float    = 1.,
+                dup_threshold:float = 0.9,
+                rerank_n:int        = 0,
+                rerank_model:str    = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                strip_boilerplate:bool = False,
+                compress_prompt:bool= False,
+                prompt_budget:int   = 256,
+                prompt_eval:bool    = False,
+                semantic_cache:bool = False,
+                cache_threshold:float = 0.95,
+                touchup_model       = None,
+                schedule_memory:bool= False,
+                memory_budget_gb    = None,
+                concurrent_stages:bool = True,
+                compress_rankings:bool = True,
+                cache_gc:bool       = False,
+                cache_budgets:dict  = None,
+                precompute_embeddings:bool = False,
+                precompute_wait:float = 300.,
+                dedup_postings:bool = False,
+                dedup_threshold:float = 0.8 ):
         
         # Set self variables
         self.masterlist     = masterlist
@@ -60,6 +110,71 @@ class ResumeBuilder:
         self.save_dir       = save_dir
         self.include_sum    = include_summary
         self.CL_html_file   = None
+        self.CL_pdf_file    = None
+        self.cover_letter_text  = None
+        self.keep_alive     = keep_alive                                        # How long Ollama keeps the models loaded between calls
+        self.trace          = trace                                             # Whether to record and export per-stage timings
+        self.run_span       = None                                              # Root span of the latest run. Its spans are dropped from the tracer when it ends
+        self.ollama_host    = ollama_host                                       # Ollama server to use. None = OLLAMA_HOST or the local default
+        self.store          = store                                             # Optional MasterlistStore holding the masterlist, rewrites, embeddings and rankings
+        self.candidate      = candidate                                         # Name of the candidate in the store
+        self.lexical_weight = lexical_weight                                    # Weight of the BM25 keyword score in the BERT rankings. 0 = BERT only
+        self.prefilter_m    = prefilter_m                                       # If > 0, only the top-M keyword matches are sent to the BERT model
+        self.keyword_boost  = keyword_boost                                     # Score boost for skills the posting names outright. 0 = off
+        self.keyword_report = keyword_report                                    # Whether to save a report of posting keywords missing from the chosen bullets
+        self.skill_weight   = skill_weight                                      # Weight of the skill graph boost on bullets and projects. 0 = off
+        self.bullet_budget  = bullet_budget                                     # If > 0, bullets are chosen across all experiences under this budget
+        self.budget_unit    = budget_unit                                       # Unit of the bullet budget: 'lines' or 'chars'
+        self.bullets_min    = bullets_min                                       # With a budget: minimum bullets per experience (bullets_per is the maximum)
+        self.mmr_lambda     = mmr_lambda                                        # MMR relevance vs. diversity trade-off for bullets, skills and projects. 1 = off
+        self.dup_threshold  = dup_threshold                                     # Similarity above which two items are near-duplicates
+        self.rerank_n       = rerank_n                                          # If > 0, the top-N bullets (per experience) and projects are reranked with a cross-encoder
+        self.reranker       = Reranker( model = rerank_model ) if rerank_n > 0 else None
+        self.strip_boilerplate  = strip_boilerplate                             # Whether to strip EEO/legal/benefits text from the posting before BERT and the prompts
+        self.keyword_coverage   = None
+        self.keywords_filename  = None
+        self.job_text           = job_desc                                      # The posting as used by BERT and the prompts (the requirements view, if stripped)
+        self.posting            = None
+        self.posting_filename   = None
+        self.compress_prompt    = compress_prompt                               # Whether to compress the posting quoted in the LLM prompts. False = full text
+        self.prompt_budget      = prompt_budget                                 # Token budget of the compressed posting
+        self.prompt_eval        = prompt_eval                                   # Whether to also generate the summary from the full posting and compare the two
+        self.prompt_text        = job_desc                                      # The posting as quoted in the LLM prompts
+        self.prompt_evaluation  = None
+        self.prompt_eval_filename = None
+        self.touchup_model      = touchup_model                                 # Small model that adapts a reused summary/cover letter to the job. None = text replacement
+        self.concurrent_stages  = concurrent_stages                             # Whether the summary, cover letter and BERT scorers run at the same time
+        self.critical_path      = None
+        self.compress_rankings  = compress_rankings                             # Whether the cached bullet rankings are zlib-compressed
+        self.bullets_key        = None                                          # Key of this job's ranking in the RankingStore
+        self.cache_gc           = cache_gc                                      # Whether to evict old cache files over the budgets after each build
+        self.cache_manager      = CacheManager( save_dir, budgets = cache_budgets )
+
+        # Where the embeddings are kept between runs: the store, or with the precompute and no store, save_dir/embeddings.db
+        self.embedding_store    = store if store is not None or not precompute_embeddings else MasterlistStore( os.path.join( save_dir, EMBEDDINGS_FILE ) )
+
+        # Shared encoder for all of the BERT processors. Pass one in to keep the model resident between jobs.
+        # Encoders share the loaded model and the cache, so one without a store is only rewrapped to read the precomputed embeddings.
+        self.encoder        = encoder if encoder is not None else BERTEncoder( store = self.embedding_store )
+        if precompute_embeddings and self.encoder.store is None:
+            self.encoder    = BERTEncoder( BERTModel = self.encoder.BERTModel, cache_size = self.encoder.cache_size,
+                                           batch_size = self.encoder.batch_size, store = self.embedding_store )
+
+        # Precompute of the store started by a rebuild in another process (e.g. a nightly BulletRebuilder run). A masterlist
+        # rebuilt here is scored right away, so its texts are encoded here and stored, with no precompute of its own.
+        self.precompute     = EmbeddingPrecompute( self.encoder.store.db_file, self.encoder.BERTModel ) if precompute_embeddings else None
+        self.precompute_wait= precompute_wait                                   # Max seconds the scorers wait for a running precompute. None = no limit
+
+        # Optional cache of the generated summaries and cover letters, shared by every job saved in save_dir
+        self.semantic_cache = SemanticCache( self.encoder, os.path.join( save_dir, "semantic_cache.db" ), threshold = cache_threshold ) if semantic_cache else None
+
+        # Optional reuse of the builds of near-duplicate postings, shared by every job saved in save_dir
+        self.dedup          = PostingDedup( os.path.join( save_dir, DEDUP_FILE ), threshold = dedup_threshold ) if dedup_postings else None
+        self.duplicate_of   = None                                              # The near-duplicate posting this job reused the build of
+
+        # Optional RAM scheduling of the embedder and the Ollama models. Decisions are appended to save_dir/scheduler_log.jsonl
+        self.scheduler      = ResourceScheduler( budget_gb = memory_budget_gb, encoder = self.encoder, ollama_host = ollama_host,
+                                                 log_file = os.path.join( save_dir, "scheduler_log.jsonl" ) ) if schedule_memory else None
 
         # Bare variables for use later
         self.remastered_json    = ""
@@ -69,6 +184,7 @@ class ResumeBuilder:
         self.BB_save_dir        = os.path.join( self.save_dir, "BERT_rebuilds" )
         self.resume_save_dir    = os.path.join( self.save_dir, "resumes" )
         self.cl_save_dir        = os.path.join( self.save_dir, "cover_letters" )
+        self.trace_save_dir     = os.path.join( self.save_dir, "traces" )
 
         # Check that the new save directories exist. If not, build them
         if not os.path.exists( self.BR_save_dir ):
@@ -79,9 +195,13 @@ class ResumeBuilder:
             os.mkdir( self.resume_save_dir )
         if not os.path.exists( self.cl_save_dir ):
             os.mkdir( self.cl_save_dir )
+        if self.trace and not os.path.exists( self.trace_save_dir ):
+            os.mkdir( self.trace_save_dir )
 
         # Look for the masterlist. If it doesn't exist, raise an exception and quit the software
-        if not os.path.isfile( self.masterlist ):
+        if self.store is not None:
+            self.store.candidate_id( self.candidate )
+        elif not os.path.isfile( self.masterlist ):
             raise FileNotFoundError( errno.ENOENT, os.strerror(errno.ENOENT), self.masterlist )
         
         # We can just continue, as the bulletRebuilder will open it.
@@ -89,49 +209,312 @@ class ResumeBuilder:
     # DONE: Processes all necessary models for the resume rebuild for the job application 
     def process( self ):
 
+        # Turn on the stage tracing for this run, if chosen. The tracer is shared with any other run of the process.
+        if self.trace:
+            tracer.begin_run()
+        try:
+            self.processRun()
+        finally:
+            # Only the spans of this run are dropped. Those of other runs may still be open.
+            tracer.discard( self.run_span )
+            if self.trace:
+                tracer.end_run()
+
+    # DONE: The run of `process`, in its root span. Only the spans of this run are exported.
+    def processRun( self ):
+
+        with tracer.span( "ResumeBuilder.process", "pipeline", job_title = self.job_title, job_company = self.job_company ) as run:
+            self.run_span   = run
+
+            # Strip the boilerplate from the posting before it is embedded or quoted in a prompt
+            if self.strip_boilerplate:
+                self.posting    = JobPosting( self.job_desc, encoder = self.encoder )
+                self.job_text   = self.posting.requirements
+                print( f"Posting boilerplate stripped: {self.posting.report['original_tokens']} -> {self.posting.report['requirements_tokens']} tokens "
+                       f"({self.posting.report['saved_pct']}% saved)" )
+
+            # Near-duplicates of a posting that was built before reuse its build. Everything else runs the whole pipeline.
+            if not self.reuseDuplicate():
+                start   = time.perf_counter()
+                self.build()
+                if self.dedup is not None:
+                    self.dedup.add( self.dedupScope(), self.job_text, self.job_title, self.job_company, self.buildRecord(), time.perf_counter() - start )
+
+            # Record what this build used, then keep the cache directories within their budgets
+            self.manageCache()
+
+        if self.semantic_cache is not None:
+            st = self.semantic_cache.stats()
+            print( f"Semantic cache: {st['hits']}/{st['lookups']} hits ({st['hit_rate']*100:.1f}%), {st['seconds_saved']:.1f} s of generation saved" )
+
+        if self.dedup is not None:
+            st = self.dedup.stats()
+            print( f"Posting dedup: {st['duplicates']}/{st['lookups']} postings were near-duplicates ({st['dedup_rate']*100:.1f}%), {st['seconds_saved']:.1f} s of builds saved" )
+
+        # Export the trace of this run
+        if self.trace:
+            self.save_trace( run )
+
+    # DONE: Runs the whole pipeline: rebuilds the masterlist, generates the summary and cover letter, scores the bullets,
+    #       skills and projects, and saves the documents
+    def build( self ):
+
         print( "###### STARTING Bullet Rebuilder" )
 
         # Start the bullet rebuilder
         BR  = BulletRebuilder(  master_file     = self.masterlist,
                                 force_rebuild   = self.force_rebuilds, 
                                 modelSize       = self.bl_model,
-                                save_directory  = self.BR_save_dir )
-        
+                                save_directory  = self.BR_save_dir,
+                                keep_alive      = self.keep_alive,
+                                ollama_host     = self.ollama_host,
+                                store           = self.store,
+                                candidate       = self.candidate,
+                                semantic_cache  = self.semantic_cache,
+                                cache_options   = { 'strip_boilerplate':self.strip_boilerplate, 'compress_prompt':self.compress_prompt,
+                                                    'prompt_budget':self.prompt_budget if self.compress_prompt else None },
+                                touchup_model   = self.touchup_model,
+                                scheduler       = self.scheduler )
+    
         print( "###### PROCESSING Bullets with Bullet Rebuilder" )
         # Process the bullet points to build the remodeled masterlist.
         # If this has already been run, it will return the previously saved modeled data to reduce computation.
         BR.process()
 
-        # Also build and save a new summary
-        if self.include_sum:
-            self.summary    = BR.buildSummary( job_title = self.job_title, job_company = self.job_company, job_description = self.job_desc )
-            print( f"{self.summary=}" )
+        # The posting quoted in the LLM prompts. Compressed to the token budget, or the full text.
+        self.prompt_text    = self.job_text
+        compressor          = None
+        if self.compress_prompt:
+            compressor          = PromptCompressor( self.encoder, KeywordMatcher.for_skills( BR.master_list['skills'], BR.master_list['subskills'] ),
+                                                    budget = self.prompt_budget )
+            self.prompt_text    = compressor.compress( self.job_text )
+            print( f"Prompt posting compressed: {compressor.report['original_tokens']} -> {compressor.report['compressed_tokens']} tokens" )
 
         # New file will be saved at BR.master_modeled. This will be used for the BERT model
         self.remastered_json    = BR.master_modeled
         self.remastered_list    = BR.master_list
 
         print( "###### Bullet Rebuilder COMPLETE!" )
-        
-        
-        # Parse the accomplishments for BERT modeling. This NEEDS to be done by explicitly opening the parsing the new JSON file.
-        # This is done to help avoid rewriting a lot of the older code, keeping processes segregated
+    
+    
+        # Parse the accomplishments for BERT modeling. The rebuilt masterlist is shared by reference, not re-read from disk.
         self.parseNewMasterlistForBERT()
 
+        # Make room for the embedder, if the LLM stages left too little
+        if self.scheduler is not None:
+            self.scheduler.plan_bert()
+
+        # The summary, the cover letter and the three BERT scorers only depend on the rebuilt masterlist, not on each other.
+        # They run at the same time, and the resume is rendered once all of them are done.
+        # The LLM stages are submitted first, since they are usually the longest.
+        stages  = {}
+        if self.include_sum:
+            stages['summary']       = lambda: self.runSummary( BR, compressor )
+        if self.cover_letter:
+            stages['cover_letter']  = lambda: self.runCoverLetter( BR )
+        stages.update( { 'bullets':self.runBullets, 'skills':self.runSkills, 'projects':self.runProjects } )
+        self.runStages( stages )
+
+        # Keep the rankings of this job with the candidate
+        if self.store is not None:
+            self.save_rankings()
+
+        # Save the reults automatically
+        self.savedocs()
+
+    # DONE: Key of what a build depends on besides the posting: the masterlist and the options that change the documents
+    def dedupScope( self ):
+
+        mList   = self.store.load( self.candidate ) if self.store is not None else Masterlist.load( self.masterlist )
+        options = { 'bullets_per':self.bullets_per, 'skills_per':self.skills_per, 'projects_per':self.projects_per, 'bl_model':self.bl_model,
+                    'cover_letter':self.cover_letter, 'cl_model':self.cl_model if self.cover_letter else None,
+                    'include_summary':self.include_sum, 'BERTModel':self.encoder.BERTModel, 'lexical_weight':self.lexical_weight,
+                    'prefilter_m':self.prefilter_m, 'keyword_boost':self.keyword_boost, 'skill_weight':self.skill_weight,
+                    'bullet_budget':self.bullet_budget, 'budget_unit':self.budget_unit, 'bullets_min':self.bullets_min,
+                    'mmr_lambda':self.mmr_lambda, 'dup_threshold':self.dup_threshold, 'rerank_n':self.rerank_n,
+                    'rerank_model':self.reranker.model_name if self.reranker is not None else None,
+                    'strip_boilerplate':self.strip_boilerplate, 'compress_prompt':self.compress_prompt, 'prompt_budget':self.prompt_budget }
+
+        return build_scope( mList, options )
+
+    # DONE: Returns what a near-duplicate posting needs to render its documents from this build
+    def buildRecord( self ):
+
+        return {    'masterlist':   self.remastered_list.to_dict(),
+                    'summary':      getattr( self, 'summary', "" ),
+                    'bullets':      self.resume_bullets,
+                    'skills':       self.resume_skills,
+                    'projects':     self.chosen_projects,
+                    'cover_letter': self.cover_letter_text }
+
+    # DONE: Renders the documents of this job from the build of a near-duplicate posting, if one was built before. Its bullets,
+    #       skills, projects, summary and cover letter are reused, with this job's title and company put in. Returns False if
+    #       there is none (or force_rebuilds is on).
+    def reuseDuplicate( self ):
+
+        if self.dedup is None or self.force_rebuilds:
+            return False
+
+        match   = self.dedup.find( self.dedupScope(), self.job_text, self.job_title, self.job_company )
+        if match is None:
+            return False
+
+        start   = time.perf_counter()
+        with tracer.span( "ResumeBuilder.reuseDuplicate", "render" ):
+
+            build   = match['build']
+            old     = ( match['job_title'], match['job_company'] )
+            print( f"###### Near-duplicate of '{old[0]}' at '{old[1]}' (estimated Jaccard {match['similarity']:.3f}). Reusing its build." )
+
+            self.remastered_list    = Masterlist.from_dict( build['masterlist'] )
+            self.resume_bullets     = build['bullets']
+            self.resume_skills      = build['skills']
+            self.chosen_projects    = build['projects']
+            self.summary            = replace_job( build['summary'], *old, self.job_title, self.job_company )
+
+            if self.keyword_report:
+                self.buildKeywordCoverage()
+
+            self.savedocs()
+
+            # Only the cover letter's header and the mentions of the title and company change
+            if self.cover_letter and build['cover_letter'] is not None:
+                self.cover_letter_text  = replace_job( build['cover_letter'], *old, self.job_title, self.job_company )
+                _, self.CL_html_file    = save_cover_letter( self.cover_letter_text, self.remastered_list['about']['name'], self.job_title, self.job_company, self.cl_save_dir )
+                self.CL_pdf_file        = self.CL_html_file[:-5] + ".pdf"
+                self.html_to_pdf( html_file_name = self.CL_html_file, pdf_file_name = self.CL_pdf_file )
+
+        saved   = max( match['seconds'] - ( time.perf_counter() - start ), 0. )
+        self.dedup.reused( match['id'], saved )
+        self.duplicate_of   = { 'job_title':old[0], 'job_company':old[1], 'similarity':round( match['similarity'], 3 ), 'seconds_saved':round( saved, 2 ) }
+        tracer.current().set( 'posting_dedup', 'duplicate' )
+
+        print( f"###### Build reused: {saved:.1f} s saved" )
+
+        return True
+
+    # DONE: Runs the independent stages of `process`, at the same time unless concurrent_stages is off, and reports the
+    #       critical path. With the memory scheduler, they run one after another, since overlapping would keep the
+    #       embedder and the LLM loaded together.
+    def runStages( self, stages:dict ):
+
+        concurrent  = self.concurrent_stages and self.scheduler is None
+        origin      = time.perf_counter()
+        timings     = {}
+
+        def timed( name, func ):
+            start = time.perf_counter()
+            with tracer.span( f"ResumeBuilder.{name}", "pipeline" ):
+                func()
+            timings[name] = { 'start_s':start - origin, 'end_s':time.perf_counter() - origin }
+
+        # The stages of the pool join the span of this run, so they are traced with it
+        def attached( parent, name, func ):
+            with tracer.attach( parent ):
+                timed( name, func )
+
+        if concurrent:
+            parent = tracer.current()
+            with ThreadPoolExecutor( max_workers = len( stages ), thread_name_prefix = "stage" ) as pool:
+                futures = [ pool.submit( attached, parent, name, func ) for name, func in stages.items() ]
+            # Raise the first failure only once every stage has finished
+            for f in futures:
+                f.result()
+        else:
+            for name, func in stages.items():
+                timed( name, func )
+
+        wall        = time.perf_counter() - origin
+        seconds     = { name:t['end_s'] - t['start_s'] for name, t in timings.items() }
+        # Time from the first start to the last end of each branch, and the longest stage
+        branch      = lambda names: max( [ timings[n]['end_s'] for n in names if n in timings ], default = 0. ) - \
+                                    min( [ timings[n]['start_s'] for n in names if n in timings ], default = 0. )
+        sequential  = sum( seconds.values() )
+
+        self.critical_path  = { 'concurrent':   concurrent,
+                                'stages':       { n:round( v, 3 ) for n, v in seconds.items() },
+                                'llm_s':        round( branch( [ 'summary', 'cover_letter' ] ), 3 ),
+                                'bert_s':       round( branch( [ 'bullets', 'skills', 'projects' ] ), 3 ),
+                                'wall_s':       round( wall, 3 ),
+                                'sequential_s': round( sequential, 3 ),
+                                'saved_s':      round( max( sequential - wall, 0. ), 3 ),
+                                'critical':     max( seconds, key = seconds.get ) if len( seconds ) > 0 else None }
+        tracer.current().set( 'critical_stage', self.critical_path['critical'] )
+
+        print( f"Stages: {wall:.2f} s wall vs. {sequential:.2f} s one after another (LLM {self.critical_path['llm_s']:.2f} s, "
+               f"BERT {self.critical_path['bert_s']:.2f} s). Critical path: {self.critical_path['critical']}" )
+
+        return self.critical_path
+
+    # DONE: Generates the summary, from the compressed posting if chosen
+    def runSummary( self, BR, compressor = None ):
+
+        if self.compress_prompt and self.prompt_eval:
+            # Generate the summary from both postings, and keep the compressed one. The semantic cache is skipped.
+            self.prompt_evaluation  = compressor.evaluate( lambda text: BR.generateSummary( job_title = self.job_title, job_company = self.job_company, job_description = text ),
+                                                           self.job_text, self.prompt_text )
+            self.summary            = self.prompt_evaluation['compressed']['output']
+            print( f"Prompt compression: {self.prompt_evaluation['full']['seconds']:.2f} s full vs. {self.prompt_evaluation['compressed']['seconds']:.2f} s compressed, "
+                   f"summary similarity {self.prompt_evaluation['similarity']:.3f}" )
+        else:
+            self.summary    = BR.buildSummary( job_title = self.job_title, job_company = self.job_company, job_description = self.prompt_text )
+        print( f"{self.summary=}" )
+
+    # DONE: Generates the cover letter and saves it as html and pdf
+    def runCoverLetter( self, BR ):
+
+        print( "###### Generating Cover Letter" )
+        _, self.CL_html_file  = BR.buildCoverLetter(job_title = self.job_title, job_company = self.job_company, job_description = self.prompt_text, save_dir = self.cl_save_dir)
+        self.cover_letter_text  = BR.cover_letter
+
+        # Save the html file to pdf
+        self.CL_pdf_file    = self.CL_html_file[:-5] + ".pdf"
+        self.html_to_pdf( html_file_name = self.CL_html_file, pdf_file_name = self.CL_pdf_file )
+        print( "###### Cover Letter Generated!" )
+
+    # DONE: Scores the bullets of each experience with BERT
+    def runBullets( self ):
+
+        self.waitForEmbeddings()
+
         print( "###### STARTING Bullet BERT Processor" )
         # Now, let's send the parsed_bullets to the BERT model and render to get the new bullet points for our resume
         BB = BERTBullets( jobTitle      = self.job_title, 
                          jobCompany     = self.job_company, 
-                         jobDesc        = self.job_desc, 
+                         jobDesc        = self.job_text, 
                          bulletPoints   = self.parsed_bullets,
                          minPoints      = self.bullets_per, 
                          save_location  = self.BB_save_dir,
-                         force_rebuild  = self.force_rebuilds )
-        
+                         force_rebuild  = self.force_rebuilds,
+                         encoder        = self.encoder,
+                         lexical_weight = self.lexical_weight,
+                         prefilter_m    = self.prefilter_m,
+                         skills         = self.remastered_list['skills'],
+                         subskills      = self.remastered_list['subskills'],
+                         skill_weight   = self.skill_weight,
+                         budget         = self.bullet_budget,
+                         budget_unit    = self.budget_unit,
+                         min_per        = self.bullets_min,
+                         mmr_lambda     = self.mmr_lambda,
+                         dup_threshold  = self.dup_threshold,
+                         rerank_n       = self.rerank_n,
+                         reranker       = self.reranker,
+                         compress_results = self.compress_rankings )
+    
         print( "###### PROCESSING Bullets with Bullet BERT Processor" )
         self.resume_bullets     = BB.render()
+        self.bullets_key        = BB.results_key
         print( "###### Bullet BERT Processor COMPLETE!" )
 
+        # Check which of the posting's skill keywords the chosen bullets cover
+        if self.keyword_report:
+            self.buildKeywordCoverage()
+
+    # DONE: Scores the skills with BERT
+    def runSkills( self ):
+
+        self.waitForEmbeddings()
+
         skills      = self.remastered_list['skills']
         subskills   = self.remastered_list['subskills']
 
@@ -139,59 +522,125 @@ class ResumeBuilder:
         BS  = BERTSkills(   skills              = skills, 
                             subskills           = subskills,
                             job_title           = self.job_title, 
-                            job_description     = self.job_desc,
-                            count               = self.skills_per )
+                            job_description     = self.job_text,
+                            count               = self.skills_per,
+                            encoder             = self.encoder,
+                            lexical_weight      = self.lexical_weight,
+                            prefilter_m         = self.prefilter_m,
+                            keyword_boost       = self.keyword_boost,
+                            mmr_lambda          = self.mmr_lambda,
+                            dup_threshold       = self.dup_threshold )
 
         print( "###### PROCESSING Top Skills BERT Processor" )
         self.resume_skills      = BS.render()
         print( "###### Top Skills BERT Processor COMPLETE!" )
 
+    # DONE: Scores the projects with BERT
+    def runProjects( self ):
+
+        self.waitForEmbeddings()
 
         print( "###### STARTING Projects BERT Processor" )
         ### Choose the projects
         projects    = self.remastered_list['projects']
-        BP  = BERTProjects( job_description = self.job_desc, 
+        BP  = BERTProjects( job_description = self.job_text, 
                             projects        = projects, 
-                            count           = self.projects_per )
+                            count           = self.projects_per,
+                            encoder         = self.encoder,
+                            lexical_weight  = self.lexical_weight,
+                            prefilter_m     = self.prefilter_m,
+                            skills          = self.remastered_list['skills'],
+                            subskills       = self.remastered_list['subskills'],
+                            skill_weight    = self.skill_weight,
+                            mmr_lambda      = self.mmr_lambda,
+                            dup_threshold   = self.dup_threshold,
+                            rerank_n        = self.rerank_n,
+                            reranker        = self.reranker )
         print( "###### PROCESSING Projects BERT Processor" )
         # List of dictionary {"title": "", "link": "", "description": ""}
         self.chosen_projects = BP.render()
         print( "###### Projects BERT Processor COMPLETE!" )
 
-        # FINALLY, create a cover letter
-        if self.cover_letter:
-            print( "###### Generating Cover Letter" )
-            _, CL_html_file  = BR.buildCoverLetter(job_title = self.job_title, job_company = self.job_company, job_description = self.job_desc, save_dir = self.cl_save_dir)
+    # DONE: Waits (at most precompute_wait seconds) for a running precompute of the store, so the scorers read its embeddings
+    #       instead of encoding them again
+    def waitForEmbeddings( self ):
 
-            # Save the html file to pdf
-            CL_pdf_file     = CL_html_file[:-5] + ".pdf"
-            self.html_to_pdf( html_file_name = CL_html_file, pdf_file_name = CL_pdf_file )
-            print( "###### Cover Letter Generated!" )
+        if self.precompute is not None and not self.precompute.wait( self.precompute_wait ):
+            print( "Embedding precompute did not finish. Encoding the missing texts here." )
 
-        # Save the reults automatically
-        self.savedocs()
+    # DONE: Records the cached files and artifacts of this build as used, and runs the garbage collection if chosen
+    def manageCache( self ):
+
+        used    = [ self.html_filename, self.pdf_filename, self.CL_html_file, self.CL_pdf_file, self.keywords_filename,
+                    self.posting_filename, self.prompt_eval_filename ]
+        if self.store is None:
+            used.append( self.remastered_json )
+        if self.bullets_key is not None:
+            used.append( os.path.join( self.BB_save_dir, self.bullets_key ) )
+        self.cache_manager.record_build( used )
+
+        if self.cache_gc:
+            report  = self.cache_manager.gc()
+            removed = sum( r['removed'] for r in report.values() )
+            if removed > 0:
+                print( f"Cache cleanup: removed {removed} entries, {sum( r['reclaimed_bytes'] for r in report.values() )/1024**2:.2f} MB reclaimed" )
+
+    # DONE: Builds the coverage report of the skill keywords named in the posting against the chosen bullets
+    @traced( "ResumeBuilder.buildKeywordCoverage", "bert" )
+    def buildKeywordCoverage( self ):
+
+        matcher                 = KeywordMatcher.for_skills( self.remastered_list['skills'], self.remastered_list['subskills'] )
+        chosen                  = [ b for exp in self.resume_bullets for b in exp['bullets'] ]
+        self.keyword_coverage   = matcher.coverage( self.job_title + " " + self.job_text, chosen )
+
+        print( f"Keyword coverage: {self.keyword_coverage['covered']}/{self.keyword_coverage['posting_keywords']} posting keywords covered by the chosen bullets" )
+        if len( self.keyword_coverage['missing'] ) > 0:
+            print( "Missing: " + ", ".join( f"{m['keyword']} (x{m['count']})" for m in self.keyword_coverage['missing'] ) )
+
+        return self.keyword_coverage
+
+    # DONE: Saves the ranked bullets, skills and projects of this job to the store
+    @traced( "ResumeBuilder.save_rankings", "io" )
+    def save_rankings( self ):
+
+        key     = job_key( self.job_title, self.job_company, self.job_text, self.encoder.BERTModel )
+
+        # Bullets keep their BERT scores. Skills and projects are stored in their ranked order.
+        # Skill and subskill ids overlap, so they are kept apart (only skills have a 'subskills' list)
+        bullets = [ ( i, [ ( b['id'], float( s ) ) for b, s in zip( exp['bullets'], exp['BERTS'] ) ] ) for i, exp in enumerate( self.resume_bullets ) ]
+        self.store.save_rankings( self.candidate, key, 'bullets', bullets )
+        self.store.save_rankings( self.candidate, key, 'skills', [ ( 0, [ ( s['id'], None ) for s in self.resume_skills if 'subskills' in s ] ) ] )
+        self.store.save_rankings( self.candidate, key, 'subskills', [ ( 0, [ ( s['id'], None ) for s in self.resume_skills if 'subskills' not in s ] ) ] )
+        self.store.save_rankings( self.candidate, key, 'projects', [ ( 0, [ ( p['id'], None ) for p in self.chosen_projects ] ) ] )
+
+    # DONE: Saves the recorded stage timings of a run (its root span) as a Chrome trace JSON and a CSV
+    def save_trace( self, run ):
+
+        comp_name   = self.job_company.split()[0].lower() if len( self.job_company.split() ) > 0 else "company"
+        basename    = f"{''.join(self.job_title.split()).lower()}_{comp_name}_trace"
+        json_file   = tracer.export_chrome( os.path.join( self.trace_save_dir, f"{basename}.json" ), root = run )
+        csv_file    = tracer.export_csv( os.path.join( self.trace_save_dir, f"{basename}.csv" ), root = run )
+
+        tracer.summary( root = run )
+        print( f"Trace saved to {json_file} and {csv_file}" )
+
+        return json_file, csv_file
 
     # DONE: Parses the new masterlist from DeepSeek to be used for the BERT modeler for job comparisons
+    @traced( "ResumeBuilder.parseNewMasterlistForBERT", "io" )
     def parseNewMasterlistForBERT( self ):
 
-        # Open the remodeled master list
-        # Check if masterlist exists
-        if not os.path.isfile(self.remastered_json):
-            raise FileNotFoundError( errno.ENOENT, os.strerror(errno.ENOENT), self.remastered_json )
+        # Use the rebuilt masterlist already in memory. Only load it from the remodeled file if it isn't there yet.
+        if not isinstance( self.remastered_list, Masterlist ):
+            self.remastered_list = Masterlist.load( self.remastered_json )
 
-        # Check that it is JSON format
-        if not self.remastered_json.lower().endswith( ".json" ):
-            raise ValueError("Unsupported file type. Only .json files are allowed.")
-        
-        # Continue parsing
-        with open(self.remastered_json, 'r') as file:
-            self.mList = json.load( file )
-
-        # Parse experiences into self.bullets_lists. FORMAT: { 'type':1, 'title':'job_title', 'bullets':[] }
-        for v in self.mList['experiences']:
+        # Parse experiences into self.parsed_bullets. FORMAT: { 'type':1, 'title':'job_title', 'bullets':[] }
+        # Start fresh, so calling this twice doesn't duplicate the experiences
+        self.parsed_bullets = []
+        for v in self.remastered_list.experiences:
 
             # Cycle through each accomplishment
-            self.parsed_bullets.append( { 'type':1, 'title':v['jobtitle'], 'bullets':v['projects'] } )
+            self.parsed_bullets.append( { 'type':1, 'title':v.jobtitle, 'bullets':v.projects } )
             
     # DONE: Parses all data to a markdown resume format
     def parseToMarkdown( self ):
@@ -615,6 +1064,7 @@ class ResumeBuilder:
         return html_text
 
     # DONE: Saves the resultant resume documents, to include the markdown and PDF versions
+    @traced( "ResumeBuilder.savedocs", "render" )
     def savedocs( self ):
 
         #print( "Building a new Markdown Resume..." )
@@ -636,6 +1086,21 @@ class ResumeBuilder:
         self.html_filename      = os.path.join( self.resume_save_dir, f"{basename}.html" )
         self.pdf_filename       = os.path.join( self.resume_save_dir, f"{basename}.pdf" )
 
+        # Save the keyword coverage report next to the resume
+        if self.keyword_coverage is not None:
+            self.keywords_filename  = os.path.join( self.resume_save_dir, f"{basename}_keywords.json" )
+            atomic_write_json( self.keywords_filename, self.keyword_coverage, indent = 4 )
+
+        # Save the requirements view of the posting and what was stripped from it
+        if self.posting is not None:
+            self.posting_filename   = os.path.join( self.resume_save_dir, f"{basename}_posting.json" )
+            atomic_write_json( self.posting_filename, dict( self.posting.report, requirements = self.posting.requirements ), indent = 4 )
+
+        # Save the comparison of the full and the compressed prompt
+        if self.prompt_evaluation is not None:
+            self.prompt_eval_filename   = os.path.join( self.resume_save_dir, f"{basename}_prompt_eval.json" )
+            atomic_write_json( self.prompt_eval_filename, self.prompt_evaluation, indent = 4 )
+
         # Save the markdown language model
         #md_format           = self.parseToMarkdown()
         html_format         = self.parseToHTML()
@@ -643,8 +1108,7 @@ class ResumeBuilder:
         # with open(  self.markdown_filename, "w" ) as file:
         #     file.write( md_format )
 
-        with open( self.html_filename, "w" ) as file:
-            file.write( html_format )
+        atomic_write( self.html_filename, html_format )
 
         #print( "Markdown Resume Complete!" )
         print( "HTML Resume Complete!" )
@@ -670,6 +1134,7 @@ class ResumeBuilder:
         
         print( "PDF Resume Complete!" )
     
+    @traced( "ResumeBuilder.html_to_pdf", "render" )
     def html_to_pdf( self, html_file_name = "", pdf_file_name = ""):
         """
         Converts an HTML file to a PDF file, respecting CSS.
@@ -678,6 +1143,7 @@ class ResumeBuilder:
             html_file (str): Path to the input HTML file.
             pdf_file (str): Path to the output PDF file.
         """
+        tmp_file_name   = f"{pdf_file_name}.{os.getpid()}.tmp"
         try:
             # Check if wkhtmltopdf is installed and in PATH.
             # pdfkit relies on wkhtmltopdf for the actual conversion.
@@ -694,13 +1160,15 @@ class ResumeBuilder:
                 'encoding': "UTF-8",
                 'quiet': '', # Suppress wkhtmltopdf output
             }
+            # Render to a temporary file first, so a half-written PDF never replaces a finished one
             if self.resume_css is not None:
                 if os.path.exists( self.resume_css ):
-                    pdfkit.from_file( html_file_name, pdf_file_name, options = options, css = self.resume_css ) #configuration = config, 
+                    pdfkit.from_file( html_file_name, tmp_file_name, options = options, css = self.resume_css ) #configuration = config, 
                 else:
-                    pdfkit.from_file( html_file_name, pdf_file_name, options = options )
+                    pdfkit.from_file( html_file_name, tmp_file_name, options = options )
             else:
-                pdfkit.from_file( html_file_name, pdf_file_name, options = options )
+                pdfkit.from_file( html_file_name, tmp_file_name, options = options )
+            os.replace( tmp_file_name, pdf_file_name )
                 
             print( f"Successfully converted {html_file_name} to {pdf_file_name}" )
 
@@ -708,6 +1176,9 @@ class ResumeBuilder:
             print("Error: wkhtmltopdf not found. Please install it and ensure it's in your PATH.")
         except Exception as e:
             print(f"An error occurred: {e}")
+        finally:
+            if os.path.exists( tmp_file_name ):
+                os.remove( tmp_file_name )
 
 
 if __name__ == "__main__":
@@ -797,6 +1268,92 @@ Significant experience at the expert level in the development of principles, the
     # Marking this as True will make the process take much longer! Beware of this!
     force_rebuilds      = False
 
+    # Whether or not to record how long each stage takes. The trace is saved to the /traces directory
+    # as a JSON file (open it in chrome://tracing or https://ui.perfetto.dev) and a CSV file.
+    trace               = False
+
+    # Hybrid ranking. ATS filters mostly match keywords, so part of each BERT score can come from a BM25 keyword score.
+    # lexical_weight: 0 = BERT only, 1 = keywords only. prefilter_m: if > 0, only the top-M keyword matches (per experience
+    # for bullets) are sent to the BERT model, which speeds up very large masterlists.
+    lexical_weight      = 0.
+    prefilter_m         = 0
+
+    # Skills the posting names outright (e.g. "Python") get this much added to their BERT score. 0 = off.
+    keyword_boost       = 0.
+    # Whether to save a report of the skill keywords in the posting that none of the chosen bullets mention
+    keyword_report      = False
+
+    # Bullets and projects are boosted by how relevant their linked skills/subskills are to the job. 0 = off.
+    skill_weight        = 0.
+
+    # Choose the bullets of all experiences together under a page budget, instead of bullet_points_per in every experience.
+    # 0 = off. Each experience gets at least bullets_min and at most bullet_points_per bullets.
+    bullet_budget       = 0
+    budget_unit         = "lines"   # 'lines' or 'chars'
+    bullets_min         = 1
+
+    # Maximal Marginal Relevance. Below 1, near-duplicate bullets/skills/projects are less likely to be chosen together
+    # (e.g. 0.7). Near-duplicate bullets (similarity above dup_threshold) are listed in the BERT results JSON. 1 = off.
+    mmr_lambda          = 1.
+    dup_threshold       = 0.9
+
+    # Two-stage ranking. If > 0, the top-N bullets of each experience (and the top-N projects) from the BERT model are
+    # reordered by a cross-encoder, which reads the posting and the bullet together. Slower, so only N items are reranked.
+    rerank_n            = 0
+    rerank_model        = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+    # Strip the EEO, legal, clearance, benefits and application boilerplate from the posting. Only the requirements are
+    # embedded by BERT and quoted in the summary/cover letter prompts. The stripped text is saved next to the resume.
+    strip_boilerplate   = False
+
+    # Compress the posting quoted in the summary/cover letter prompts to prompt_budget tokens, keeping its most central
+    # sentences and its skill keywords. Speeds up the LLM on CPU-bound machines. False = the full posting.
+    # prompt_eval = True also generates the summary from the full posting and saves the latency and similarity of both.
+    compress_prompt     = False
+    prompt_budget       = 256
+    prompt_eval         = False
+
+    # Reuse the summary and cover letter of a near-identical posting (e.g. the same role re-posted for another location)
+    # instead of generating them again. Postings count as near-identical above cache_threshold cosine similarity.
+    # touchup_model (e.g. "1.5") rewrites the job title and company of a reused text. None = plain text replacement.
+    semantic_cache      = False
+    cache_threshold     = 0.95
+    touchup_model       = None
+
+    # Track the live RAM and the models Ollama has loaded, and keep the run under memory_budget_gb (None = 85% of the RAM).
+    # Before each LLM stage the embedder is unloaded, or the summary/cover letter moves to a smaller model, if the model
+    # doesn't fit. Idle Ollama models are unloaded before BERT scoring. Decisions are logged to scheduler_log.jsonl.
+    schedule_memory     = False
+    memory_budget_gb    = None
+
+    # Run the summary, the cover letter and the bullet/skill/project scoring at the same time, since none of them depends
+    # on another. The wall time then approaches the longer of the LLM and BERT work instead of their sum.
+    # Turned off while schedule_memory is on, so the embedder and the LLM aren't loaded together.
+    concurrent_stages   = True
+
+    # The bullet rankings of every job are kept in BERT_rebuilds/rankings.seg, referencing the bullets by id.
+    # Whether those records are zlib-compressed. Run RankingStore.py to move old JSON rankings into the store.
+    compress_rankings   = True
+
+    # Keep BERT_rebuilds, resumes and cover_letters within a size and age budget each, evicting the least recently used
+    # entries after every build. The artifacts of the latest build are kept. None = DEFAULT_BUDGETS, or e.g.
+    # { 'resumes':{ 'max_mb':500, 'max_age_days':180 } }. masterlist_rebuilds, which you may have edited by hand, is only
+    # collected if it is given a budget here. Run CacheManager.py for a one-off gc and its report.
+    cache_gc            = False
+    cache_budgets       = None
+
+    # Keep the embeddings of the bullets, skills and projects in the store (or save_dir/embeddings.db without one), and wait
+    # up to precompute_wait seconds for a precompute of a masterlist rebuilt in another process (e.g. a nightly
+    # BulletRebuilder run with an EmbeddingPrecompute). Scoring then only encodes the posting.
+    precompute_embeddings = False
+    precompute_wait     = 300.
+
+    # Reuse the build of a near-duplicate posting (a repost, or a copy under another company) instead of running the whole
+    # pipeline again. Its bullets, skills, projects, summary and cover letter are rendered with this job's title and company.
+    # Postings are near-duplicates above dedup_threshold estimated Jaccard similarity of their word shingles.
+    dedup_postings      = False
+    dedup_threshold     = 0.8
+
     # Initialize the class
     RB  = ResumeBuilder( masterlist     = master_list, 
                         bullets_per     = bullet_points_per,
@@ -809,7 +1366,37 @@ Significant experience at the expert level in the development of principles, the
                         job_desc        = job_description,
                         force_rebuilds  = force_rebuilds,
                         save_dir        = save_directory,
-                        include_summary = include_summary )
+                        include_summary = include_summary,
+                        trace           = trace,
+                        lexical_weight  = lexical_weight,
+                        prefilter_m     = prefilter_m,
+                        keyword_boost   = keyword_boost,
+                        keyword_report  = keyword_report,
+                        skill_weight    = skill_weight,
+                        bullet_budget   = bullet_budget,
+                        budget_unit     = budget_unit,
+                        bullets_min     = bullets_min,
+                        mmr_lambda      = mmr_lambda,
+                        dup_threshold   = dup_threshold,
+                        rerank_n        = rerank_n,
+                        rerank_model    = rerank_model,
+                        strip_boilerplate = strip_boilerplate,
+                        compress_prompt = compress_prompt,
+                        prompt_budget   = prompt_budget,
+                        prompt_eval     = prompt_eval,
+                        semantic_cache  = semantic_cache,
+                        cache_threshold = cache_threshold,
+                        touchup_model   = touchup_model,
+                        schedule_memory = schedule_memory,
+                        memory_budget_gb= memory_budget_gb,
+                        concurrent_stages = concurrent_stages,
+                        compress_rankings = compress_rankings,
+                        cache_gc        = cache_gc,
+                        cache_budgets   = cache_budgets,
+                        precompute_embeddings = precompute_embeddings,
+                        precompute_wait = precompute_wait,
+                        dedup_postings  = dedup_postings,
+                        dedup_threshold = dedup_threshold )
     # Process the bullets, cover letter, and job posting to build a resume/CV
     RB.process()
 
@@ -0,0 +1,501 @@
+'''
+
+    Title:          Resume Service
+
+    Description:    Long-running local service around the ResumeBuilder. The BERT model is loaded once and kept resident, the
+                    Ollama models are kept warm through keep-alive, and build requests are accepted over a local HTTP port or
+                    a Unix socket. Requests are put in a priority queue and processed by a pool of workers. Each request
+                    returns a job ID that can be polled for its status and artifacts, or it can wait for the finished job.
+
+                    API:
+                        GET  /health                    Service status and queue length
+                        POST /jobs                      Queue a build. JSON body with 'job_title', 'job_company', 'job_desc',
+                                                        and optionally 'priority' (lower runs first), 'wait' and any
+                                                        ResumeBuilder option (bullets_per, cv_style, cover_letter, ...)
+                        GET  /jobs                      List of all jobs
+                        GET  /jobs/<id>                 Status and artifacts of a job
+                        GET  /jobs/<id>/<artifact>      Download an artifact (html, pdf, cl_html, cl_pdf, keywords)
+                        POST /triage                    Rank many postings by how well the masterlist fits them, with the
+                                                        static embedding tier. JSON body with 'postings' (each like a job),
+                                                        'keep' and 'submit' (queue the best 'keep' as jobs, which use the
+                                                        full model)
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import traceback
+import socketserver
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from BERTEncoder import BERTEncoder
+from BulletRebuilder import BulletRebuilder
+from StaticEncoder import StaticEncoder, triage
+from EmbeddingPrecompute import masterlist_texts
+from Masterlist import Masterlist
+
+# The ResumeBuilder lives in a file with a hyphen in the name, so it has to be loaded by path
+_rb_spec        = importlib.util.spec_from_file_location( "ResumeBuilder_nonGUI", os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "ResumeBuilder-nonGUI.py" ) )
+_rb_module      = importlib.util.module_from_spec( _rb_spec )
+_rb_spec.loader.exec_module( _rb_module )
+ResumeBuilder   = _rb_module.ResumeBuilder
+
+
+# ResumeBuilder options that may be set per request
+JOB_OPTIONS     = [ 'bullets_per', 'skills_per', 'projects_per', 'bl_model', 'cover_letter', 'cl_model', 'cv_style', 'include_summary', 'force_rebuilds', 'lexical_weight', 'prefilter_m',
+                    'keyword_boost', 'keyword_report', 'skill_weight',
+                    'bullet_budget', 'budget_unit', 'bullets_min', 'mmr_lambda', 'dup_threshold',
+                    'rerank_n', 'rerank_model', 'strip_boilerplate',
+                    'compress_prompt', 'prompt_budget', 'prompt_eval', 'semantic_cache', 'cache_threshold', 'touchup_model',
+                    'schedule_memory', 'memory_budget_gb', 'concurrent_stages',
+                    'compress_rankings', 'cache_gc', 'cache_budgets', 'precompute_embeddings',
+                    'precompute_wait', 'dedup_postings', 'dedup_threshold' ]
+
+# Artifacts that can be downloaded from a finished job and their content types
+ARTIFACT_TYPES  = { 'html':'text/html', 'pdf':'application/pdf', 'cl_html':'text/html', 'cl_pdf':'application/pdf', 'keywords':'application/json', 'posting':'application/json' }
+
+
+# Fields of a posting that must be text
+TEXT_FIELDS     = [ 'job_title', 'job_company', 'job_desc' ]
+
+
+# DONE: Whether a request value is a plain number (JSON true/false are not)
+def is_number( value ):
+    return isinstance( value, ( int, float ) ) and not isinstance( value, bool )
+
+
+# DONE: Returns the first field of a posting that is given but isn't text (e.g. a number, a list or null), or None
+def non_text_field( posting:dict ):
+    return next( ( key for key in TEXT_FIELDS if key in posting and not isinstance( posting[key], str ) ), None )
+
+
+# HTTP server that listens on a Unix socket instead of a TCP port
+class UnixHTTPServer( socketserver.ThreadingMixIn, socketserver.UnixStreamServer ):
+    daemon_threads = True
+
+
+# DONE: Request handler for the service API
+class ServiceRequestHandler( BaseHTTPRequestHandler ):
+
+    # Set by ResumeService before the server starts
+    service = None
+
+    # Unix sockets don't have a client address
+    def address_string( self ):
+        return self.client_address[0] if isinstance( self.client_address, tuple ) else "unix"
+
+    def log_message( self, format, *args ):
+        if self.service.verbose:
+            super().log_message( format, *args )
+
+    def send_json( self, code:int, data ):
+        body = json.dumps( data ).encode( "utf-8" )
+        self.send_response( code )
+        self.send_header( "Content-Type", "application/json" )
+        self.send_header( "Content-Length", str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def do_GET( self ):
+
+        parts = [ p for p in self.path.split( "?" )[0].split( "/" ) if p != "" ]
+
+        if parts == [ "health" ]:
+            self.send_json( 200, self.service.health() )
+
+        elif parts == [ "jobs" ]:
+            self.send_json( 200, self.service.list_jobs() )
+
+        elif len( parts ) == 2 and parts[0] == "jobs":
+            job = self.service.get_job( parts[1] )
+            if job is None:
+                self.send_json( 404, { 'error':f"Job {parts[1]} not found" } )
+            else:
+                self.send_json( 200, job )
+
+        elif len( parts ) == 3 and parts[0] == "jobs":
+            path = self.service.get_artifact( parts[1], parts[2] )
+            if path is None:
+                self.send_json( 404, { 'error':f"Artifact {parts[2]} not found for job {parts[1]}" } )
+            else:
+                with open( path, 'rb' ) as file:
+                    body = file.read()
+                self.send_response( 200 )
+                self.send_header( "Content-Type", ARTIFACT_TYPES[parts[2]] )
+                self.send_header( "Content-Disposition", f"attachment; filename=\"{os.path.basename( path )}\"" )
+                self.send_header( "Content-Length", str( len( body ) ) )
+                self.end_headers()
+                self.wfile.write( body )
+
+        else:
+            self.send_json( 404, { 'error':f"Unknown path {self.path}" } )
+
+    def do_POST( self ):
+
+        parts = [ p for p in self.path.split( "?" )[0].split( "/" ) if p != "" ]
+
+        if not parts in [ [ "jobs" ], [ "triage" ] ]:
+            self.send_json( 404, { 'error':f"Unknown path {self.path}" } )
+            return
+
+        try:
+            length  = int( self.headers.get( "Content-Length", 0 ) )
+            request = json.loads( self.rfile.read( length ) or b"{}" )
+        except ValueError as e:
+            self.send_json( 400, { 'error':f"Invalid JSON body: {e}" } )
+            return
+
+        if not isinstance( request, dict ):
+            self.send_json( 400, { 'error':"The JSON body must be an object" } )
+            return
+
+        # A priority or keep that isn't a number would only fail once it reaches the queue
+        for key in [ 'priority', 'keep' ]:
+            if key in request and not is_number( request[key] ):
+                self.send_json( 400, { 'error':f"'{key}' must be a number" } )
+                return
+
+        if parts == [ "triage" ]:
+            if not isinstance( request.get( 'postings', None ), list ) or not all( isinstance( p, dict ) for p in request['postings'] ):
+                self.send_json( 400, { 'error':"'postings' must be a list of objects" } )
+                return
+            for i, posting in enumerate( request['postings'] ):
+                key = non_text_field( posting )
+                if key is not None:
+                    self.send_json( 400, { 'error':f"'{key}' of posting {i} must be a string" } )
+                    return
+            self.send_json( 200, self.service.triage( request['postings'], keep = int( request.get( 'keep', 10 ) ),
+                                                      submit = request.get( 'submit', False ), priority = request.get( 'priority', 10 ) ) )
+            return
+
+        key = non_text_field( request )
+        if key is not None:
+            self.send_json( 400, { 'error':f"'{key}' must be a string" } )
+            return
+
+        if request.get( 'job_desc', "" ).strip() == "":
+            self.send_json( 400, { 'error':"'job_desc' is required" } )
+            return
+
+        job_id  = self.service.submit( request, priority = request.get( 'priority', 10 ) )
+
+        # Either block until the job is done or return the job ID for polling
+        if request.get( 'wait', False ):
+            self.send_json( 200, self.service.wait( job_id ) )
+        else:
+            self.send_json( 202, { 'id':job_id, 'status':'queued' } )
+
+
+# DONE: The service class
+class ResumeService:
+
+    def __init__( self,
+                masterlist:str      = os.path.join( os.path.dirname(os.path.abspath(__file__)), "masterlist.json" ),
+                save_dir:str        = os.path.dirname(os.path.abspath(__file__)),
+                host:str            = "127.0.0.1",          # Host for the HTTP API
+                port:int            = 8765,                 # Port for the HTTP API
+                socket_path:str     = "",                   # If set, listen on this Unix socket instead of host/port
+                workers:int         = 1,                    # Amount of jobs processed at the same time
+                BERTModel:str       = "all-mpnet-base-v2",  # The BERT model kept resident
+                bl_model:str        = "32",                 # Default Deepseek model for bullets and the summary
+                keep_alive          = -1,                   # How long Ollama keeps the models loaded. -1 = forever
+                job_defaults:dict   = {},                   # Default ResumeBuilder options for every job
+                ollama_host:str     = None,                 # Ollama server to use. None = OLLAMA_HOST or the local default
+                verbose:bool        = False ):
+
+        self.masterlist     = masterlist
+        self.save_dir       = save_dir
+        self.host           = host
+        self.port           = port
+        self.socket_path    = socket_path
+        self.workers        = workers
+        self.bl_model       = bl_model
+        self.keep_alive     = keep_alive
+        self.job_defaults   = dict( job_defaults )
+        self.ollama_host    = ollama_host
+        self.verbose        = verbose
+
+        # Internal
+        self.encoder        = BERTEncoder( BERTModel = BERTModel )
+        self.static_encoder = StaticEncoder( BERTModel = BERTModel )
+        self.queue          = queue.PriorityQueue()
+        self.jobs           = {}
+        self.jobs_lock      = threading.Lock()
+        self.job_count      = 0
+        self.threads        = []
+        self.server         = None
+        self.started        = time.time()
+
+    # DONE: Loads the BERT model and the Ollama models before the first request arrives
+    def warm( self ):
+
+        print( "Warming up the BERT model..." )
+        self.encoder.load()
+
+        # The static tier is distilled from the BERT model the first time, then loaded from static_models/
+        print( "Warming up the static embedding model..." )
+        self.static_encoder.load()
+
+        # Check which Ollama models are used by default
+        models = { str( self.job_defaults.get( 'bl_model', self.bl_model ) ) }
+        if self.job_defaults.get( 'cover_letter', False ):
+            models.add( str( self.job_defaults.get( 'cl_model', self.bl_model ) ) )
+
+        for m in models:
+            print( f"Warming up deepseek-r1:{m}b..." )
+            try:
+                BR = BulletRebuilder( master_file = self.masterlist, modelSize = m, save_directory = os.path.join( self.save_dir, "masterlist_rebuilds" ),
+                                      keep_alive = self.keep_alive, ollama_host = self.ollama_host )
+                BR.warm_model()
+            except Exception as e:
+                print( f"Could not warm up deepseek-r1:{m}b: {e}" )
+
+    # DONE: Adds a job to the queue and returns its ID. Lower priority values run first
+    def submit( self, request:dict, priority:int = 10 ):
+
+        # The queue compares priorities, so one that isn't a number would break every later put
+        if not is_number( priority ):
+            raise ValueError( f"The priority must be a number, not {priority!r}" )
+
+        job_id = uuid.uuid4().hex[:12]
+
+        with self.jobs_lock:
+            self.job_count += 1
+            job = { 'id':           job_id,
+                    'status':       'queued',
+                    'priority':     priority,
+                    'job_title':    request.get( 'job_title', "" ),
+                    'job_company':  request.get( 'job_company', "" ),
+                    'submitted':    time.time(),
+                    'started':      None,
+                    'finished':     None,
+                    'artifacts':    {},
+                    'error':        None,
+                    'done':         threading.Event(),
+                    'request':      request }
+            # The job count keeps jobs with the same priority in order of submission.
+            # The job is only listed once it is queued; workers wait for the lock before they look it up.
+            self.queue.put( ( priority, self.job_count, job_id ) )
+            self.jobs[job_id] = job
+
+        return job_id
+
+    # DONE: Ranks postings by how well the masterlist fits them, with the static tier. Returns the best `keep`.
+    #       With submit, those are queued as jobs, whose resumes are scored with the full model.
+    def triage( self, postings:list, keep:int = 10, submit:bool = False, priority:int = 10 ):
+
+        start   = time.perf_counter()
+        texts   = masterlist_texts( Masterlist.load( self.masterlist ) )
+        ranked  = triage( self.static_encoder, [ f"{p.get( 'job_title', '' )} {p.get( 'job_desc', '' )}" for p in postings ], texts, keep = keep )
+
+        results = []
+        for i, fit in ranked:
+            r = { 'index':i, 'fit':round( fit, 4 ), 'job_title':postings[i].get( 'job_title', "" ), 'job_company':postings[i].get( 'job_company', "" ) }
+            if submit and postings[i].get( 'job_desc', "" ).strip() != "":
+                r['id'] = self.submit( postings[i], priority = priority )
+            results.append( r )
+
+        return { 'postings':len( postings ), 'seconds':round( time.perf_counter() - start, 4 ), 'ranked':results }
+
+    # DONE: Blocks until a job has finished and returns it
+    def wait( self, job_id:str, timeout:float = None ):
+        with self.jobs_lock:
+            job = self.jobs.get( job_id )
+        if job is None:
+            return None
+        job['done'].wait( timeout )
+        return self.get_job( job_id )
+
+    # DONE: Returns the public information of a job
+    def get_job( self, job_id:str ):
+        with self.jobs_lock:
+            job = self.jobs.get( job_id )
+            if job is None:
+                return None
+            return { k:v for k, v in job.items() if k not in [ 'done', 'request' ] }
+
+    # DONE: Returns all jobs
+    def list_jobs( self ):
+        with self.jobs_lock:
+            ids = list( self.jobs.keys() )
+        return [ self.get_job( j ) for j in ids ]
+
+    # DONE: Returns the path to an artifact of a finished job
+    def get_artifact( self, job_id:str, artifact:str ):
+        job = self.get_job( job_id )
+        if job is None or artifact not in ARTIFACT_TYPES:
+            return None
+        path = job['artifacts'].get( artifact )
+        if path is None or not os.path.isfile( path ):
+            return None
+        return path
+
+    # DONE: Returns the status of the service
+    def health( self ):
+        with self.jobs_lock:
+            statuses = [ j['status'] for j in self.jobs.values() ]
+        return {    'status':       'ok',
+                    'uptime':       time.time() - self.started,
+                    'bert_loaded':  self.encoder.is_loaded(),
+                    'queued':       statuses.count( 'queued' ),
+                    'running':      statuses.count( 'running' ),
+                    'finished':     statuses.count( 'finished' ),
+                    'failed':       statuses.count( 'failed' ),
+                    'workers':      self.workers }
+
+    # DONE: Processes a single job with the resident models
+    def run_job( self, job_id:str ):
+
+        with self.jobs_lock:
+            job             = self.jobs[job_id]
+            job['status']   = 'running'
+            job['started']  = time.time()
+
+        request = job['request']
+
+        try:
+            # Build the options for the ResumeBuilder from the defaults and the request
+            options = { 'bl_model':self.bl_model }
+            options.update( self.job_defaults )
+            options.update( { k:request[k] for k in JOB_OPTIONS if k in request } )
+
+            RB  = ResumeBuilder(    masterlist      = self.masterlist,
+                                    job_title       = request.get( 'job_title', "" ),
+                                    job_company     = request.get( 'job_company', "" ),
+                                    job_desc        = request.get( 'job_desc', "" ),
+                                    save_dir        = self.save_dir,
+                                    encoder         = self.encoder,
+                                    keep_alive      = self.keep_alive,
+                                    ollama_host     = self.ollama_host,
+                                    **options )
+            RB.process()
+
+            artifacts = {   'html':     RB.html_filename,
+                            'pdf':      RB.pdf_filename,
+                            'cl_html':  RB.CL_html_file,
+                            'cl_pdf':   RB.CL_pdf_file,
+                            'keywords': RB.keywords_filename,
+                            'posting':  RB.posting_filename }
+
+            with self.jobs_lock:
+                job['artifacts']    = { k:v for k, v in artifacts.items() if v is not None }
+                job['summary']      = getattr( RB, 'summary', None )
+                job['critical_path']= RB.critical_path
+                job['duplicate_of'] = RB.duplicate_of
+                job['status']       = 'finished'
+
+        except Exception as e:
+            traceback.print_exc()
+            with self.jobs_lock:
+                job['status']   = 'failed'
+                job['error']    = str( e )
+
+        finally:
+            with self.jobs_lock:
+                job['finished'] = time.time()
+            job['done'].set()
+
+    # DONE: Worker loop that pulls jobs from the queue
+    def worker( self ):
+        while True:
+            _, _, job_id = self.queue.get()
+            if job_id is None:
+                break
+            self.run_job( job_id )
+            self.queue.task_done()
+
+    # DONE: Starts the workers and the API server. Blocks until stopped.
+    def serve( self, warm:bool = True ):
+
+        if warm:
+            self.warm()
+
+        # Start the worker pool
+        for _ in range( self.workers ):
+            t = threading.Thread( target = self.worker, daemon = True )
+            t.start()
+            self.threads.append( t )
+
+        ServiceRequestHandler.service = self
+
+        if not self.socket_path == "":
+            # Remove an old socket file left from a previous run
+            if os.path.exists( self.socket_path ):
+                os.remove( self.socket_path )
+            self.server = UnixHTTPServer( self.socket_path, ServiceRequestHandler )
+            print( f"Resume service listening on unix socket {self.socket_path}" )
+        else:
+            self.server = ThreadingHTTPServer( ( self.host, self.port ), ServiceRequestHandler )
+            print( f"Resume service listening on http://{self.host}:{self.port}" )
+
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            print( "Stopping resume service..." )
+        finally:
+            self.stop()
+
+    # DONE: Stops the workers and the API server
+    def stop( self ):
+
+        for _ in self.threads:
+            # None sorts after every real job, so queued jobs are still finished first
+            self.queue.put( ( float( 'inf' ), 0, None ) )
+
+        if self.server is not None:
+            self.server.server_close()
+            self.server = None
+
+        if not self.socket_path == "" and os.path.exists( self.socket_path ):
+            os.remove( self.socket_path )
+
+
+if __name__ == "__main__":
+
+    ##### Required info for the service
+
+    # Where the save the output files [For testing, just use this directory]
+    save_directory      = os.path.dirname( os.path.abspath( __file__ ) )
+
+    # Path to the masterlist.json file for my base resume [use the _small.json for testing]
+    master_list         = os.path.join( save_directory, "masterlist_example_small.json" )
+
+    # Where to listen for requests. Set a socket path to use a Unix socket instead of the HTTP port.
+    host                = "127.0.0.1"
+    port                = 8765
+    socket_path         = ""
+
+    # How many jobs to run at the same time. Ollama queues the LLM calls, so more than 2 rarely helps.
+    workers             = 1
+
+    # The Deepseek model to keep warm for the bullet points and summaries.
+    bullet_model        = "32"
+
+    # How long Ollama keeps the models loaded between requests. -1 keeps them loaded until the service stops.
+    keep_alive          = -1
+
+    # Default settings for every job. Any of these can be overwritten per request.
+    job_defaults        = { 'bullets_per':5, 'cover_letter':False, 'cv_style':True, 'include_summary':True }
+
+    RS  = ResumeService(    masterlist      = master_list,
+                            save_dir        = save_directory,
+                            host            = host,
+                            port            = port,
+                            socket_path     = socket_path,
+                            workers         = workers,
+                            bl_model        = bullet_model,
+                            keep_alive      = keep_alive,
+                            job_defaults    = job_defaults )
+
+    # Example request:
+    #   curl -X POST http://127.0.0.1:8765/jobs -d '{"job_title":"Physicist", "job_company":"ACME", "job_desc":"...", "wait":true}'
+    RS.serve()
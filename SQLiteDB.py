@@ -0,0 +1,94 @@
+'''
+
+    Title:          SQLite Database
+
+    Description:    Base of the SQLite-backed stores (MasterlistStore, SemanticCache and PostingDedup). Each thread gets its
+                    own connection, so one store can be shared by the service workers, and statements are grouped into
+                    transactions that roll back on an exception. Stores that keep counters across runs give their schema a
+                    `stats ( key, value )` table and add to it with `count`.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteDB:
+
+    # Run on every new connection
+    PRAGMAS = ( "PRAGMA journal_mode = WAL", )
+
+    def __init__( self,
+                db_file:str,                                    # SQLite database file
+                schema:str          = "",                       # Statements creating the tables, run once when opened
+                timeout:float       = 30. ):                    # Seconds to wait for another writer before giving up
+
+        self.db_file    = db_file
+        self.timeout    = timeout
+
+        # One connection per thread. Every one is kept, so close() can close them all.
+        self.local      = threading.local()
+        self.conns      = []
+        self.conns_lock = threading.Lock()
+
+        if schema != "":
+            with self.transaction() as db:
+                db.executescript( schema )
+
+    # DONE: Returns the connection of the current thread
+    @property
+    def db( self ):
+
+        conn = getattr( self.local, 'conn', None )
+        if conn is None:
+            conn = sqlite3.connect( self.db_file, timeout = self.timeout, check_same_thread = False )
+            conn.row_factory = sqlite3.Row
+            for pragma in self.PRAGMAS:
+                conn.execute( pragma )
+            self.local.conn = conn
+            with self.conns_lock:
+                self.conns.append( conn )
+
+        return conn
+
+    # DONE: Runs the enclosed statements as one transaction. Everything is rolled back on an exception.
+    @contextmanager
+    def transaction( self ):
+
+        db = self.db
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    # DONE: Adds to a stored counter of the stats table
+    def count( self, db, key:str, value:float = 1. ):
+        db.execute( "INSERT INTO stats ( key, value ) VALUES ( ?, ? ) ON CONFLICT( key ) DO UPDATE SET value = value + excluded.value", ( key, value ) )
+
+    # DONE: Returns the stored counters as { key:value }
+    def counters( self ):
+        return { r['key']:r['value'] for r in self.db.execute( "SELECT key, value FROM stats" ) }
+
+    # DONE: Closes every connection of the store
+    def close( self ):
+
+        with self.conns_lock:
+            for conn in self.conns:
+                conn.close()
+            self.conns = []
+        self.local = threading.local()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close()
+        return False
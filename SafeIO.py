@@ -0,0 +1,91 @@
+'''
+
+    Title:          Safe IO
+
+    Description:    Crash-safe and concurrency-safe writes for the cached results and artifacts in the save directory.
+                    Several ResumeBuilder runs (or service workers on different hosts) may share `masterlist_rebuilds` and
+                    `BERT_rebuilds`. A file written in place can then be read half-written by another run, or left truncated
+                    by a crash.
+
+                    Every write goes to a temporary file in the same directory first, which is flushed to disk and then
+                    renamed over the target. A rename is atomic, so readers see either the old or the new file, never a partial
+                    one. Each cached result has its own file lock (in a `.locks` directory next to it), so only one run computes
+                    it, and the others wait and then read it. Reads of JSON files return None for missing or unreadable
+                    files, which callers treat as a cache miss.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+from filelock import FileLock
+
+
+# DONE: Opens a temporary file next to file_name for writing, and renames it over file_name when the block ends without an
+#       error. Use it for files too large to hold in memory at once.
+@contextmanager
+def atomic_open( file_name:str, binary:bool = False ):
+
+    directory   = os.path.dirname( os.path.abspath( file_name ) )
+    fd, tmp     = tempfile.mkstemp( dir = directory, prefix = f".{os.path.basename( file_name )}.", suffix = ".tmp" )
+
+    try:
+        with os.fdopen( fd, "wb" if binary else "w", **( {} if binary else { 'encoding':'utf-8' } ) ) as file:
+            yield file
+            file.flush()
+            os.fsync( file.fileno() )
+
+        # mkstemp creates the file private to the user. Keep the mode of the file being replaced, or the usual 644.
+        # os.chmod on the path, since os.fchmod doesn't exist on Windows before Python 3.13.
+        os.chmod( tmp, os.stat( file_name ).st_mode & 0o777 if os.path.exists( file_name ) else 0o644 )
+        os.replace( tmp, file_name )
+    except BaseException:
+        # Never leave the temporary file behind
+        try:
+            os.remove( tmp )
+        except OSError:
+            pass
+        raise
+
+
+# DONE: Writes text or bytes to a file atomically. The file is replaced in one step, or not at all.
+def atomic_write( file_name:str, data ):
+
+    with atomic_open( file_name, binary = isinstance( data, ( bytes, bytearray ) ) ) as file:
+        file.write( data )
+
+    return file_name
+
+
+# DONE: Writes an object as JSON atomically. Keyword arguments go to json.dumps (e.g. indent, default).
+def atomic_write_json( file_name:str, obj, **kwargs ):
+    return atomic_write( file_name, json.dumps( obj, **kwargs ) )
+
+
+# DONE: Reads a JSON file. Returns `default` if the file is missing, truncated or otherwise unreadable.
+def read_json( file_name:str, default = None ):
+
+    try:
+        with open( file_name, "r", encoding = "utf-8" ) as file:
+            return json.load( file )
+    except FileNotFoundError:
+        return default
+    except ( ValueError, UnicodeDecodeError ) as e:
+        print( f"Ignoring unreadable file {file_name}: {e}" )
+        return default
+
+
+# DONE: Returns the lock of one cached file. Use it as `with key_lock( path ):` around the check-compute-write of that file.
+#       The lock files are kept in a `.locks` directory, so they don't mix with the results.
+def key_lock( file_name:str, timeout:float = -1 ):
+
+    lock_dir = os.path.join( os.path.dirname( os.path.abspath( file_name ) ), ".locks" )
+    os.makedirs( lock_dir, exist_ok = True )
+
+    return FileLock( os.path.join( lock_dir, os.path.basename( file_name ) + ".lock" ), timeout = timeout )
@@ -0,0 +1,284 @@
+'''
+
+    Title:          Scoring Session
+
+    Description:    Incremental bullet scoring for an interactive editor. Running BERTBullets.render on every keystroke scores
+                    the whole masterlist against the whole posting again, which is far too slow to follow the typing.
+
+                    A session keeps the embedding of every posting sentence and every bullet, and the matrix of their
+                    similarities. The posting is scored as the mean of its sentence embeddings, so a bullet's score is the
+                    sum of its column over the length of the summed sentences. An edit only re-encodes the texts it changed:
+                    a changed sentence replaces its row of the matrix and an edited bullet its column, and only the
+                    experiences whose scores changed are ranked again. Edits are collected and applied together once the
+                    typing pauses for `debounce` seconds. `on_update` is then called with the new rankings (from the timer
+                    thread, so a Qt window should emit a signal from it). An update takes a few milliseconds plus the
+                    encoding of the edited texts, which is one short text per edit with the transformer. With a StaticEncoder
+                    the whole update takes under a millisecond.
+
+                    The scores are the plain BERT similarities, with the posting pooled by sentence. They are close to, but
+                    not the same as, those of BERTBullets, which embeds the posting as one text. Render the final resume with
+                    the ResumeBuilder.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import copy
+import time
+import threading
+import numpy as np
+from Tracer import tracer
+from Masterlist import Record
+from JobPosting import split_sentences
+
+
+class ScoringSession:
+
+    def __init__( self,
+                encoder,                            # BERTEncoder (or StaticEncoder) for the sentences and bullets
+                bullets:list,                       # Experiences as for BERTBullets: [ { 'type', 'title', 'bullets':[ { 'description', ... } ] } ]
+                job_desc:str        = "",           # The posting
+                per:int             = 5,            # Bullets ranked per experience. 0 = all of them
+                debounce:float      = 0.15,         # Seconds without an edit before the edits are applied
+                on_update           = None ):       # Called with ( session, changed experience indexes ) after every update
+
+        # Without the embedding store, so the half-typed texts aren't written to it
+        self.encoder    = encoder
+        if getattr( encoder, 'store', None ) is not None:
+            self.encoder        = copy.copy( encoder )
+            self.encoder.store  = None
+        self.per        = per
+        self.debounce   = debounce
+        self.on_update  = on_update
+
+        # The session edits its own copy of the bullets, never the masterlist
+        self.experiences    = [ { 'type':       exp.get( 'type', 1 ),
+                                  'title':      exp.get( 'title', "" ),
+                                  'bullets':    [ b.to_dict() if isinstance( b, Record ) else dict( b ) for b in exp['bullets'] ] }
+                                for exp in bullets ]
+        self.texts      = [ b['description'] for exp in self.experiences for b in exp['bullets'] ]
+        self.groups     = []
+        for exp in self.experiences:
+            start = self.groups[-1][1] if len( self.groups ) > 0 else 0
+            self.groups.append( ( start, start + len( exp['bullets'] ) ) )
+
+        # Embeddings and the sentence x bullet similarity matrix
+        self.B          = self.encode( self.texts )
+        self.sentences  = []
+        self.S          = np.zeros( ( 0, self.B.shape[1] ), dtype = np.float32 )
+        self.M          = np.zeros( ( 0, len( self.texts ) ), dtype = np.float32 )
+        self.scores     = np.zeros( len( self.texts ), dtype = np.float32 )
+        self.rankings   = [ [] for _ in self.experiences ]
+
+        # Edits waiting for the debounce timer
+        self.lock           = threading.RLock()
+        self.timer          = None
+        self.pending_text   = None
+        self.pending_bullets= {}
+        self.last_update    = None                  # { 'seconds', 'sentences_encoded', 'bullets_encoded', 'changed' } of the latest update
+
+        self.set_posting( job_desc )
+        self.flush()
+
+        # Without a posting nothing was ranked yet
+        self.rankings   = [ self.rank( e ) for e in range( len( self.experiences ) ) ]
+
+    # DONE: Encodes texts into a float32 matrix, one row each
+    def encode( self, texts:list ):
+        return np.asarray( self.encoder.encode( list( texts ) ), dtype = np.float32 )
+
+    # DONE: Replaces the posting. Sentences that didn't change keep their embeddings.
+    def set_posting( self, text:str ):
+
+        with self.lock:
+            self.pending_text = text
+        self.schedule()
+
+    # DONE: Replaces one sentence of the posting (as split by split_sentences)
+    def edit_sentence( self, index:int, text:str ):
+
+        with self.lock:
+            sentences           = split_sentences( self.pending_text ) if self.pending_text is not None else list( self.sentences )
+            sentences[index]    = text
+            self.pending_text   = " ".join( sentences )
+        self.schedule()
+
+    # DONE: Replaces the text of a bullet, given by its experience and its index in that experience
+    def edit_bullet( self, experience:int, index:int, text:str ):
+
+        with self.lock:
+            start, end = self.groups[experience]
+            if not 0 <= index < end - start:
+                raise IndexError( f"Experience {experience} has no bullet {index}" )
+            self.pending_bullets[start + index] = text
+        self.schedule()
+
+    # DONE: (Re)starts the debounce timer. With debounce = 0 the edits are applied right away.
+    def schedule( self ):
+
+        if self.debounce <= 0:
+            self.flush()
+            return
+
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer          = threading.Timer( self.debounce, self.flush )
+            self.timer.daemon   = True
+            self.timer.start()
+
+    # DONE: Applies the pending edits now. Returns the indexes of the experiences whose rankings changed.
+    def flush( self ):
+
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            text, self.pending_text     = self.pending_text, None
+            edits, self.pending_bullets = self.pending_bullets, {}
+            if text is None and len( edits ) == 0:
+                return set()
+
+            start   = time.perf_counter()
+            with tracer.span( "ScoringSession.update", "bert", bullets = len( edits ) ) as sp:
+                changed         = set()
+                sentences_new   = 0
+
+                # Edited bullets get a new embedding and a new column
+                edits   = { j:t for j, t in edits.items() if t != self.texts[j] }
+                if len( edits ) > 0:
+                    cols            = list( edits.keys() )
+                    vecs            = self.encode( [ edits[j] for j in cols ] )
+                    self.B[cols]    = vecs
+                    self.M[:, cols] = self.S @ vecs.T
+                    for j in cols:
+                        self.texts[j] = edits[j]
+                        e = self.experience_of( j )
+                        self.experiences[e]['bullets'][j - self.groups[e][0]]['description'] = edits[j]
+                        changed.add( e )
+
+                # Sentences that are new get a new embedding and a new row. The others keep theirs.
+                if text is not None:
+                    sentences   = split_sentences( text )
+                    if sentences != self.sentences:
+                        rows    = { s:i for i, s in enumerate( self.sentences ) }
+                        new     = list( dict.fromkeys( s for s in sentences if s not in rows ) )
+                        index   = { s:i for i, s in enumerate( new ) }
+                        if len( new ) > 0:
+                            S_new   = self.encode( new )
+                            M_new   = S_new @ self.B.T if len( self.texts ) > 0 else np.zeros( ( len( new ), 0 ), dtype = np.float32 )
+
+                        self.S  = np.vstack( [ self.S[rows[s]] if s in rows else S_new[index[s]] for s in sentences ] ) if len( sentences ) > 0 \
+                                  else np.zeros( ( 0, self.B.shape[1] ), dtype = np.float32 )
+                        self.M  = np.vstack( [ self.M[rows[s]] if s in rows else M_new[index[s]] for s in sentences ] ) if len( sentences ) > 0 \
+                                  else np.zeros( ( 0, len( self.texts ) ), dtype = np.float32 )
+                        self.sentences  = sentences
+                        sentences_new   = len( new )
+                        changed         = set( range( len( self.experiences ) ) )
+
+                # Cosine similarity of each bullet and the mean of the sentences
+                norm        = float( np.linalg.norm( self.S.sum( axis = 0 ) ) ) if len( self.sentences ) > 0 else 0.
+                self.scores = self.M.sum( axis = 0 )/norm if norm > 0 else np.zeros( len( self.texts ), dtype = np.float32 )
+                for e in changed:
+                    self.rankings[e] = self.rank( e )
+
+                sp.set( 'sentences_encoded', sentences_new )
+                sp.set( 'experiences_ranked', len( changed ) )
+
+            self.last_update    = { 'seconds':              time.perf_counter() - start,
+                                    'sentences_encoded':    sentences_new,
+                                    'bullets_encoded':      len( edits ),
+                                    'changed':              sorted( changed ) }
+
+        if self.on_update is not None and len( changed ) > 0:
+            self.on_update( self, changed )
+
+        return changed
+
+    # DONE: Returns the experience a bullet (by its flat index) belongs to
+    def experience_of( self, j:int ):
+        for e, ( start, end ) in enumerate( self.groups ):
+            if start <= j < end:
+                return e
+        raise IndexError( f"No bullet {j}" )
+
+    # DONE: Returns the ( bullet index, score ) of the top bullets of an experience, best first
+    def rank( self, experience:int ):
+
+        start, end  = self.groups[experience]
+        scores      = self.scores[start:end]
+        k           = len( scores ) if self.per <= 0 else min( self.per, len( scores ) )
+        if k == 0:
+            return []
+        top         = np.argpartition( -scores, k - 1 )[:k] if k < len( scores ) else np.arange( len( scores ) )
+        top         = top[np.argsort( -scores[top], kind = "stable" )]
+
+        return [ ( int( i ), float( scores[i] ) ) for i in top ]
+
+    # DONE: Returns the current rankings in the format of BERTBullets.render:
+    #       [ { 'type', 'title', 'bullets':[ bullet, ... ], 'BERTS':[ score, ... ] } ]
+    def render( self ):
+
+        with self.lock:
+            return [ { 'type':      exp['type'],
+                       'title':     exp['title'],
+                       'bullets':   [ exp['bullets'][i] for i, _ in ranked ],
+                       'BERTS':     [ s for _, s in ranked ] }
+                     for exp, ranked in zip( self.experiences, self.rankings ) ]
+
+    # DONE: Stops the debounce timer. Pending edits are dropped.
+    def close( self ):
+
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.pending_text       = None
+            self.pending_bullets    = {}
+
+
+if __name__ == "__main__":
+
+    import random
+    from BERTEncoder import BERTEncoder
+    from StaticEncoder import StaticEncoder
+    from MasterlistGenerator import MasterlistGenerator
+
+    # Simulated editing of a synthetic posting and masterlist, with the transformer and with the static tier.
+    # Each keystroke (a letter typed before the closing period) is applied right away (debounce = 0), so every update
+    # is timed; in an editor only the update after the typing pauses would run.
+    edits       = 200
+
+    MG      = MasterlistGenerator( experiences = 10, bullets_per = 20 )
+    mList   = MG.generate()
+    bullets = [ { 'type':1, 'title':exp['jobtitle'], 'bullets':exp['projects'] } for exp in mList['experiences'] ]
+    posting = " ".join( p['job_desc'] for p in MG.postings( 4 ) )
+
+    for encoder in ( BERTEncoder(), StaticEncoder() ):
+
+        rng     = random.Random( 3 )
+        start   = time.perf_counter()
+        session = ScoringSession( encoder, bullets, posting, debounce = 0. )
+        print( f"{encoder.BERTModel}: session of {len( session.texts )} bullets and {len( session.sentences )} sentences opened in {time.perf_counter() - start:.2f} s" )
+
+        timings = { 'sentence':[], 'bullet':[] }
+        for n in range( edits ):
+            if n % 2 == 0:
+                i       = rng.randrange( len( session.sentences ) )
+                text    = session.sentences[i]
+                session.edit_sentence( i, text[:-1] + rng.choice( "abcdefghijklmnopqrstuvwxyz" ) + text[-1] )
+                timings['sentence'].append( session.last_update['seconds'] )
+            else:
+                e       = rng.randrange( len( session.experiences ) )
+                i       = rng.randrange( len( session.experiences[e]['bullets'] ) )
+                text    = session.experiences[e]['bullets'][i]['description']
+                session.edit_bullet( e, i, text + rng.choice( "abcdefghijklmnopqrstuvwxyz" ) )
+                timings['bullet'].append( session.last_update['seconds'] )
+
+        for kind, t in timings.items():
+            t = np.array( t )*1000
+            print( f"    {kind} edit: {np.median( t ):.1f} ms median, {np.percentile( t, 95 ):.1f} ms p95, {t.max():.1f} ms max ({len( t )} edits)" )
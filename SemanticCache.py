@@ -0,0 +1,179 @@
+'''
+
+    Title:          Semantic Cache
+
+    Description:    Response cache for the generated summaries and cover letters. The same role is often re-posted, or posted
+                    for several locations, with nearly the same text, and each posting would otherwise cost a full generation on
+                    a large model. Every generated text is stored with the embedding of the posting it was written for. A new
+                    posting whose embedding is within the cosine threshold of a cached one (for the same masterlist, model, prompt
+                    options and kind of text) reuses the cached text instead.
+
+                    Entries are kept in SQLite. Each scope is capped by an entry count and an age, and the least recently used
+                    entries are evicted first. Lookups, hits and the generation time saved are counted in the database, so the
+                    hit rate covers every run, not just the current process.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from Tracer import tracer
+from SQLiteDB import SQLiteDB
+
+
+SCHEMA  = """
+CREATE TABLE IF NOT EXISTS entries (
+    id          INTEGER PRIMARY KEY,
+    scope       TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    job_title   TEXT,
+    job_company TEXT,
+    vector      BLOB NOT NULL,
+    output      TEXT NOT NULL,
+    seconds     REAL NOT NULL,
+    created     REAL NOT NULL,
+    last_used   REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_scope ON entries ( scope, kind );
+
+CREATE TABLE IF NOT EXISTS stats (
+    key         TEXT PRIMARY KEY,
+    value       REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+# DONE: Key of the masterlist, model and prompt options (e.g. the posting compression) a text was generated with.
+#       Only texts of the same scope are reused.
+def scope_key( masterlist_json:str, model:str, options:dict = None ):
+    options = json.dumps( options or {}, sort_keys = True )
+    return hashlib.sha1( f"{model}\x1f{options}\x1f{masterlist_json}".encode( "utf-8" ) ).hexdigest()
+
+
+class SemanticCache( SQLiteDB ):
+
+    def __init__( self,
+                encoder,                                    # BERTEncoder for the posting embeddings
+                db_file:str         = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "semantic_cache.db" ),
+                threshold:float     = 0.95,                 # Cosine similarity of two postings above which the cached text is reused
+                max_entries:int     = 500,                  # Max entries of each scope and kind. The least recently used go first
+                max_age_days:float  = 90. ):                # Entries older than this are evicted. 0 = no age limit
+
+        self.encoder        = encoder
+        self.threshold      = threshold
+        self.max_entries    = max_entries
+        self.max_age_days   = max_age_days
+
+        # One connection per thread, so the cache can be shared by the service workers
+        super().__init__( db_file, SCHEMA )
+
+    # DONE: Returns the closest cached text for the posting, or None if none is within the threshold.
+    #       The returned entry has 'output', 'job_title', 'job_company', 'seconds' and 'similarity'.
+    def lookup( self, scope:str, kind:str, posting:str ):
+
+        with tracer.span( "SemanticCache.lookup", "cache", kind = kind ) as sp:
+
+            rows    = self.db.execute( "SELECT id, job_title, job_company, vector, output, seconds FROM entries WHERE scope = ? AND kind = ?",
+                                       ( scope, kind ) ).fetchall()
+            best    = None
+            if len( rows ) > 0:
+                query   = self.encoder.encode( posting )
+                sims    = np.vstack( [ np.frombuffer( r['vector'], dtype = np.float32 ) for r in rows ] ) @ query
+                i       = int( np.argmax( sims ) )
+                if sims[i] >= self.threshold:
+                    best = dict( rows[i] )
+                    best['similarity'] = float( sims[i] )
+
+            with self.transaction() as db:
+                self.count( db, 'lookups' )
+                if best is not None:
+                    self.count( db, 'hits' )
+                    self.count( db, 'seconds_saved', best['seconds'] )
+                    db.execute( "UPDATE entries SET hits = hits + 1, last_used = ? WHERE id = ?", ( time.time(), best['id'] ) )
+
+            sp.set( 'semantic_cache', 'hit' if best is not None else 'miss' )
+
+        return best
+
+    # DONE: Stores a generated text and the time it took to generate, then evicts the scope down to its limits
+    def put( self, scope:str, kind:str, posting:str, job_title:str, job_company:str, output:str, seconds:float ):
+
+        vector  = np.asarray( self.encoder.encode( posting ), dtype = np.float32 ).tobytes()
+        now     = time.time()
+        with self.transaction() as db:
+            db.execute( """INSERT INTO entries ( scope, kind, job_title, job_company, vector, output, seconds, created, last_used )
+                           VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? )""", ( scope, kind, job_title, job_company, vector, output, seconds, now, now ) )
+            self.evict_scope( db, scope, kind )
+
+    # DONE: Evicts the entries of a scope that are too old, then the least recently used ones above the entry cap
+    def evict_scope( self, db, scope:str, kind:str ):
+
+        removed = 0
+        if self.max_age_days > 0:
+            removed += db.execute( "DELETE FROM entries WHERE scope = ? AND kind = ? AND created < ?",
+                                   ( scope, kind, time.time() - self.max_age_days*86400. ) ).rowcount
+        removed += db.execute( """DELETE FROM entries WHERE id IN (
+                                      SELECT id FROM entries WHERE scope = ? AND kind = ? ORDER BY last_used DESC LIMIT -1 OFFSET ? )""",
+                               ( scope, kind, self.max_entries ) ).rowcount
+        return removed
+
+    # DONE: Evicts every scope down to its limits. Returns the number of removed entries.
+    def evict( self ):
+
+        with self.transaction() as db:
+            groups  = db.execute( "SELECT DISTINCT scope, kind FROM entries" ).fetchall()
+            removed = sum( self.evict_scope( db, g['scope'], g['kind'] ) for g in groups )
+
+        return removed
+
+    # DONE: Removes every entry (of one scope, if given)
+    def clear( self, scope:str = None ):
+
+        with self.transaction() as db:
+            if scope is None:
+                db.execute( "DELETE FROM entries" )
+            else:
+                db.execute( "DELETE FROM entries WHERE scope = ?", ( scope, ) )
+
+    # DONE: Returns the hit rate and the generation time saved over every run
+    def stats( self ):
+
+        values  = self.counters()
+        entries = self.db.execute( "SELECT COUNT(*) FROM entries" ).fetchone()[0]
+        lookups = int( values.get( 'lookups', 0 ) )
+        hits    = int( values.get( 'hits', 0 ) )
+
+        return {    'entries':          entries,
+                    'lookups':          lookups,
+                    'hits':             hits,
+                    'hit_rate':         round( hits/lookups, 3 ) if lookups > 0 else 0.,
+                    'seconds_saved':    round( values.get( 'seconds_saved', 0. ), 2 ) }
+
+
+if __name__ == "__main__":
+
+    from BERTEncoder import BERTEncoder
+
+    save_directory  = os.path.dirname( os.path.abspath( __file__ ) )
+
+    # The cache to inspect. Set evict = True to apply the size and age limits now, or clear = True to empty it.
+    db_file         = os.path.join( save_directory, "semantic_cache.db" )
+    max_entries     = 500
+    max_age_days    = 90.
+    evict           = False
+    clear           = False
+
+    SC = SemanticCache( BERTEncoder(), db_file = db_file, max_entries = max_entries, max_age_days = max_age_days )
+    if clear:
+        SC.clear()
+    elif evict:
+        print( f"Evicted {SC.evict()} entries" )
+    print( SC.stats() )
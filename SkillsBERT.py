@@ -14,9 +14,14 @@
 # Import libraries
 import os
 import json
+import math
 import string
 from typing import Optional
-from sentence_transformers import SentenceTransformer, util
+from BERTEncoder import BERTEncoder
+from Tracer import traced
+from BM25Index import hybrid_scores
+from KeywordMatcher import KeywordMatcher
+from MMR import mmr_select, duplicate_clusters, cached_embeddings
 
 # DONE: BERT bullet class
 class BERTSkills:
@@ -27,7 +32,13 @@ class BERTSkills:
                  job_title:str          = "", 
                  job_description:str    = "", 
                  BERTModel:str          = "all-mpnet-base-v2",
-                 count:int              = 5 ):
+                 count:int              = 5,
+                 encoder:Optional[BERTEncoder] = None,
+                 lexical_weight:float   = 0.,
+                 prefilter_m:int        = 0,
+                 keyword_boost:float    = 0.,
+                 mmr_lambda:float       = 1.,
+                 dup_threshold:float    = 0.9 ):
         
         self.skillsList     = skills
         self.subskillslist  = subskills
@@ -35,6 +46,14 @@ class BERTSkills:
         self.count          = count
         self.job_title      = job_title
         self.BERTModel      = BERTModel
+        self.encoder        = encoder if encoder is not None else BERTEncoder( BERTModel = BERTModel )
+        self.lexical_weight = lexical_weight    # Weight of the BM25 keyword score in the ranking. 0 = BERT only
+        self.prefilter_m    = prefilter_m       # If > 0, only the top-M keyword matches are encoded
+        self.keyword_boost  = keyword_boost     # Score added to skills the posting names outright (scaled by how often). 0 = off
+        self.keyword_counts = {}
+        self.mmr_lambda     = mmr_lambda        # MMR trade-off of relevance vs. diversity. 1 = relevance only (off)
+        self.dup_threshold  = dup_threshold     # Similarity above which two skills are near-duplicates
+        self.duplicates     = []
 
         self.results        = []
         self.fulldesc       = self.job_title + " " + self.job_desc
@@ -42,17 +61,26 @@ class BERTSkills:
         # Concantenate the skills
         self.totalSkillslst = skills + subskills
 
+    @traced( "BERTSkills.render", "bert" )
     def render( self ):
 
         # Ensure that there are more skills that the listed count max
         if len( self.totalSkillslst ) > self.count:
-            self.model      = SentenceTransformer( self.BERTModel )
-            desc_embed      = self.model.encode( self.fulldesc )
-
-            BERTRatings = []
-            for b in self.totalSkillslst:
-                b_embed     = self.model.encode( b['skill'] )
-                BERTRatings.append( util.cos_sim( desc_embed, b_embed ).item() )
+            # Score every skill and subskill against the description in one batch
+            BERTRatings = hybrid_scores( self.encoder, self.fulldesc, [ b['skill'] for b in self.totalSkillslst ],
+                                         self.lexical_weight, self.prefilter_m, min_keep = self.count ).tolist()
+
+            # Boost the skills that the posting mentions by name
+            if self.keyword_boost > 0:
+                BERTRatings = self.boost_mentions( BERTRatings )
+
+            # Diversity selection from the cached skill name embeddings
+            if self.mmr_lambda < 1.:
+                names           = [ b['skill'] for b in self.totalSkillslst ]
+                embeds          = cached_embeddings( self.encoder, names, BERTRatings )
+                self.duplicates = [ [ names[i] for i in c ] for c in duplicate_clusters( embeds, self.dup_threshold ) ]
+                self.results    = [ self.totalSkillslst[i] for i in mmr_select( BERTRatings, embeds, self.count, self.mmr_lambda ) ]
+                return self.results
 
             # Combine the BERT ratings and the skills list for sorting
             comb_bs     = list( zip( BERTRatings, self.totalSkillslst ) )
@@ -72,6 +100,23 @@ class BERTSkills:
 
         return self.results
 
+    # DONE: Adds the keyword boost to every skill/subskill mentioned in the posting. Mentioned more = bigger boost (log scaled).
+    def boost_mentions( self, ratings:list ):
+
+        matcher             = KeywordMatcher.for_skills( self.skillsList, self.subskillslist )
+        self.keyword_counts = matcher.count( self.fulldesc )
+        if len( self.keyword_counts ) == 0:
+            return ratings
+
+        top     = math.log1p( max( self.keyword_counts.values() ) )
+        kinds   = [ 'skill' ]*len( self.skillsList ) + [ 'subskill' ]*len( self.subskillslist )
+        for i, ( kind, item ) in enumerate( zip( kinds, self.totalSkillslst ) ):
+            c = self.keyword_counts.get( ( kind, item['id'] ), 0 )
+            if c > 0:
+                ratings[i] += self.keyword_boost*math.log1p( c )/top
+
+        return ratings
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,296 @@
+'''
+
+    Title:          Static Encoder
+
+    Description:    Fast embedding tier for triaging many postings against a masterlist. Running the transformer on every
+                    posting of a feed is far more than a first pass needs. A static model keeps one vector per token and
+                    embeds a text as the mean of its token vectors: a lookup of its words and a sparse matrix product, no attention,
+                    at millions of tokens per second on a CPU.
+
+                    The static model is distilled from the transformer the scorers use (all-mpnet-base-v2 by default): every
+                    token of its vocabulary is passed through the transformer on its own, the outputs are centered and reduced
+                    with PCA, and the result is saved in `static_models/`. The summed vectors of each word are cached, so a text
+                    is split on whitespace and looked up instead of tokenized. A Model2Vec model directory (`tokenizer.json` and
+                    `model.safetensors`) can be used instead. The encoder has the interface of BERTEncoder, so it can be given to
+                    any of the BERT scorers. Use `triage` with it to narrow a feed down to the postings that fit, then run the
+                    ResumeBuilder with the full model on those. `benchmark` compares the two tiers.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import json
+import time
+import threading
+import itertools
+import numpy as np
+import scipy.sparse as sp
+from tokenizers import Tokenizer
+from Tracer import tracer
+from SafeIO import atomic_write_json, key_lock
+from EmbeddingPrecompute import masterlist_texts
+
+
+STATIC_DIR  = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "static_models" )
+
+
+# DONE: Distills a static model from a SentenceTransformer model and saves it to model_dir. Returns model_dir.
+def distill( BERTModel:str, model_dir:str, dim:int = 256, batch_size:int = 512 ):
+
+    # The transformer is only needed here, not to encode with the static model
+    import torch
+    from BERTEncoder import BERTEncoder
+
+    st          = BERTEncoder( BERTModel = BERTModel ).model
+    tokenizer   = st.tokenizer
+    transformer = st[0].auto_model
+    vocab_size  = len( tokenizer )
+
+    print( f"Distilling a static model from {BERTModel} ({vocab_size} tokens)..." )
+    start       = time.perf_counter()
+    vecs        = np.zeros( ( vocab_size, transformer.config.hidden_size ), dtype = np.float32 )
+    with tracer.span( "StaticEncoder.distill", "bert", model = BERTModel, tokens = vocab_size ), torch.no_grad():
+        # Each token is encoded on its own, between the special tokens, and mean pooled like the sentence embeddings
+        for i in range( 0, vocab_size, batch_size ):
+            ids     = torch.arange( i, min( i + batch_size, vocab_size ) )
+            inputs  = torch.stack( [ torch.full_like( ids, tokenizer.cls_token_id ), ids, torch.full_like( ids, tokenizer.sep_token_id ) ],
+                                   dim = 1 ).to( transformer.device )
+            out     = transformer( input_ids = inputs, attention_mask = torch.ones_like( inputs ) ).last_hidden_state
+            vecs[i:i + len( ids )] = out.mean( dim = 1 ).cpu().numpy()
+
+    # Removing the mean drops the direction every token shares. PCA keeps the directions that tell the tokens apart.
+    vecs       -= vecs.mean( axis = 0 )
+    dim         = min( dim, vecs.shape[1] )
+    _, _, vt    = np.linalg.svd( vecs, full_matrices = False )
+    vecs        = ( vecs @ vt[:dim].T ).astype( np.float32 )
+
+    os.makedirs( model_dir, exist_ok = True )
+    tokenizer.save_pretrained( model_dir )
+    np.save( os.path.join( model_dir, "embeddings.npy" ), vecs )
+    atomic_write_json( os.path.join( model_dir, "static_config.json" ), { 'source':BERTModel, 'dim':dim, 'vocab_size':vocab_size } )
+    print( f"Static model saved to {model_dir} ({dim} dimensions, {time.perf_counter() - start:.1f} s)" )
+
+    return model_dir
+
+
+# DONE: Loads the tokenizer and the token vectors of a static model directory. Reads Model2Vec directories too.
+def load_static( model_dir:str ):
+
+    tokenizer   = Tokenizer.from_file( os.path.join( model_dir, "tokenizer.json" ) )
+
+    # Static models have no length limit, so long postings are used in full
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+
+    if os.path.isfile( os.path.join( model_dir, "embeddings.npy" ) ):
+        vecs    = np.load( os.path.join( model_dir, "embeddings.npy" ) )
+    else:
+        from safetensors.numpy import load_file
+        vecs    = load_file( os.path.join( model_dir, "model.safetensors" ) )['embeddings']
+
+    return tokenizer, np.asarray( vecs, dtype = np.float32 )
+
+
+# DONE: Token vectors of a static model, and a table of the vector sums of every word (whitespace-separated chunk) seen so
+#       far. Each new word is tokenized once. Since the pooled embedding is normalized, the sum of a text's word rows gives
+#       the same embedding as the mean of its token vectors, with a dictionary lookup per word instead of the tokenizer.
+class WordTable:
+
+    def __init__( self, tokenizer:Tokenizer, vecs:np.ndarray ):
+
+        self.tokenizer  = tokenizer
+        self.vecs       = vecs
+        self.index      = {}
+        self.table      = np.zeros( ( 4096, vecs.shape[1] ), dtype = np.float32 )
+        self.lock       = threading.Lock()
+
+    # DONE: Returns the table row of each word, adding the words that aren't in the table yet
+    def rows( self, words:list ):
+
+        rows    = np.fromiter( map( self.index.get, words, itertools.repeat( -1 ) ), dtype = np.int64, count = len( words ) )
+        if ( rows < 0 ).any():
+            self.add( set( words[i] for i in np.flatnonzero( rows < 0 ) ) )
+            rows    = np.fromiter( map( self.index.__getitem__, words ), dtype = np.int64, count = len( words ) )
+
+        return rows
+
+    # DONE: Adds the vector sums of new words. The table is replaced, not resized, when it grows, so rows already handed out
+    #       stay valid for the readers using the old table.
+    def add( self, words:set ):
+
+        with self.lock:
+            words   = [ w for w in words if w not in self.index ]
+            sums    = [ self.vecs[e.ids].sum( axis = 0 ) for e in self.tokenizer.encode_batch( words, add_special_tokens = False ) ]
+            start   = len( self.index )
+            if start + len( words ) > len( self.table ):
+                table               = np.zeros( ( max( 2*len( self.table ), start + len( words ) ), self.table.shape[1] ), dtype = np.float32 )
+                table[:start]       = self.table[:start]
+                self.table          = table
+            if len( words ) > 0:
+                self.table[start:start + len( words )] = np.vstack( sums )
+
+            # Rows are written before they are indexed
+            for i, w in enumerate( words ):
+                self.index[w] = start + i
+
+
+class StaticEncoder:
+
+    # Loaded models (with their word tables) are kept at the class level so every encoder in the process shares them
+    _models     = {}
+    _glock      = threading.Lock()
+
+    def __init__( self,
+                BERTModel:str       = "all-mpnet-base-v2",      # The transformer the static model is distilled from
+                model_dir:str       = None,                     # Static model directory. None = static_models/<BERTModel>, distilled if missing
+                dim:int             = 256,                      # Dimensions of a distilled model
+                batch_size:int      = 8192,                     # Texts pooled per sparse product
+                store               = None ):                   # Unused. Static embeddings are cheaper to compute than to look up.
+
+        self.source     = BERTModel
+        self.model_dir  = model_dir if model_dir is not None else os.path.join( STATIC_DIR, BERTModel.replace( "/", "__" ) )
+        self.dim        = dim
+        self.batch_size = batch_size
+        self.store      = store
+        self.cache_size = 0
+
+        # Named apart from the transformer, so anything keyed by the model name keeps the two tiers separate
+        self.BERTModel  = f"static:{os.path.basename( os.path.normpath( self.model_dir ) )}"
+
+    # DONE: Returns the WordTable of the model, distilling the model the first time it is needed
+    @property
+    def model( self ):
+
+        with StaticEncoder._glock:
+            if self.model_dir not in StaticEncoder._models:
+                with key_lock( self.model_dir ):
+                    if not os.path.isfile( os.path.join( self.model_dir, "tokenizer.json" ) ):
+                        distill( self.source, self.model_dir, dim = self.dim )
+                with tracer.span( "StaticEncoder.load", "bert", model = self.BERTModel ):
+                    StaticEncoder._models[self.model_dir] = WordTable( *load_static( self.model_dir ) )
+
+        return StaticEncoder._models[self.model_dir]
+
+    # DONE: Whether the model is already resident in memory
+    def is_loaded( self ):
+        return self.model_dir in StaticEncoder._models
+
+    # DONE: Loads the model ahead of time
+    def load( self ):
+        return self.model
+
+    # DONE: Removes the model and its word table from memory
+    def unload( self ):
+        with StaticEncoder._glock:
+            StaticEncoder._models.pop( self.model_dir, None )
+
+    # DONE: Returns the token ids of each text
+    def tokenize( self, texts:list ):
+        return [ e.ids for e in self.model.tokenizer.encode_batch( texts, add_special_tokens = False ) ]
+
+    # DONE: Encodes a single text or a list of texts into normalized embeddings (the mean of their token vectors)
+    def encode( self, texts ):
+
+        single  = isinstance( texts, str )
+        if single:
+            texts = [ texts ]
+
+        words   = self.model
+        out     = np.zeros( ( len( texts ), words.vecs.shape[1] ), dtype = np.float32 )
+        with tracer.span( "StaticEncoder.encode", "bert", texts = len( texts ) ) as span:
+            count   = 0
+            for i in range( 0, len( texts ), self.batch_size ):
+                split   = [ t.split() for t in texts[i:i + self.batch_size] ]
+                lens    = np.fromiter( map( len, split ), dtype = np.int64, count = len( split ) )
+                rows    = words.rows( list( itertools.chain.from_iterable( split ) ) )
+                table   = words.table
+
+                # Row r of the pooling matrix counts the words of text r, so pooling is one sparse product
+                pool    = sp.csr_matrix( ( np.ones( len( rows ), dtype = np.float32 ), rows, np.concatenate( ( [ 0 ], np.cumsum( lens ) ) ) ),
+                                         shape = ( len( split ), len( table ) ) )
+                out[i:i + len( split )] = pool @ table
+                count  += len( rows )
+
+            span.set( 'words', count )
+
+        # Empty texts stay zero vectors
+        norms   = np.linalg.norm( out, axis = 1, keepdims = True )
+        out     = out/np.where( norms > 0, norms, 1. )
+
+        return out[0] if single else out
+
+    # DONE: Returns the cosine similarity of each text to the query text
+    def similarity( self, query:str, texts:list ):
+
+        if len( texts ) == 0:
+            return np.zeros( 0, dtype = np.float32 )
+
+        return self.encode( texts ) @ self.encode( query )
+
+
+# DONE: Ranks postings by how well a masterlist fits them. A posting's fit is the mean similarity of its `top_k` closest
+#       masterlist texts, so a few strongly matching bullets count more than a loose match to everything.
+#       Returns [ ( posting index, fit ) ], best first, the first `keep` only if keep > 0.
+def triage( encoder, postings:list, texts:list, keep:int = 0, top_k:int = 10, chunk:int = 2048 ):
+
+    with tracer.span( "triage", "bert", postings = len( postings ), texts = len( texts ) ):
+        text_vecs   = encoder.encode( texts )
+        k           = min( top_k, len( texts ) )
+        fit         = np.zeros( len( postings ), dtype = np.float32 )
+        for i in range( 0, len( postings ), chunk ):
+            sims                    = encoder.encode( postings[i:i + chunk] ) @ text_vecs.T
+            fit[i:i + len( sims )]  = np.partition( sims, sims.shape[1] - k, axis = 1 )[:, -k:].mean( axis = 1 )
+
+        order       = np.argsort( -fit, kind = "stable" )
+        if keep > 0:
+            order = order[:keep]
+
+    return [ ( int( i ), float( fit[i] ) ) for i in order ]
+
+
+# DONE: Times the triage of the postings with both tiers and reports how many of the full model's best `keep` postings
+#       the static tier keeps, in its own best `keep` and in a margin of `margin` times as many
+def benchmark( mList, postings:list, keep:int = 50, margin:int = 4, static = None, full = None ):
+
+    from BERTEncoder import BERTEncoder
+
+    static  = static if static is not None else StaticEncoder()
+    full    = full if full is not None else BERTEncoder()
+    texts   = masterlist_texts( mList )
+    tokens  = sum( len( t ) for t in static.tokenize( postings + texts ) )
+    report  = { 'postings':len( postings ), 'texts':len( texts ), 'tokens':tokens }
+
+    ranked  = {}
+    for name, enc in ( ( 'static', static ), ( 'transformer', full ) ):
+        enc.load()
+        # Time the full model cold, without the embeddings it cached
+        getattr( enc, 'cache', {} ).clear()
+        start           = time.perf_counter()
+        ranked[name]    = [ i for i, _ in triage( enc, postings, texts ) ]
+        seconds         = time.perf_counter() - start
+        report[name]    = { 'seconds':round( seconds, 4 ), 'tokens_per_s':round( tokens/seconds ), 'postings_per_s':round( len( postings )/seconds, 1 ) }
+
+    best    = set( ranked['transformer'][:keep] )
+    report['speedup']           = round( report['transformer']['seconds']/report['static']['seconds'], 1 )
+    report['recall_at_keep']    = round( len( best & set( ranked['static'][:keep] ) )/max( len( best ), 1 ), 3 )
+    report[f'recall_at_{margin}x'] = round( len( best & set( ranked['static'][:margin*keep] ) )/max( len( best ), 1 ), 3 )
+
+    return report
+
+
+if __name__ == "__main__":
+
+    from MasterlistGenerator import MasterlistGenerator
+
+    # Synthetic postings (half of them from other fields) are triaged against a synthetic masterlist with both tiers.
+    # The first run distills the static model into static_models/, which needs the transformer once.
+    postings    = 2000
+    keep        = 50
+
+    MG      = MasterlistGenerator( experiences = 10, bullets_per = 20 )
+    report  = benchmark( MG.generate(), [ p['job_title'] + " " + p['job_desc'] for p in MG.postings( postings ) ], keep = keep )
+    print( json.dumps( report, indent = 4 ) )
@@ -0,0 +1,297 @@
+'''
+
+    Title:          Tracer
+
+    Description:    Per-stage span instrumentation for the resume pipeline. Each span records its wall time, CPU time, the peak
+                    RSS of the process, and any extra values the stage attaches to it (tokens generated, cache hits/misses).
+                    Spans can be exported as a Chrome trace / Perfetto JSON file (open in chrome://tracing or ui.perfetto.dev)
+                    and as a flat CSV.
+
+                    Tracing is off by default. When off, `span()` returns a shared no-op object, so the instrumentation costs
+                    a single attribute check per span. Enable it with `tracer.enable()` or the RESUME_TRACE=1 environment variable,
+                    or for the length of one run with `begin_run()`/`end_run()`.
+
+                    The tracer is shared by the whole process, so several runs (e.g. the service workers) can record at once.
+                    Every span knows the root span of its run, and the exports can be limited to one run. A thread that works
+                    for a run (e.g. a stage in a thread pool) joins it with `attach( span )`.
+
+    Author:         Dr. John Ferrier
+
+    Date:           19 October 2026
+
+'''
+
+# Import libraries
+import os
+import csv
+import sys
+import json
+import time
+import functools
+import threading
+import psutil
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+# DONE: Returns the peak RSS of this process in MB
+def peak_rss_mb():
+
+    if resource is not None:
+        peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+        # Linux reports KB, MacOS reports bytes
+        return peak/1024 if not sys.platform == "darwin" else peak/( 1024**2 )
+
+    # Windows tracks the peak working set directly
+    mem = psutil.Process().memory_info()
+    return getattr( mem, 'peak_wset', mem.rss )/( 1024**2 )
+
+
+# Span that does nothing. Returned when tracing is disabled.
+class NullSpan:
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        return False
+
+    def set( self, key:str, value ):
+        pass
+
+    def add( self, key:str, value = 1 ):
+        pass
+
+NULL_SPAN = NullSpan()
+
+
+# DONE: A single timed stage of the pipeline
+class Span:
+
+    def __init__( self, tracer, name:str, category:str = "", attrs:dict = None ):
+
+        self.tracer     = tracer
+        self.name       = name
+        self.category   = category
+        self.attrs      = dict( attrs ) if attrs else {}
+
+        self.start      = 0.
+        self.wall       = 0.
+        self.cpu        = 0.
+        self.peak_rss   = 0.
+        self.tid        = 0
+        self.depth      = 0
+        self.root       = self                      # Outermost span of the run this span belongs to
+
+    def __enter__( self ):
+
+        self.tid    = threading.get_ident()
+        self.depth  = self.tracer.push( self )
+        self.cpu    = time.thread_time()
+        self.start  = time.perf_counter()
+        return self
+
+    def __exit__( self, exc_type, exc, tb ):
+
+        self.wall       = time.perf_counter() - self.start
+        self.cpu        = time.thread_time() - self.cpu
+        self.peak_rss   = peak_rss_mb()
+
+        if exc_type is not None:
+            self.attrs['error'] = f"{exc_type.__name__}: {exc}"
+
+        self.tracer.pop( self )
+        return False
+
+    # Sets a value on the span (e.g. tokens = 512)
+    def set( self, key:str, value ):
+        self.attrs[key] = value
+
+    # Adds to a counter on the span (e.g. cache_hits)
+    def add( self, key:str, value = 1 ):
+        self.attrs[key] = self.attrs.get( key, 0 ) + value
+
+
+# DONE: Collects spans for the whole process
+class Tracer:
+
+    def __init__( self, enabled:bool = False ):
+
+        self.enabled    = enabled
+        self.always     = enabled                   # Whether tracing was turned on for the whole process
+        self.runs       = 0                         # Runs that turned tracing on for themselves and haven't ended
+        self.spans      = []
+        self.lock       = threading.Lock()
+        self.local      = threading.local()
+        self.origin     = time.perf_counter()
+
+    # DONE: Turns tracing on/off
+    def enable( self ):
+        with self.lock:
+            self.always     = True
+            self.enabled    = True
+
+    def disable( self ):
+        with self.lock:
+            self.always     = False
+            self.enabled    = self.runs > 0
+
+    # DONE: Turns tracing on for one run, until its end_run(). It stays on while any such run is open, or if it was enabled.
+    def begin_run( self ):
+        with self.lock:
+            self.runs       += 1
+            self.enabled    = True
+
+    def end_run( self ):
+        with self.lock:
+            self.runs       = max( self.runs - 1, 0 )
+            self.enabled    = self.always or self.runs > 0
+
+    # DONE: Removes all recorded spans
+    def clear( self ):
+        with self.lock:
+            self.spans  = []
+            self.origin = time.perf_counter()
+
+    # DONE: Removes the recorded spans of one run, leaving those of the other runs
+    def discard( self, root:Span ):
+        with self.lock:
+            self.spans  = [ s for s in self.spans if s.root is not root ]
+
+    # DONE: Returns the recorded spans, or only those of the run of `root`, in the order they started
+    def collected( self, root:Span = None ):
+        with self.lock:
+            spans = [ s for s in self.spans if root is None or s.root is root ]
+        return sorted( spans, key = lambda s: s.start )
+
+    # DONE: Returns a span context manager for a stage. Returns the no-op span when tracing is off.
+    def span( self, name:str, category:str = "", **attrs ):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span( self, name, category, attrs )
+
+    # DONE: Tracks the currently open spans of each thread
+    def push( self, span:Span ):
+        stack = getattr( self.local, 'stack', None )
+        if stack is None:
+            stack = self.local.stack = []
+        if len( stack ) > 0:
+            span.root = stack[-1].root
+        stack.append( span )
+        return len( stack ) - 1
+
+    def pop( self, span:Span ):
+        stack = getattr( self.local, 'stack', [] )
+        if len( stack ) > 0 and stack[-1] is span:
+            stack.pop()
+        with self.lock:
+            self.spans.append( span )
+
+    # DONE: Opens a span of another thread in this one, so the spans opened inside are its children and belong to its run
+    #       (e.g. the stages of a thread pool). The span itself isn't recorded again.
+    @contextmanager
+    def attach( self, span ):
+
+        if not isinstance( span, Span ):
+            yield
+            return
+
+        stack = getattr( self.local, 'stack', None )
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append( span )
+        try:
+            yield
+        finally:
+            if len( stack ) > 0 and stack[-1] is span:
+                stack.pop()
+
+    # DONE: Returns the currently open span of this thread, or the no-op span
+    def current( self ):
+        stack = getattr( self.local, 'stack', None )
+        if not self.enabled or not stack:
+            return NULL_SPAN
+        return stack[-1]
+
+    # DONE: Exports the spans (of the run of `root`, if given) as Chrome trace / Perfetto JSON
+    def export_chrome( self, file_name:str, root:Span = None ):
+
+        pid     = os.getpid()
+        events  = [ { 'name':'process_name', 'ph':'M', 'pid':pid, 'args':{ 'name':'ResumeBuilder' } } ]
+        spans   = self.collected( root )
+        origin  = root.start if root is not None else self.origin
+
+        for s in spans:
+            args                = dict( s.attrs )
+            args['cpu_ms']      = round( s.cpu*1000, 3 )
+            args['peak_rss_mb'] = round( s.peak_rss, 1 )
+            events.append( {    'name':     s.name,
+                                'cat':      s.category,
+                                'ph':       'X',
+                                'ts':       ( s.start - origin )*1e6,
+                                'dur':      s.wall*1e6,
+                                'pid':      pid,
+                                'tid':      s.tid,
+                                'args':     args } )
+
+        with open( file_name, 'w' ) as file:
+            json.dump( { 'traceEvents':events, 'displayTimeUnit':'ms' }, file, default = str )
+
+        return file_name
+
+    # DONE: Exports the spans (of the run of `root`, if given) as a flat CSV. Extra span values get their own columns.
+    def export_csv( self, file_name:str, root:Span = None ):
+
+        spans   = self.collected( root )
+        origin  = root.start if root is not None else self.origin
+
+        extra   = []
+        for s in spans:
+            for k in s.attrs:
+                if k not in extra:
+                    extra.append( k )
+
+        with open( file_name, 'w', newline = '' ) as file:
+            writer = csv.writer( file )
+            writer.writerow( [ 'name', 'category', 'thread', 'depth', 'start_ms', 'wall_ms', 'cpu_ms', 'peak_rss_mb' ] + extra )
+            for s in spans:
+                writer.writerow( [  s.name, s.category, s.tid, s.depth,
+                                    round( ( s.start - origin )*1000, 3 ),
+                                    round( s.wall*1000, 3 ),
+                                    round( s.cpu*1000, 3 ),
+                                    round( s.peak_rss, 1 ) ] + [ s.attrs.get( k, "" ) for k in extra ] )
+
+        return file_name
+
+    # DONE: Prints the spans (of the run of `root`, if given) as an indented summary
+    def summary( self, root:Span = None ):
+
+        for s in self.collected( root ):
+            extra = ", ".join( f"{k}={v}" for k, v in s.attrs.items() )
+            print( f"{'  '*s.depth}{s.name}: {s.wall*1000:.1f} ms wall, {s.cpu*1000:.1f} ms CPU{', ' + extra if extra else ''}" )
+
+
+# Global tracer shared by every module
+tracer  = Tracer( enabled = os.environ.get( "RESUME_TRACE", "0" ) not in [ "", "0", "false", "False" ] )
+
+
+# DONE: Decorator that wraps a whole function/method in a span. Inside, use `tracer.current()` to attach values.
+def traced( name:str, category:str = "" ):
+
+    def decorator( func ):
+
+        @functools.wraps( func )
+        def wrapper( *args, **kwargs ):
+            if not tracer.enabled:
+                return func( *args, **kwargs )
+            with tracer.span( name, category ):
+                return func( *args, **kwargs )
+
+        return wrapper
+
+    return decorator